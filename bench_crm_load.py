@@ -0,0 +1,156 @@
+# bench_crm_load.py
+#!/usr/bin/env python3
+"""
+Нагрузочный тест CRM: задержка ответов при росте числа пользователей.
+
+N виртуальных пользователей по кругу запрашивают страницы CRM (список,
+карточку товара, API) без пауз. Для каждого N печатаются запросы в
+секунду и перцентили задержки. Запросы к БД идут в потоках с пулом
+соединений (crm/utils/database.py), поэтому p99 почти не меняется, пока
+пользователей не больше CRM_DB_POOL_SIZE; дальше запросы ждут свободное
+соединение. Если запрос к БД блокирует цикл событий, p99 растет вместе с N.
+
+С --slow параллельно крутятся тяжелые запросы (например, поиск
+дубликатов): они не должны поднимать задержку остальных страниц.
+
+Пример (CRM запущена: cd crm && python app.py):
+  python bench_crm_load.py --users 1 8 32 64 --duration 10
+  python bench_crm_load.py --slow /api/images/duplicates
+"""
+
+import argparse
+import asyncio
+import time
+
+import aiohttp
+
+DEFAULT_PATHS = ['/', '/api/products/?limit=50', '/api/products/{id}', '/product/{id}']
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+async def find_product_id(session, base_url):
+    """ID любого товара для страниц карточки"""
+    async with session.get(f"{base_url}/api/products/?limit=1") as response:
+        data = await response.json()
+    products = data.get('products') or []
+    return products[0]['id'] if products else None
+
+async def user(session, base_url, paths, deadline, latencies, errors, offset):
+    """Виртуальный пользователь: запросы подряд до deadline"""
+    number = offset
+    while time.monotonic() < deadline:
+        path = paths[number % len(paths)]
+        number += 1
+        started = time.monotonic()
+        try:
+            async with session.get(base_url + path) as response:
+                await response.read()
+                if response.status >= 500:
+                    errors.append(response.status)
+                    continue
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            errors.append(type(e).__name__)
+            continue
+        latencies.append(time.monotonic() - started)
+
+async def slow_load(session, base_url, path, stop):
+    """Фоновые тяжелые запросы"""
+    count = 0
+    while not stop.is_set():
+        try:
+            async with session.get(base_url + path) as response:
+                await response.read()
+            count += 1
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            await asyncio.sleep(0.1)
+    return count
+
+async def run_level(session, base_url, paths, users, duration, slow_paths, slow_users):
+    latencies, errors = [], []
+    stop = asyncio.Event()
+    slow_tasks = [
+        asyncio.create_task(slow_load(session, base_url, path, stop))
+        for path in slow_paths for _ in range(slow_users)
+    ]
+
+    deadline = time.monotonic() + duration
+    await asyncio.gather(*(
+        user(session, base_url, paths, deadline, latencies, errors, offset)
+        for offset in range(users)
+    ))
+
+    stop.set()
+    slow_done = sum(await asyncio.gather(*slow_tasks)) if slow_tasks else 0
+
+    latencies.sort()
+    return {
+        'users': users,
+        'requests': len(latencies),
+        'rps': len(latencies) / duration,
+        'p50': percentile(latencies, 0.50) * 1000,
+        'p95': percentile(latencies, 0.95) * 1000,
+        'p99': percentile(latencies, 0.99) * 1000,
+        'max': (latencies[-1] if latencies else 0.0) * 1000,
+        'errors': len(errors),
+        'slow': slow_done,
+    }
+
+async def main_async(args):
+    base_url = args.url.rstrip('/')
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+    connector = aiohttp.TCPConnector(limit=0)
+
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        paths = args.paths
+        if any('{id}' in path for path in paths):
+            product_id = args.product_id or await find_product_id(session, base_url)
+            if product_id is None:
+                print("⚠️ В БД нет товаров - страницы карточки пропущены")
+                paths = [path for path in paths if '{id}' not in path]
+            else:
+                paths = [path.replace('{id}', str(product_id)) for path in paths]
+
+        print(f"🎯 {base_url}, {args.duration:g} с на уровень, страницы: {', '.join(paths)}")
+        if args.slow:
+            print(f"🐢 Фоновые тяжелые запросы: {', '.join(args.slow)} x{args.slow_users}")
+        print("="*78)
+        print(f"{'польз.':>7} {'запросов':>9} {'запр/с':>8} {'p50, мс':>9} {'p95, мс':>9} "
+              f"{'p99, мс':>9} {'max, мс':>9} {'ошибок':>7}")
+
+        results = []
+        for users in args.users:
+            level = await run_level(session, base_url, paths, users, args.duration,
+                                    args.slow or [], args.slow_users)
+            results.append(level)
+            print(f"{level['users']:>7} {level['requests']:>9} {level['rps']:>8.1f} {level['p50']:>9.1f} "
+                  f"{level['p95']:>9.1f} {level['p99']:>9.1f} {level['max']:>9.1f} {level['errors']:>7}"
+                  + (f"  (тяжелых: {level['slow']})" if args.slow else ""))
+
+        print("="*78)
+        if len(results) > 1 and results[0]['p99']:
+            first, last = results[0], results[-1]
+            print(f"📈 p99 при {last['users']} польз. / при {first['users']}: "
+                  f"{last['p99'] / first['p99']:.2f}x (пропускная способность {last['rps'] / max(first['rps'], 0.001):.2f}x)")
+
+def main():
+    parser = argparse.ArgumentParser(description='Нагрузочный тест CRM: p99 при росте числа пользователей')
+    parser.add_argument('--url', default='http://127.0.0.1:8000', help='Адрес CRM (по умолчанию: http://127.0.0.1:8000)')
+    parser.add_argument('--users', type=int, nargs='+', default=[1, 8, 32, 64],
+                        help='Уровни одновременных пользователей (по умолчанию: 1 8 32 64)')
+    parser.add_argument('--duration', type=float, default=10.0, help='Секунд на уровень (по умолчанию: 10)')
+    parser.add_argument('--paths', nargs='+', default=DEFAULT_PATHS,
+                        help='Запрашиваемые пути; {id} заменяется ID товара')
+    parser.add_argument('--product-id', type=int, default=None, help='ID товара для {id} (по умолчанию: первый из списка)')
+    parser.add_argument('--slow', nargs='+', default=None, help='Тяжелые пути, запрашиваемые в фоне')
+    parser.add_argument('--slow-users', type=int, default=2, help='Фоновых клиентов на тяжелый путь (по умолчанию: 2)')
+    parser.add_argument('--timeout', type=float, default=30.0, help='Таймаут запроса в секундах (по умолчанию: 30)')
+    args = parser.parse_args()
+
+    asyncio.run(main_async(args))
+
+if __name__ == "__main__":
+    main()
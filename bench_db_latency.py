@@ -0,0 +1,135 @@
+# bench_db_latency.py
+#!/usr/bin/env python3
+"""
+Бенчмарк записи в БД через канал с задержкой.
+
+Между клиентом и локальным PostgreSQL поднимается TCP-прокси, который
+задерживает каждый пакет (замена tc netem). Сравниваются:
+1. psycopg2: execute + commit на каждую запись (ProductProcessor / ImageDownloader)
+2. psycopg2: execute на каждую запись, один commit (DatabaseManager)
+3. psycopg 3: pipeline mode + prepared statements (src/pipeline_db.py)
+
+Пример:
+  python bench_db_latency.py --latency-ms 20 --rows 200
+"""
+
+import argparse
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+
+import psycopg2
+from src.config import DB_CONFIG
+from src import pipeline_db
+
+BENCH_URL_PREFIX = 'https://bench.hello54.local/catalog/bench-'
+
+async def _pipe(reader, writer, delay):
+    """Пересылка данных в одну сторону с задержкой"""
+    try:
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            await asyncio.sleep(delay)
+            writer.write(data)
+            await writer.drain()
+    except (ConnectionResetError, BrokenPipeError):
+        pass
+    finally:
+        writer.close()
+
+def start_latency_proxy(listen_port, target_host, target_port, latency_ms):
+    """Запуск TCP-прокси с задержкой в фоновом потоке"""
+    delay = latency_ms / 1000.0 / 2  # задержка в каждую сторону = половина RTT
+    ready = threading.Event()
+
+    async def handle(client_reader, client_writer):
+        server_reader, server_writer = await asyncio.open_connection(target_host, target_port)
+        await asyncio.gather(
+            _pipe(client_reader, server_writer, delay),
+            _pipe(server_reader, client_writer, delay)
+        )
+
+    def run():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        server = loop.run_until_complete(asyncio.start_server(handle, '127.0.0.1', listen_port))
+        ready.set()
+        loop.run_until_complete(server.serve_forever())
+
+    threading.Thread(target=run, daemon=True).start()
+    ready.wait()
+
+def _proxied_config(port):
+    config = dict(DB_CONFIG)
+    config['host'] = '127.0.0.1'
+    config['port'] = port
+    return config
+
+def _cleanup(config):
+    conn = psycopg2.connect(**config)
+    with conn.cursor() as cursor:
+        cursor.execute("DELETE FROM products WHERE url LIKE %s;", (BENCH_URL_PREFIX + '%',))
+    conn.commit()
+    conn.close()
+
+def bench_psycopg2(config, urls, commit_each):
+    conn = psycopg2.connect(**config)
+    start = time.perf_counter()
+    with conn.cursor() as cursor:
+        for url in urls:
+            cursor.execute(pipeline_db.UPSERT_PRODUCT_URL_SQL, (url, None, None))
+            cursor.fetchone()
+            if commit_each:
+                conn.commit()
+    conn.commit()
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return elapsed
+
+def bench_pipeline(config, urls):
+    db = pipeline_db.PipelineDatabase(db_config=config)
+    start = time.perf_counter()
+    db.save_product_urls(urls, None)
+    elapsed = time.perf_counter() - start
+    db.close()
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк записи в БД с задержкой сети')
+    parser.add_argument('--latency-ms', type=float, default=20.0, help='RTT в миллисекундах (по умолчанию: 20)')
+    parser.add_argument('--rows', type=int, default=200, help='Количество записей (по умолчанию: 200)')
+    parser.add_argument('--proxy-port', type=int, default=55432, help='Порт прокси (по умолчанию: 55432)')
+    args = parser.parse_args()
+
+    start_latency_proxy(args.proxy_port, DB_CONFIG['host'], int(DB_CONFIG['port']), args.latency_ms)
+    config = _proxied_config(args.proxy_port)
+
+    print(f"⏱️  RTT: {args.latency_ms} мс, записей: {args.rows}")
+    print("="*60)
+
+    runs = [
+        ('psycopg2, commit на запись', lambda urls: bench_psycopg2(config, urls, commit_each=True)),
+        ('psycopg2, один commit', lambda urls: bench_psycopg2(config, urls, commit_each=False)),
+    ]
+    if pipeline_db.is_available():
+        runs.append(('psycopg 3 pipeline + prepare', lambda urls: bench_pipeline(config, urls)))
+    else:
+        print("⚠️ psycopg 3 не установлен - pipeline-вариант пропущен")
+
+    try:
+        for i, (name, run) in enumerate(runs):
+            _cleanup(DB_CONFIG)
+            urls = [f"{BENCH_URL_PREFIX}{i}-{n}.html" for n in range(args.rows)]
+            elapsed = run(urls)
+            print(f"{name:32} {elapsed:8.3f} с  ({args.rows / elapsed:8.1f} записей/с)")
+    finally:
+        _cleanup(DB_CONFIG)
+
+if __name__ == "__main__":
+    main()
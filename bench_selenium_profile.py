@@ -0,0 +1,82 @@
+# bench_selenium_profile.py
+#!/usr/bin/env python3
+"""
+Бенчмарк профилей Chrome для SeleniumParser.
+
+Сравнивает текущие настройки (полная загрузка всех ресурсов) с облегченным
+профилем (без картинок/шрифтов/медиа, блокировка аналитики и чатов,
+дисковый кэш) по времени готовности страницы и объему переданных данных.
+
+Пример:
+  python bench_selenium_profile.py --runs 3
+  python bench_selenium_profile.py --url https://hello54.ru/catalog/....html --strategy normal
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+
+from src.selenium_parser import SeleniumParser
+
+DEFAULT_URLS = [
+    "https://hello54.ru/catalog/sumka-remen-joy-room-jr-cy211-hiding-waist-m-l-black-rose.html",
+]
+
+# Сумма переданных байт по Resource Timing API (кэшированные ресурсы дают 0)
+TRANSFERRED_BYTES_JS = """
+var total = 0;
+performance.getEntriesByType('navigation').concat(performance.getEntriesByType('resource'))
+    .forEach(function(e) { total += e.transferSize || 0; });
+return total;
+"""
+
+READY_SELECTOR_JS = "return !!document.querySelector('div.b-title h1, h1');"
+
+def measure(parser, url, ready_timeout=30):
+    """Время до появления заголовка товара и переданные байты"""
+    start = time.perf_counter()
+    parser.driver.get(url)
+    deadline = start + ready_timeout
+    while time.perf_counter() < deadline:
+        if parser.driver.execute_script(READY_SELECTOR_JS):
+            break
+        time.sleep(0.05)
+    ready = time.perf_counter() - start
+    transferred = parser.driver.execute_script(TRANSFERRED_BYTES_JS) or 0
+    return ready, transferred
+
+def run_profile(name, urls, runs, lean, strategy):
+    parser = SeleniumParser(headless=True, lean=lean, page_load_strategy=strategy)
+    timings, volumes = [], []
+    try:
+        for _ in range(runs):
+            for url in urls:
+                ready, transferred = measure(parser, url)
+                timings.append(ready)
+                volumes.append(transferred)
+    finally:
+        parser.close()
+
+    print(f"{name:28} готовность: медиана {statistics.median(timings):6.2f}с, "
+          f"макс {max(timings):6.2f}с | передано: медиана {statistics.median(volumes) / 1024:8.1f} КБ")
+
+def main():
+    parser = argparse.ArgumentParser(description='Сравнение профилей Chrome для Selenium')
+    parser.add_argument('--url', action='append', help='URL страницы (можно несколько раз)')
+    parser.add_argument('--runs', type=int, default=3, help='Повторов на каждый URL (по умолчанию: 3)')
+    parser.add_argument('--strategy', default='eager', help='page_load_strategy облегченного профиля')
+    args = parser.parse_args()
+
+    urls = args.url or DEFAULT_URLS
+    print(f"🌐 Страниц: {len(urls)}, повторов: {args.runs}")
+    print("="*90)
+
+    run_profile('текущий (eager, все ресурсы)', urls, args.runs, lean=False, strategy='eager')
+    run_profile(f'облегченный ({args.strategy})', urls, args.runs, lean=True, strategy=args.strategy)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# capture_xhr.py
+#!/usr/bin/env python3
+"""
+Перехват XHR запросов карточек товаров и их повтор без браузера.
+
+Режимы:
+  --capture URL ...  открыть страницы в Selenium, сохранить шаблоны JSON запросов
+  --replay URL ...   выполнить сохраненные шаблоны через requests и показать поля
+  --fixture          проверка на локальном сервере-заглушке: перехват на одном
+                     товаре, повтор на другом, сравнение с данными сервера
+
+Примеры:
+  python capture_xhr.py --capture https://hello54.ru/catalog/...-206661.html
+  python capture_xhr.py --replay https://hello54.ru/catalog/...-206662.html
+  python capture_xhr.py --fixture --no-headless
+"""
+
+import argparse
+import json
+import logging
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+
+import requests
+
+from src.network_capture import TemplateStore, XhrReplayer
+from src.rate_limiter import RateLimitedSession
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+logger = logging.getLogger(__name__)
+
+def capture(urls, store, headless=True):
+    """Загрузка страниц в Selenium с перехватом XHR"""
+    from src.selenium_parser import SeleniumParser
+
+    parser = SeleniumParser(headless=headless, capture_xhr=True, snapshot_store=False)
+    parser.xhr_templates = store
+    try:
+        for url in urls:
+            result = parser.extract_data_directly(url)
+            data = result.get('data') or {}
+            print(f"\n🌐 {url}")
+            print(f"   товар: {data.get('prod_name')} / {data.get('prod_price_new')}")
+            for item in parser.last_xhr:
+                print(f"   📡 {item['method']} {item['url'][:100]} -> {item['status']}")
+    finally:
+        parser.close()
+
+def show_templates(store):
+    templates = list(store.templates.values())
+    print(f"\n📋 Шаблонов: {len(templates)} ({store.path})")
+    for template in templates:
+        fields = ', '.join(f"{name}={'.'.join(map(str, path))}" for name, path in template['fields'].items())
+        print(f"   {template['key']}")
+        print(f"      {template['method']} {template['url']}")
+        print(f"      поля: {fields or 'нет'}")
+
+def replay(urls, store, session):
+    """Повтор шаблонов для страниц без браузера"""
+    replayer = XhrReplayer(session, store)
+    results = {}
+    for url in urls:
+        fields = replayer.fetch_fields(url)
+        results[url] = fields
+        print(f"\n⚡ {url}")
+        print(f"   {json.dumps(fields, ensure_ascii=False)}")
+    return results
+
+def run_fixture(headless=True):
+    """Перехват и повтор на локальном сервере-заглушке"""
+    from xhr_fixture_server import FIXTURE_PRODUCTS, product_url, start_fixture_server
+
+    server, base_url = start_fixture_server()
+    print(f"🧪 Сервер-заглушка: {base_url}")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = TemplateStore(Path(tmp_dir) / 'xhr_templates.json')
+        articles = list(FIXTURE_PRODUCTS)
+
+        capture([product_url(base_url, articles[0])], store, headless=headless)
+        show_templates(store)
+
+        # Без общего ограничителя: сервер локальный
+        results = replay([product_url(base_url, a) for a in articles[1:]], store, requests.Session())
+
+    server.shutdown()
+
+    ok = True
+    for article in articles[1:]:
+        expected = FIXTURE_PRODUCTS[article]
+        fields = results[product_url(base_url, article)]
+        checks = {
+            'prod_name': expected['name'],
+            'prod_price_new': expected['price'],
+            'prod_article': article,
+        }
+        for field, value in checks.items():
+            if fields.get(field) != value:
+                ok = False
+                print(f"❌ {article}: {field} = {fields.get(field)!r}, ожидалось {value!r}")
+
+    print("\n✅ Перехват и повтор XHR работают" if ok else "\n❌ Повтор XHR вернул неверные данные")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description='Перехват XHR запросов Selenium и их повтор через requests')
+    parser.add_argument('--capture', nargs='+', metavar='URL', help='Страницы для перехвата (Selenium)')
+    parser.add_argument('--replay', nargs='+', metavar='URL', help='Страницы для повтора шаблонов (requests)')
+    parser.add_argument('--fixture', action='store_true', help='Проверка на локальном сервере-заглушке')
+    parser.add_argument('--templates', type=str, default=None, help='Файл шаблонов (по умолчанию из XHR_CAPTURE_CONFIG)')
+    parser.add_argument('--no-headless', action='store_true', help='Показывать браузер')
+    args = parser.parse_args()
+
+    if args.fixture:
+        sys.exit(0 if run_fixture(headless=not args.no_headless) else 1)
+
+    store = TemplateStore(args.templates)
+
+    if args.capture:
+        capture(args.capture, store, headless=not args.no_headless)
+    if args.capture or not args.replay:
+        show_templates(store)
+    if args.replay:
+        replay(args.replay, store, RateLimitedSession())
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,156 @@
 # hello54_crm/api/images.py
+import asyncio
+import mimetypes
 import subprocess
+import sys
+import time
 from pathlib import Path
 from fastapi import APIRouter, HTTPException
-from utils import config
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, Response
+from utils import config, database
+
+# Поиск по перцептивным хешам лежит в проекте парсера (нужен numpy)
+sys.path.append(str(config.PARSER_DIR))
+try:
+    from src.phash import find_clusters
+except ImportError:
+    find_clusters = None
+try:
+    from src.image_shards import is_shard_uri, read_uri, parse_uri
+except ImportError:
+    is_shard_uri = None
 
 router = APIRouter()
 
+def choose_derivative(derivatives, size):
+    """Путь наименьшего превью не меньше size (или наибольшего из имеющихся)"""
+    if not derivatives:
+        return None
+    sizes = sorted(int(s) for s in derivatives)
+    fitting = [s for s in sizes if s >= size]
+    return derivatives[str(fitting[0] if fitting else sizes[-1])]
+
+def image_response(image, size):
+    """
+    Ответ с превью под размер size или оригиналом
+    
+    Returns:
+        tuple: (ответ или None, если файлов нет; отдан ли оригинал)
+    """
+    candidates = [image['img_local_path']] if image['img_local_path'] else []
+    if size:
+        derivative = choose_derivative(image['img_derivatives'], size)
+        if derivative:
+            candidates.insert(0, derivative)
+    
+    headers = {"Cache-Control": "public, max-age=86400"}
+    for path in candidates:
+        is_original = path == image['img_local_path']
+        if is_shard_uri and is_shard_uri(path):
+            # Изображение в шарде: срез mmap без обращения к каталогам
+            try:
+                content = read_uri(path, base_dir=config.PARSER_DIR)
+            except (OSError, ValueError):
+                continue
+            media_type = mimetypes.guess_type(f"image{parse_uri(path)[3]}")[0] or "application/octet-stream"
+            return Response(content=content, media_type=media_type, headers=headers), is_original
+        
+        full_path = Path(path) if Path(path).is_absolute() else config.PARSER_DIR / path
+        if full_path.is_file():
+            return FileResponse(full_path, headers=headers), is_original
+    
+    return None, False
+
+_refetch_locks = {}
+
+async def refetch_image(product_id):
+    """Загрузка оригинала одного товара (одновременные запросы ждут одну загрузку)"""
+    lock = _refetch_locks.setdefault(product_id, asyncio.Lock())
+    try:
+        async with lock:
+            image = await database.call(database.get_product_image, product_id, True)
+            if image and image['img_local_path']:
+                return image  # загрузил запрос, которого мы ждали
+            
+            script_path = Path(config.PARSER_SCRIPTS['save_img'])
+            await run_in_threadpool(
+                subprocess.run,
+                ["python", str(script_path), "--id", str(product_id)],
+                capture_output=True,
+                cwd=script_path.parent,
+                timeout=config.IMAGE_REFETCH_TIMEOUT
+            )
+            return await database.call(database.get_product_image, product_id, True)
+    except subprocess.TimeoutExpired:
+        return None
+    finally:
+        # Ожидающие держат свою ссылку на lock, новые запросы сначала проверят БД
+        _refetch_locks.pop(product_id, None)
+
+@router.get("/file/{product_id}")
+async def product_image_file(product_id: int, size: int = 0):
+    """Изображение товара: превью под размер size или оригинал (size=0)"""
+    image = await database.call(database.get_product_image, product_id)
+    if not image:
+        raise HTTPException(status_code=404, detail="Товар не найден")
+    
+    response, is_original = image_response(image, size)
+    if response is None and image['prod_img_url'] and config.IMAGE_REFETCH_ON_DEMAND:
+        # Оригинал вытеснен по бюджету диска или еще не загружен - загружаем сейчас
+        image = await refetch_image(product_id)
+        if image:
+            response, is_original = image_response(image, size)
+    
+    if response is None:
+        raise HTTPException(status_code=404, detail="Изображение не загружено")
+    
+    # Превью переживают вытеснение, поэтому возраст оригинала продлевает только отдача оригинала
+    if is_original and image['img_hash']:
+        await database.call(database.record_image_access, image['img_hash'])
+    return response
+
+@router.get("/duplicates")
+async def image_duplicates(max_distance: int = 6, limit: int = 50):
+    """Группы почти одинаковых изображений (расстояние Хэмминга dHash <= max_distance)"""
+    if find_clusters is None:
+        raise HTTPException(status_code=501, detail="Поиск дубликатов недоступен (нужен numpy)")
+    
+    items = await database.call(database.get_image_phashes)
+    started = time.monotonic()
+    clusters = await run_in_threadpool(find_clusters, items, max_distance)
+    elapsed = time.monotonic() - started
+    
+    shown = clusters[:limit]
+    products = await database.call(
+        database.get_products_brief, {key for cluster in shown for key in cluster['keys']}
+    )
+    
+    return {
+        "max_distance": max_distance,
+        "hashes": len(items),
+        "clusters_total": len(clusters),
+        "products_total": sum(len(cluster['keys']) for cluster in clusters),
+        "seconds": round(elapsed, 3),
+        "clusters": [
+            {
+                "size": len(cluster['keys']),
+                "files": len({products[key]['img_hash'] for key in cluster['keys'] if key in products}),
+                "max_distance": cluster['max_distance'],
+                "products": [products[key] for key in cluster['keys'] if key in products],
+            }
+            for cluster in shown
+        ],
+    }
+
 @router.post("/download/{product_id}")
 async def download_product_image(product_id: int):
     """Загрузка изображения для конкретного товара"""
     try:
         script_path = Path(config.PARSER_SCRIPTS['save_img'])
         
-        result = subprocess.run(
+        result = await run_in_threadpool(
+            subprocess.run,
             ["python", str(script_path), "--id", str(product_id)],
             capture_output=True,
             text=True,
@@ -35,7 +173,8 @@ async def download_batch_images(count: int = 10):
     try:
         script_path = Path(config.PARSER_SCRIPTS['save_img'])
         
-        result = subprocess.run(
+        result = await run_in_threadpool(
+            subprocess.run,
             ["python", str(script_path), "--limit", str(count)],
             capture_output=True,
             text=True,
@@ -1,27 +1,79 @@
 # hello54_crm/api/parser.py
 import subprocess
+import sys
 import json
+import logging
 from pathlib import Path
 from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from utils import config
 
+# Клиент сервиса парсинга лежит в проекте парсера
+sys.path.append(str(Path(config.PARSER_SCRIPTS['process_products']).parent))
+try:
+    from src.render_client import RenderClient, RenderServiceUnavailable
+except ImportError:
+    RenderClient = None
+
+logger = logging.getLogger(__name__)
 router = APIRouter()
 
+def get_render_client():
+    if RenderClient is None:
+        return None
+    return RenderClient(config.RENDER_SERVICE_URL, config.RENDER_SERVICE_TIMEOUT)
+
+async def call_render_service(method, *args):
+    """
+    Вызов сервиса парсинга (блокирующий клиент - в пуле потоков)
+    
+    Returns:
+        dict: Ответ сервиса или None, если сервис не запущен
+        
+    Raises:
+        HTTPException: 504, если сервис принял задание, но не ответил вовремя
+            (запуск скрипта распарсил бы тот же товар вторым браузером)
+    """
+    client = get_render_client()
+    if client is None:
+        return None
+    
+    try:
+        result = await run_in_threadpool(getattr(client, method), *args)
+    except RenderServiceUnavailable as e:
+        logger.info(f"Сервис парсинга недоступен, запускаю скрипт: {e}")
+        return None
+    
+    if result.get('timeout'):
+        raise HTTPException(status_code=504, detail=result['error'])
+    return result
+
 @router.post("/parse/{product_id}")
 async def parse_product(product_id: int, use_selenium: bool = True):
-    """Запуск парсинга конкретного товара"""
+    """Парсинг конкретного товара: через сервис парсинга, иначе запуском скрипта"""
+    result = await call_render_service('parse_product', product_id, use_selenium)
+    if result is not None:
+        return {
+            "success": result.get('success', False),
+            "product_id": product_id,
+            "via": "render_service",
+            "result": result,
+            "error": result.get('error') if not result.get('success') else None
+        }
+    
     try:
         # Запускаем скрипт парсера
         script_path = Path(config.PARSER_SCRIPTS['process_products'])
         
         cmd = [
             "python", str(script_path),
-            "--process", "1",
+            "--id", str(product_id),
             "--selenium" if use_selenium else "--fast-mode",
             "--delay", "1.0"
         ]
         
-        result = subprocess.run(
+        result = await run_in_threadpool(
+            subprocess.run,
             cmd,
             capture_output=True,
             text=True,
@@ -41,6 +93,16 @@ async def parse_product(product_id: int, use_selenium: bool = True):
 @router.post("/parse-batch")
 async def parse_batch(count: int = 10, use_selenium: bool = True):
     """Пакетный парсинг товаров"""
+    result = await call_render_service('parse_batch', count, use_selenium)
+    if result is not None:
+        return {
+            "success": result.get('success', False),
+            "count": result.get('count', 0),
+            "via": "render_service",
+            "results": result.get('results', []),
+            "error": result.get('error')
+        }
+    
     try:
         script_path = Path(config.PARSER_SCRIPTS['process_products'])
         
@@ -50,7 +112,8 @@ async def parse_batch(count: int = 10, use_selenium: bool = True):
             "--selenium" if use_selenium else "--fast-mode"
         ]
         
-        result = subprocess.run(
+        result = await run_in_threadpool(
+            subprocess.run,
             cmd,
             capture_output=True,
             text=True,
@@ -73,7 +136,8 @@ async def update_stats():
     try:
         script_path = Path(config.PARSER_SCRIPTS['process_products'])
         
-        result = subprocess.run(
+        result = await run_in_threadpool(
+            subprocess.run,
             ["python", str(script_path), "--stats"],
             capture_output=True,
             text=True,
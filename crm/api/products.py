@@ -7,12 +7,12 @@ router = APIRouter()
 @router.get("/")
 async def get_products(limit: int = 50, offset: int = 0):
     """Получение списка товаров"""
-    return database.get_products(limit=limit, offset=offset)
+    return await database.call(database.get_products, limit=limit, offset=offset)
 
 @router.get("/{product_id}")
-async def get_product(product_id: int):
+async def get_product(product_id: int, fresh: bool = False):
     """Получение товара по ID"""
-    product = database.get_product_by_id(product_id)
+    product = await database.call(database.get_product_by_id, product_id, fresh=fresh)
     if not product:
         raise HTTPException(status_code=404, detail="Товар не найден")
     return product
@@ -20,7 +20,7 @@ async def get_product(product_id: int):
 @router.get("/{product_id}/characteristics")
 async def get_product_characteristics(product_id: int):
     """Получение характеристик товара"""
-    product = database.get_product_by_id(product_id)
+    product = await database.call(database.get_product_by_id, product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Товар не найден")
     
@@ -1,4 +1,5 @@
 # hello54_crm/app.py
+import asyncio
 import logging
 from fastapi import FastAPI, Request
 from fastapi.responses import HTMLResponse
@@ -37,6 +38,10 @@ app.include_router(products.router, prefix="/api/products", tags=["products"])
 app.include_router(parser.router, prefix="/api/parser", tags=["parser"])
 app.include_router(images.router, prefix="/api/images", tags=["images"])
 
+@app.on_event("shutdown")
+def close_database():
+    database.close_pools()
+
 # ======================
 # ВЕБ-ИНТЕРФЕЙС (страницы)
 # ======================
@@ -44,8 +49,10 @@ app.include_router(images.router, prefix="/api/images", tags=["images"])
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request, limit: int = 50, offset: int = 0):
     """Главная страница - список товаров"""
-    data = database.get_products(limit=limit, offset=offset)
-    stats = database.get_statistics()
+    data, stats = await asyncio.gather(
+        database.call(database.get_products, limit=limit, offset=offset),
+        database.call(database.get_statistics)
+    )
     
     return templates.TemplateResponse("index.html", {
         "request": request,
@@ -53,13 +60,14 @@ async def home(request: Request, limit: int = 50, offset: int = 0):
         "total": data['total'],
         "limit": limit,
         "offset": offset,
-        "stats": stats
+        "stats": stats,
+        "thumbnail_size": config.THUMBNAIL_SIZE
     })
 
 @app.get("/product/{product_id}", response_class=HTMLResponse)
-async def product_detail(request: Request, product_id: int):
-    """Детальная страница товара"""
-    product = database.get_product_by_id(product_id)
+async def product_detail(request: Request, product_id: int, fresh: bool = False):
+    """Детальная страница товара (fresh=true - читать с основной БД, минуя реплику)"""
+    product = await database.call(database.get_product_by_id, product_id, fresh=fresh)
     
     if not product:
         return templates.TemplateResponse("error.html", {
@@ -75,7 +83,7 @@ async def product_detail(request: Request, product_id: int):
 @app.get("/stats", response_class=HTMLResponse)
 async def stats_page(request: Request):
     """Страница статистики"""
-    stats = database.get_statistics()
+    stats = await database.call(database.get_statistics)
     
     return templates.TemplateResponse("stats.html", {
         "request": request,
@@ -17,6 +17,25 @@ DB_CONFIG = {
     'password': 'ваш_пароль',      # из .env или config.py hello54
 }
 
+# Реплика для списков и статистики (None - все запросы идут в основную БД)
+REPLICA_DB_CONFIG = None
+if os.getenv('CRM_REPLICA_HOST'):
+    REPLICA_DB_CONFIG = {
+        'host': os.getenv('CRM_REPLICA_HOST'),
+        'port': os.getenv('CRM_REPLICA_PORT', DB_CONFIG['port']),
+        'database': os.getenv('CRM_REPLICA_NAME', DB_CONFIG['database']),
+        'user': os.getenv('CRM_REPLICA_USER', DB_CONFIG['user']),
+        'password': os.getenv('CRM_REPLICA_PASSWORD', DB_CONFIG['password']),
+    }
+
+# Максимальное отставание реплики в секундах, после которого читаем с основной БД
+REPLICA_MAX_LAG_SECONDS = float(os.getenv('CRM_REPLICA_MAX_LAG', 5.0))
+# Как часто перепроверять отставание (а не на каждый запрос)
+REPLICA_LAG_CHECK_SECONDS = float(os.getenv('CRM_REPLICA_LAG_CHECK', 2.0))
+
+# Пул соединений с БД: столько же потоков выполняют запросы, цикл событий не блокируется
+DB_POOL_SIZE = int(os.getenv('CRM_DB_POOL_SIZE', 10))
+
 # Пути к скриптам парсера (относительно CRM)
 PARSER_SCRIPTS = {
     'process_products': '../hello54/process_products.py',
@@ -24,6 +43,23 @@ PARSER_SCRIPTS = {
     'main': '../hello54/main.py',
 }
 
+# Каталог парсера: относительно него заданы пути изображений в БД (img_local_path, img_derivatives)
+PARSER_DIR = Path(PARSER_SCRIPTS['save_img']).parent
+
+# Размер превью в списке товаров (ближайший больший из построенных save_img.py)
+THUMBNAIL_SIZE = int(os.getenv('CRM_THUMBNAIL_SIZE', 64))
+
+# Обращения к оригиналам копятся в памяти и пишутся в images.last_accessed_at раз в N секунд (LRU-вытеснение)
+IMAGE_ACCESS_FLUSH_SECONDS = float(os.getenv('CRM_IMAGE_ACCESS_FLUSH', 60))
+
+# Вытесненный (или еще не загруженный) оригинал загружается при первом запросе
+IMAGE_REFETCH_ON_DEMAND = os.getenv('CRM_IMAGE_REFETCH', '1') == '1'
+IMAGE_REFETCH_TIMEOUT = float(os.getenv('CRM_IMAGE_REFETCH_TIMEOUT', 60))
+
+# Сервис парсинга с прогретыми браузерами (render_service.py); если не запущен - запускаем скрипт
+RENDER_SERVICE_URL = os.getenv('RENDER_SERVICE_URL', 'http://127.0.0.1:8765')
+RENDER_SERVICE_TIMEOUT = float(os.getenv('RENDER_SERVICE_TIMEOUT', 125))
+
 # Настройки сервера
 SERVER_CONFIG = {
     'host': '127.0.0.1',
@@ -1,25 +1,134 @@
 # hello54_crm/utils/database.py
+import asyncio
+import functools
 import psycopg2
 from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool
 import logging
-from .config import DB_CONFIG
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from .config import (
+    DB_CONFIG, REPLICA_DB_CONFIG, REPLICA_MAX_LAG_SECONDS, REPLICA_LAG_CHECK_SECONDS,
+    DB_POOL_SIZE, IMAGE_ACCESS_FLUSH_SECONDS, PARSER_DIR
+)
+
+# Проверка отставания реплики - общая с парсером (src/replica.py)
+sys.path.append(str(PARSER_DIR))
+try:
+    from src.replica import replica_lag
+    from src.config import REPLICA_CONFIG
+except ImportError:
+    replica_lag = None
 
 logger = logging.getLogger(__name__)
 
-def get_db_connection():
-    """Создание соединения с БД"""
+# Обработчики CRM асинхронные, а psycopg2 - синхронный: запросы идут в этих потоках.
+# Потоков не больше, чем соединений в пуле, поэтому getconn не упирается в PoolError
+_executor = ThreadPoolExecutor(max_workers=DB_POOL_SIZE, thread_name_prefix='crm-db')
+_pools = {}
+_pools_lock = threading.Lock()
+_replica_state = {'checked_at': 0.0, 'usable': False, 'retry_at': 0.0}
+
+async def call(func, *args, **kwargs):
+    """Выполнение функции этого модуля в потоках БД (await не блокирует других пользователей)"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+def _get_pool(name, db_config, **connect_kwargs):
+    pool = _pools.get(name)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(name)
+            if pool is None:
+                pool = ThreadedConnectionPool(
+                    1, DB_POOL_SIZE,
+                    host=db_config['host'],
+                    port=db_config['port'],
+                    database=db_config['database'],
+                    user=db_config['user'],
+                    password=db_config['password'],
+                    **connect_kwargs
+                )
+                _pools[name] = pool
+    return pool
+
+@contextmanager
+def _pooled(name, db_config, readonly=False, **connect_kwargs):
+    """Соединение из пула; при возврате незавершенная транзакция откатывается"""
     try:
-        conn = psycopg2.connect(
-            host=DB_CONFIG['host'],
-            port=DB_CONFIG['port'],
-            database=DB_CONFIG['database'],
-            user=DB_CONFIG['user'],
-            password=DB_CONFIG['password']
-        )
-        return conn
+        pool = _get_pool(name, db_config, **connect_kwargs)
+        conn = pool.getconn()
+        if readonly and not conn.autocommit:
+            conn.set_session(readonly=True, autocommit=True)
     except Exception as e:
-        logger.error(f"Ошибка подключения к БД: {e}")
+        logger.error(f"Ошибка подключения к БД ({name}): {e}")
         raise
+    try:
+        yield conn
+    finally:
+        broken = bool(conn.closed)
+        if not broken:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                broken = True
+        pool.putconn(conn, close=broken)
+
+def db_connection():
+    """Соединение с основной БД (контекстный менеджер)"""
+    return _pooled('primary', DB_CONFIG)
+
+def _replica_usable():
+    """
+    Реплика доступна и не отстает (проверяется не чаще раза в REPLICA_LAG_CHECK_SECONDS;
+    после отказа - не раньше чем через REPLICA_CONFIG['retry_seconds'], как в ReadRouter парсера)
+    """
+    now = time.monotonic()
+    if now < _replica_state['retry_at'] or now - _replica_state['checked_at'] < REPLICA_LAG_CHECK_SECONDS:
+        return _replica_state['usable']
+    
+    lag = None
+    try:
+        with _pooled('replica', REPLICA_DB_CONFIG, readonly=True, connect_timeout=3) as conn:
+            lag = replica_lag(conn)
+    except Exception as e:
+        logger.warning(f"Реплика недоступна, читаем с основной БД: {e}")
+    
+    if lag is None:
+        _replica_state['retry_at'] = now + REPLICA_CONFIG['retry_seconds']
+    _replica_state.update(checked_at=now, usable=lag is not None and lag <= REPLICA_MAX_LAG_SECONDS)
+    return _replica_state['usable']
+
+def read_connection(fresh=False):
+    """
+    Соединение для read-only запросов (контекстный менеджер)
+    
+    Args:
+        fresh: Читать с основной БД (read-your-writes, например сразу после парсинга)
+    
+    Returns:
+        Соединение с репликой, если она настроена, доступна и не отстает,
+        иначе соединение с основной БД (и без проекта парсера рядом - без src.replica)
+    """
+    if fresh or not REPLICA_DB_CONFIG or replica_lag is None or not _replica_usable():
+        return db_connection()
+    return _pooled('replica', REPLICA_DB_CONFIG, readonly=True, connect_timeout=3)
+
+def close_pools():
+    """Закрытие пулов при остановке приложения (сначала - запись накопленных обращений к изображениям)"""
+    _image_hits_stop.set()
+    if _image_hits_thread is not None:
+        _image_hits_thread.join(timeout=10)
+    flush_image_access()
+    
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.closeall()
+        _pools.clear()
+    _executor.shutdown(wait=False)
 
 def get_products(limit=50, offset=0, filters=None):
     """
@@ -33,116 +142,210 @@ def get_products(limit=50, offset=0, filters=None):
     Returns:
         list: Список товаров
     """
-    conn = get_db_connection()
     try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-            query = """
-            SELECT 
-                id,
-                url,
-                prod_name,
-                prod_price_new,
-                prod_price_old,
-                prod_article,
-                prod_img_url,
-                img_local_path,
-                parse_status,
-                parsed_at,
-                created_at,
-                updated_at
-            FROM products 
-            WHERE prod_type = 'product'
-            """
-            
-            params = []
-            
-            # Применяем фильтры
-            if filters:
-                conditions = []
-                for key, value in filters.items():
-                    if value is not None:
-                        conditions.append(f"{key} = %s")
-                        params.append(value)
+        with read_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                query = """
+                SELECT 
+                    id,
+                    url,
+                    prod_name,
+                    prod_price_new,
+                    prod_price_old,
+                    prod_article,
+                    prod_img_url,
+                    img_local_path,
+                    parse_status,
+                    parsed_at,
+                    created_at,
+                    updated_at
+                FROM products 
+                WHERE prod_type = 'product'
+                """
                 
-                if conditions:
-                    query += " AND " + " AND ".join(conditions)
-            
-            # Сортировка и лимиты
-            query += " ORDER BY updated_at DESC LIMIT %s OFFSET %s"
-            params.extend([limit, offset])
-            
-            cursor.execute(query, params)
-            products = cursor.fetchall()
-            
-            # Получаем общее количество
-            count_query = "SELECT COUNT(*) as total FROM products WHERE prod_type = 'product'"
-            cursor.execute(count_query)
-            total = cursor.fetchone()['total']
-            
-            return {
-                'products': products,
-                'total': total,
-                'limit': limit,
-                'offset': offset
-            }
+                params = []
+                
+                # Применяем фильтры
+                if filters:
+                    conditions = []
+                    for key, value in filters.items():
+                        if value is not None:
+                            conditions.append(f"{key} = %s")
+                            params.append(value)
+                    
+                    if conditions:
+                        query += " AND " + " AND ".join(conditions)
+                
+                # Сортировка и лимиты
+                query += " ORDER BY updated_at DESC LIMIT %s OFFSET %s"
+                params.extend([limit, offset])
+                
+                cursor.execute(query, params)
+                products = cursor.fetchall()
+                
+                # Получаем общее количество
+                count_query = "SELECT COUNT(*) as total FROM products WHERE prod_type = 'product'"
+                cursor.execute(count_query)
+                total = cursor.fetchone()['total']
+                
+                return {
+                    'products': products,
+                    'total': total,
+                    'limit': limit,
+                    'offset': offset
+                }
             
     except Exception as e:
         logger.error(f"Ошибка получения товаров: {e}")
         return {'products': [], 'total': 0, 'limit': limit, 'offset': offset}
-    finally:
-        conn.close()
 
-def get_product_by_id(product_id):
-    """Получение товара по ID"""
-    conn = get_db_connection()
+def get_product_by_id(product_id, fresh=False):
+    """
+    Получение товара по ID
+    
+    Args:
+        product_id: ID товара
+        fresh: Читать с основной БД (страница товара сразу после парсинга)
+    """
     try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-            cursor.execute("""
-            SELECT 
-                *,
-                CASE 
-                    WHEN img_local_path IS NOT NULL THEN TRUE 
-                    ELSE FALSE 
-                END as has_local_image
-            FROM products 
-            WHERE id = %s
-            """, (product_id,))
-            
-            product = cursor.fetchone()
-            return product
+        with read_connection(fresh=fresh) as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                cursor.execute("""
+                SELECT 
+                    *,
+                    CASE 
+                        WHEN img_local_path IS NOT NULL THEN TRUE 
+                        ELSE FALSE 
+                    END as has_local_image
+                FROM products 
+                WHERE id = %s
+                """, (product_id,))
+                
+                product = cursor.fetchone()
+                return product
             
     except Exception as e:
         logger.error(f"Ошибка получения товара {product_id}: {e}")
         return None
-    finally:
-        conn.close()
+
+def get_product_image(product_id, fresh=False):
+    """
+    Пути оригинала и превью изображения товара
+    
+    Args:
+        fresh: Читать с основной БД (сразу после повторной загрузки)
+    """
+    try:
+        with read_connection(fresh=fresh) as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                cursor.execute("""
+                SELECT img_local_path, img_derivatives, img_hash, prod_img_url
+                FROM products 
+                WHERE id = %s
+                """, (product_id,))
+                return cursor.fetchone()
+            
+    except Exception as e:
+        logger.error(f"Ошибка получения изображения товара {product_id}: {e}")
+        return None
+
+_image_hits = set()
+_image_hits_lock = threading.Lock()
+_image_hits_stop = threading.Event()
+_image_hits_thread = None
+
+def record_image_access(img_hash):
+    """
+    Отметка обращения к оригиналу изображения (для LRU-вытеснения в save_img.py)
+    
+    Обращения копятся в памяти, фоновый поток пишет их одним UPDATE раз в
+    IMAGE_ACCESS_FLUSH_SECONDS (и при остановке - close_pools): запрос
+    картинки не ждет записи в БД, а последние обращения не теряются.
+    """
+    global _image_hits_thread
+    with _image_hits_lock:
+        _image_hits.add(img_hash)
+        if _image_hits_thread is None and not _image_hits_stop.is_set():
+            _image_hits_thread = threading.Thread(target=_image_hits_loop, name='crm-image-hits', daemon=True)
+            _image_hits_thread.start()
+
+def _image_hits_loop():
+    while not _image_hits_stop.wait(IMAGE_ACCESS_FLUSH_SECONDS):
+        flush_image_access()
+
+def flush_image_access():
+    """Запись накопленных обращений к изображениям в images.last_accessed_at"""
+    with _image_hits_lock:
+        hashes = list(_image_hits)
+        _image_hits.clear()
+    if not hashes:
+        return
+    
+    try:
+        with db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "UPDATE images SET last_accessed_at = NOW() WHERE hash = ANY(%s)",
+                    (hashes,)
+                )
+            conn.commit()
+    except Exception as e:
+        logger.warning(f"Не удалось записать обращения к изображениям: {e}")
+        with _image_hits_lock:
+            _image_hits.update(hashes)  # повторим при следующей записи
+
+def get_image_phashes():
+    """Перцептивные хеши всех изображений: [(id, img_phash), ...]"""
+    try:
+        with read_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT id, img_phash FROM products WHERE img_phash IS NOT NULL")
+                return cursor.fetchall()
+            
+    except Exception as e:
+        logger.error(f"Ошибка получения хешей изображений: {e}")
+        return []
+
+def get_products_brief(product_ids):
+    """Краткие данные товаров по списку ID: {id: товар}"""
+    try:
+        with read_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                cursor.execute("""
+                SELECT id, prod_name, prod_article, img_local_path, img_hash
+                FROM products 
+                WHERE id = ANY(%s)
+                """, (list(product_ids),))
+                return {row['id']: row for row in cursor.fetchall()}
+            
+    except Exception as e:
+        logger.error(f"Ошибка получения товаров: {e}")
+        return {}
 
 def get_statistics():
     """Получение статистики по БД"""
-    conn = get_db_connection()
     try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-            cursor.execute("""
-            SELECT 
-                COUNT(*) as total_products,
-                COUNT(CASE WHEN parse_status = 'success' THEN 1 END) as parsed_success,
-                COUNT(CASE WHEN parse_status = 'failed' THEN 1 END) as parsed_failed,
-                COUNT(CASE WHEN parse_status = 'pending' THEN 1 END) as pending,
-                COUNT(CASE WHEN parse_status IS NULL THEN 1 END) as not_parsed,
-                COUNT(CASE WHEN prod_price_new IS NOT NULL THEN 1 END) as has_price,
-                COUNT(CASE WHEN prod_img_url IS NOT NULL THEN 1 END) as has_image_url,
-                COUNT(CASE WHEN img_local_path IS NOT NULL THEN 1 END) as has_local_image,
-                COUNT(CASE WHEN prod_article IS NOT NULL THEN 1 END) as has_article,
-                MAX(parsed_at) as last_parsed
-            FROM products 
-            WHERE prod_type = 'product'
-            """)
-            
-            stats = cursor.fetchone()
-            return stats
+        with read_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                cursor.execute("""
+                SELECT 
+                    COUNT(*) as total_products,
+                    COUNT(CASE WHEN parse_status = 'success' THEN 1 END) as parsed_success,
+                    COUNT(CASE WHEN parse_status = 'failed' THEN 1 END) as parsed_failed,
+                    COUNT(CASE WHEN parse_status = 'pending' THEN 1 END) as pending,
+                    COUNT(CASE WHEN parse_status IS NULL THEN 1 END) as not_parsed,
+                    COUNT(CASE WHEN prod_price_new IS NOT NULL THEN 1 END) as has_price,
+                    COUNT(CASE WHEN prod_img_url IS NOT NULL THEN 1 END) as has_image_url,
+                    COUNT(CASE WHEN img_local_path IS NOT NULL THEN 1 END) as has_local_image,
+                    COUNT(CASE WHEN prod_article IS NOT NULL THEN 1 END) as has_article,
+                    MAX(parsed_at) as last_parsed
+                FROM products 
+                WHERE prod_type = 'product'
+                """)
+                
+                stats = cursor.fetchone()
+                return stats
             
     except Exception as e:
         logger.error(f"Ошибка получения статистики: {e}")
-        return None
-    finally:
-        conn.close()
\ No newline at end of file
+        return None
\ No newline at end of file
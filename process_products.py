@@ -11,11 +11,13 @@ import logging
 import sys
 from pathlib import Path
 from tabulate import tabulate
+from psycopg2.extras import RealDictCursor
 
 # Добавляем src в путь
 sys.path.append(str(Path(__file__).parent))
 
 from src.product_processor import ProductProcessor
+from src.config import SELENIUM_CONFIG
 
 # Настройка логирования
 logging.basicConfig(
@@ -29,9 +31,9 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
-def show_statistics(processor):
+def show_statistics(processor, prefer_primary=False):
     """Показать статистику обработки"""
-    stats_data = processor.show_statistics()
+    stats_data = processor.show_statistics(prefer_primary=prefer_primary)
     
     if stats_data:
         type_stats = stats_data['type_stats']
@@ -104,6 +106,15 @@ def show_statistics(processor):
                           headers=['Категория', 'Всего URL', 'Товаров', 'Обработано', 'Прогресс'],
                           tablefmt='simple'))
         
+        sources = stats_data.get('sources')
+        if sources:
+            print(f"\n🔎 Источник данных успешно обработанных товаров:")
+            total_sources = sum(s['count'] for s in sources)
+            browser = sum(s['count'] for s in sources if 'selenium' in s['parse_source'])
+            print(tabulate([[s['parse_source'], s['count']] for s in sources],
+                          headers=['Источник', 'Товаров'], tablefmt='simple'))
+            print(f"   Доля браузера (Selenium): {(browser / max(total_sources, 1)) * 100:.1f}%")
+        
         # Рекомендации
         print(f"\n💡 Рекомендации:")
         
@@ -139,9 +150,10 @@ def show_statistics(processor):
             print(f"   Повторная обработка с ошибками: python process_products.py --retry-failed")
 
 def show_processed_products(processor, limit=10):
-    """Показать обработанные товары"""
+    """Показать обработанные товары (с реплики, если она настроена)"""
     try:
-        with processor.connection.cursor(cursor_factory=RealDictCursor) as cursor:
+        conn = processor.read_router.connection()
+        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
             cursor.execute("""
             SELECT 
                 id,
@@ -243,6 +255,37 @@ def retry_failed_products(processor):
     except Exception as e:
         logger.error(f"Ошибка при повторной обработке: {e}")
 
+def process_via_service(args):
+    """
+    Обработка через сервис парсинга
+    
+    Returns:
+        bool: False, если сервис не запущен
+    """
+    from src.render_client import RenderClient, RenderServiceUnavailable
+    
+    try:
+        response = RenderClient().parse_batch(args.process, use_selenium=args.selenium)
+    except RenderServiceUnavailable as e:
+        logger.warning(f"⚠️ {e} - обрабатываю в этом процессе")
+        return False
+    
+    results = response.get('results', [])
+    if not results and response.get('error'):
+        logger.error(f"❌ Сервис парсинга: {response['error']}")
+    
+    table = [
+        [r.get('product_id'), '✅' if r.get('success') else '❌', r.get('source') or '-',
+         (r.get('prod_name') or r.get('error') or '')[:50], r.get('seconds', '-')]
+        for r in results
+    ]
+    if table:
+        print(tabulate(table, headers=['ID', '', 'Источник', 'Название / ошибка', 'Сек'], tablefmt='grid'))
+    
+    success = sum(1 for r in results if r.get('success'))
+    print(f"\n🛰️  Через сервис парсинга: {success} успешно, {len(results) - success} с ошибками")
+    return True
+
 def main():
     parser = argparse.ArgumentParser(
         description='Обработчик товаров hello54.ru с поддержкой двух режимов',
@@ -255,6 +298,27 @@ def main():
   # Полный режим (с Selenium, для новых товаров)
   python process_products.py --process 10 --selenium
   
+  # Конвейер: загрузка, парсинг и запись параллельно
+  python process_products.py --process 500 --pipeline --fetch-concurrency 8
+  
+  # Пул из 4 браузеров, каждый перезапускается после 100 страниц
+  python process_products.py --process 200 --selenium --browsers 4 --recycle-pages 100
+  
+  # Один браузер, 4 страницы грузятся параллельно во вкладках
+  python process_products.py --process 100 --selenium --tabs 4
+  
+  # Через запущенный render_service.py (прогретые браузеры, без старта Chrome)
+  python process_products.py --process 5 --selenium --via-service
+  
+  # Эскалация: requests, браузер только если не хватает полей
+  python process_products.py --process 50 --escalate
+  
+  # Изображения загружаются сразу после записи товара
+  python process_products.py --process 500 --pipeline --with-images
+  
+  # Конкретный товар по ID (независимо от статуса)
+  python process_products.py --id 123 --selenium
+  
   # Показать статистику
   python process_products.py --stats
   
@@ -266,6 +330,9 @@ def main():
     parser.add_argument('--process', type=int, nargs='?', const=10, 
                        help='Обработать N записей (по умолчанию: 10)')
     
+    parser.add_argument('--id', type=int, nargs='+', dest='ids',
+                       help='Обработать товары с указанными ID (независимо от статуса)')
+    
     parser.add_argument('--selenium', action='store_true',
                        help='Использовать Selenium (полный режим, для динамических страниц)')
     
@@ -287,13 +354,58 @@ def main():
     parser.add_argument('--selenium-no-headless', action='store_true',
                        help='Запустить Selenium с видимым браузером (для отладки)')
     
+    parser.add_argument('--browsers', type=int, default=1,
+                       help='Selenium: количество браузеров в пуле (по умолчанию: 1)')
+    
+    parser.add_argument('--recycle-pages', type=int, default=50,
+                       help='Selenium: перезапуск браузера после N страниц (по умолчанию: 50)')
+    
+    parser.add_argument('--max-browser-rss', type=int, default=None,
+                       help='Selenium: перезапуск браузера при RSS больше N МБ (нужен psutil)')
+    
+    parser.add_argument('--tabs', type=int, default=SELENIUM_CONFIG['tabs'],
+                       help=f"Selenium: вкладок на браузер, загружаемых параллельно (по умолчанию: {SELENIUM_CONFIG['tabs']})")
+    
+    parser.add_argument('--escalate', action='store_true',
+                       help='Эскалация: сначала requests, Selenium только для неполных результатов')
+    
+    parser.add_argument('--pipeline', action='store_true',
+                       help='Конвейер: параллельные загрузка, парсинг и пакетная запись (режим requests)')
+    
+    parser.add_argument('--fetch-concurrency', type=int, default=4,
+                       help='Конвейер: одновременных загрузок (по умолчанию: 4)')
+    
+    parser.add_argument('--parse-workers', type=int, default=2,
+                       help='Конвейер: процессов-парсеров (по умолчанию: 2)')
+    
+    parser.add_argument('--batch-size', type=int, default=20,
+                       help='Конвейер: записей в одной транзакции (по умолчанию: 20)')
+    
+    parser.add_argument('--via-service', action='store_true',
+                       help='Отправить --process в сервис парсинга (render_service.py); если он не запущен - обычная обработка')
+    
+    parser.add_argument('--with-images', action='store_true',
+                       help='Загружать изображения сразу после записи товара (без отдельного запуска save_img.py)')
+    
+    parser.add_argument('--image-threads', type=int, default=3,
+                       help='--with-images: потоков загрузки изображений (по умолчанию: 3)')
+    
     args = parser.parse_args()
     
+    if args.via_service and args.process and process_via_service(args):
+        return
+    
     # Определяем режим работы
     use_selenium = False
     selenium_headless = True
     
-    if args.selenium:
+    if args.pipeline and args.selenium:
+        logger.warning("⚠️ --pipeline работает только в режиме requests, флаг --selenium игнорируется")
+        args.selenium = False
+    
+    if args.escalate:
+        logger.info("🪜 Запуск в режиме ЭСКАЛАЦИИ (requests, Selenium только при неполных данных)")
+    elif args.selenium:
         use_selenium = True
         if args.selenium_no_headless:
             selenium_headless = False
@@ -309,7 +421,12 @@ def main():
     # Инициализируем процессор
     processor = ProductProcessor(
         use_selenium=use_selenium,
-        selenium_headless=selenium_headless
+        selenium_headless=selenium_headless,
+        escalate=args.escalate,
+        browsers=args.browsers,
+        recycle_pages=args.recycle_pages,
+        max_browser_rss_mb=args.max_browser_rss,
+        tabs=args.tabs
     )
     
     try:
@@ -319,19 +436,53 @@ def main():
         elif args.show:
             show_processed_products(processor, args.show)
             
-        elif args.process:
-            logger.info(f"🔍 Начинаю обработку {args.process} записей")
+        elif args.process or args.ids:
+            if args.ids:
+                logger.info(f"🔍 Начинаю обработку товаров ID {', '.join(map(str, args.ids))}")
+            else:
+                logger.info(f"🔍 Начинаю обработку {args.process} записей")
             logger.info(f"⏱️  Задержка между запросами: {args.delay} сек")
             
             # Определяем, обрабатывать ли только товары
             # В быстром режиме - только товары, в полном - можно все
             only_products = not args.selenium
             
-            success, skipped, errors = processor.process_products(
-                limit=args.process, 
-                delay=args.delay,
-                only_products=only_products
-            )
+            image_stream = None
+            if args.with_images:
+                from save_img import ImageDownloader, ImageDownloadStream
+                
+                image_downloader = ImageDownloader(max_workers=args.image_threads)
+                image_stream = ImageDownloadStream(image_downloader).start()
+                processor.image_sink = image_stream.submit
+            
+            try:
+                if args.pipeline:
+                    from src.product_pipeline import ProductPipeline
+                
+                    pipeline = ProductPipeline(
+                        processor,
+                        fetch_concurrency=args.fetch_concurrency,
+                        parse_workers=args.parse_workers,
+                        batch_size=args.batch_size
+                    )
+                    success, skipped, errors = pipeline.process_products(
+                        limit=args.process,
+                        delay=args.delay,
+                        only_products=only_products,
+                        product_ids=args.ids
+                    )
+                else:
+                    success, skipped, errors = processor.process_products(
+                        limit=args.process, 
+                        delay=args.delay,
+                        only_products=only_products,
+                        product_ids=args.ids
+                    )
+            finally:
+                if image_stream:
+                    processor.image_sink = None
+                    image_stream.close()
+                    image_downloader.close()
             
             print(f"\n" + "="*50)
             print("📊 РЕЗУЛЬТАТЫ ОБРАБОТКИ")
@@ -339,10 +490,15 @@ def main():
             print(f"✅ Успешно обработано: {success}")
             print(f"⏭️  Пропущено (не товары): {skipped}")
             print(f"❌ С ошибками: {errors}")
-            print(f"🔧 Режим: {'Selenium' if args.selenium else 'Fast (requests)'}")
+            print(f"🔧 Режим: {'Selenium' if args.selenium else 'Fast (requests)'}{' + конвейер' if args.pipeline else ''}")
             
             if success > 0:
-                show_statistics(processor)
+                # Только что записали - читаем с primary, реплика могла не догнать
+                show_statistics(processor, prefer_primary=True)
+            
+            if args.ids and success < len(args.ids):
+                # Вызывающий (CRM) судит об успехе по коду возврата
+                sys.exit(1)
                 
         elif args.retry_failed:
             retry_failed_products(processor, use_selenium)
@@ -0,0 +1,371 @@
+# render_service.py
+#!/usr/bin/env python3
+"""
+Долгоживущий локальный сервис парсинга товаров.
+
+Держит прогретые браузеры Selenium и пул соединений с PostgreSQL, поэтому
+запрос из CRM или скрипта стоит примерно одну загрузку страницы: без старта
+Python, подключения к БД, ensure_columns_exist, classify_urls и холодного
+запуска Chrome. Схема проверяется один раз при старте.
+
+HTTP API (только 127.0.0.1):
+  POST /parse/<id>?selenium=1        распарсить товар и записать в БД
+  POST /parse-batch?count=N&selenium=1  N непропарсенных товаров
+  GET  /health                       состояние очереди и браузеров
+
+Примеры:
+  python render_service.py --browsers 2
+  curl -X POST 'http://127.0.0.1:8765/parse/123?selenium=1'
+"""
+
+import argparse
+import json
+import logging
+import queue
+import re
+import signal
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit, parse_qs
+
+sys.path.append(str(Path(__file__).parent))
+
+from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool
+
+from src.config import DB_CONFIG, PARSER_CONFIG, RENDER_SERVICE_CONFIG
+from src.product_processor import ProductProcessor
+from src.product_pipeline import parse_html
+from src.rate_limiter import RateLimitedSession
+from src import pipeline_db
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(threadName)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+logger = logging.getLogger(__name__)
+
+class QueueFull(Exception):
+    """Очередь заданий переполнена"""
+
+class RenderJob:
+    """Задание на парсинг одного товара"""
+
+    def __init__(self, product_id, url, prod_type, use_selenium):
+        self.product_id = product_id
+        self.url = url
+        self.prod_type = prod_type
+        self.use_selenium = use_selenium
+        self.enqueued = time.monotonic()
+        self.future = Future()
+
+class RenderService:
+    """Очередь заданий, прогретые воркеры и пул соединений"""
+
+    def __init__(self, browsers=None, queue_size=None, db_pool_size=None, recycle_pages=None, headless=True):
+        self.browsers = RENDER_SERVICE_CONFIG['browsers'] if browsers is None else browsers
+        self.recycle_pages = recycle_pages or RENDER_SERVICE_CONFIG['recycle_pages']
+        self.headless = headless
+        self.jobs = queue.Queue(maxsize=queue_size or RENDER_SERVICE_CONFIG['queue_size'])
+        pool_size = db_pool_size or RENDER_SERVICE_CONFIG['db_pool_size']
+        self.db_pool = ThreadedConnectionPool(1, pool_size, **DB_CONFIG)
+        # getconn() при пустом пуле бросает PoolError, а не ждет: потоки HTTP и
+        # воркеры ждут свободное соединение на семафоре
+        self._db_slots = threading.BoundedSemaphore(pool_size)
+        self.workers = []
+        self.stats = {'done': 0, 'failed': 0, 'busy': 0, 'browsers_ready': 0}
+        self._stats_lock = threading.Lock()
+
+    def prepare_schema(self):
+        """Колонки и классификация URL - один раз при старте, а не на каждый запрос"""
+        processor = ProductProcessor(use_selenium=False)
+        processor.close()
+
+    def start(self):
+        # Без браузеров сервис все равно держит хотя бы один requests-воркер
+        for worker_id in range(max(1, self.browsers)):
+            thread = threading.Thread(
+                target=self._worker_main, args=(worker_id,), name=f"render-{worker_id}", daemon=True
+            )
+            thread.start()
+            self.workers.append(thread)
+
+    # ======================
+    # БД
+    # ======================
+
+    @contextmanager
+    def _connection(self):
+        """Соединение из пула; ждет, пока другой поток не вернет свое"""
+        with self._db_slots:
+            conn = self.db_pool.getconn()
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                self.db_pool.putconn(conn)
+
+    def _query(self, sql, params):
+        with self._connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                cursor.execute(sql, params)
+                return cursor.fetchall()
+
+    def _write_result(self, job, result):
+        sql, params = pipeline_db.build_result_update(job.product_id, result, job.prod_type)
+        with self._connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(sql, params)
+
+    # ======================
+    # ЗАДАНИЯ
+    # ======================
+
+    def submit(self, product_id, use_selenium=True):
+        """
+        Постановка товара в очередь
+
+        Returns:
+            RenderJob или None, если товара нет
+        """
+        rows = self._query("SELECT id, url, prod_type FROM products WHERE id = %s;", (product_id,))
+        if not rows:
+            return None
+
+        job = RenderJob(rows[0]['id'], rows[0]['url'], rows[0]['prod_type'] or 'product', use_selenium)
+        try:
+            self.jobs.put_nowait(job)
+        except queue.Full:
+            raise QueueFull(f"Очередь заполнена ({self.jobs.maxsize})")
+        return job
+
+    def submit_batch(self, count, use_selenium=True):
+        """Постановка в очередь N непропарсенных товаров (как --process N)"""
+        rows = self._query("""
+        SELECT id FROM products
+        WHERE prod_type = 'product'
+          AND (parse_status IS NULL OR parse_status = 'pending' OR parse_status = 'failed')
+        ORDER BY
+            CASE WHEN parse_status = 'failed' THEN 2 WHEN parse_status IS NULL THEN 1 ELSE 0 END,
+            created_at ASC
+        LIMIT %s;
+        """, (count,))
+        return [self.submit(row['id'], use_selenium) for row in rows]
+
+    def _worker_main(self, worker_id):
+        """Воркер: свой браузер (прогрет заранее) и своя HTTP-сессия"""
+        session = RateLimitedSession()
+        session.headers.update({
+            'User-Agent': PARSER_CONFIG['user_agent'],
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+            'Accept-Language': 'ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7',
+        })
+        parser = self._start_browser(worker_id) if worker_id < self.browsers else None
+        pages = 0
+
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            if not job.future.set_running_or_notify_cancel():
+                continue
+
+            with self._stats_lock:
+                self.stats['busy'] += 1
+            started = time.monotonic()
+
+            try:
+                result = self._render(parser, session, job)
+                self._write_result(job, result)
+                job.future.set_result(self._summary(job, result, started))
+                pages += 1
+            except Exception as e:
+                logger.error(f"❌ Ошибка обработки товара {job.product_id}: {e}")
+                job.future.set_exception(e)
+            finally:
+                with self._stats_lock:
+                    self.stats['busy'] -= 1
+
+            if parser and pages >= self.recycle_pages:
+                logger.info(f"♻️ Перезапуск браузера после {pages} страниц")
+                parser.close()
+                parser = self._start_browser(worker_id)
+                pages = 0
+
+        if parser:
+            parser.close()
+
+    def _start_browser(self, worker_id):
+        from src.selenium_parser import SeleniumParser
+
+        try:
+            started = time.monotonic()
+            parser = SeleniumParser(headless=self.headless, cache_slot=worker_id)
+            with self._stats_lock:
+                self.stats['browsers_ready'] += 1
+            logger.info(f"🚀 Браузер {worker_id} прогрет за {time.monotonic() - started:.1f}с")
+            return parser
+        except Exception as e:
+            logger.error(f"❌ Браузер {worker_id} не запустился, воркер работает через requests: {e}")
+            return None
+
+    def _parse_with_requests(self, session, url, source):
+        try:
+            response = session.get(url, timeout=PARSER_CONFIG['timeout'])
+            response.raise_for_status()
+            result = parse_html(response.content, url)
+        except Exception as e:
+            result = {'success': False, 'data': None, 'error': str(e)}
+        result['source'] = source
+        return result
+
+    def _render(self, parser, session, job):
+        if job.prod_type != 'product':
+            return {'success': False, 'data': None, 'error': None, 'source': 'render_service'}
+
+        if not (job.use_selenium and parser):
+            return self._parse_with_requests(session, job.url, 'render_service')
+
+        result = parser.extract_data_directly(job.url)
+        if not result['success'] or not result['data'] or not result['data'].get('prod_name'):
+            logger.warning(f"⚠️ Selenium не нашел данные, пробую requests: {job.url}")
+            result = self._parse_with_requests(session, job.url, 'selenium_fallback')
+        return result
+
+    def _summary(self, job, result, started):
+        with self._stats_lock:
+            self.stats['done' if result['success'] else 'failed'] += 1
+
+        data = result.get('data') or {}
+        return {
+            'success': bool(result['success']),
+            'product_id': job.product_id,
+            'source': result.get('source'),
+            'prod_name': data.get('prod_name'),
+            'prod_price_new': data.get('prod_price_new'),
+            'characteristics': len(data.get('characteristics') or {}),
+            'error': result.get('error'),
+            'queued_seconds': round(started - job.enqueued, 3),
+            'seconds': round(time.monotonic() - started, 3),
+        }
+
+    def health(self):
+        with self._stats_lock:
+            return dict(self.stats, queue=self.jobs.qsize(), workers=len(self.workers))
+
+    def close(self):
+        for _ in self.workers:
+            self.jobs.put(None)
+        for thread in self.workers:
+            thread.join(timeout=30)
+        self.db_pool.closeall()
+
+class RenderHandler(BaseHTTPRequestHandler):
+    """HTTP-обертка над RenderService"""
+
+    service = None
+    request_timeout = RENDER_SERVICE_CONFIG['request_timeout']
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _wait(self, job):
+        try:
+            return 200, job.future.result(timeout=self.request_timeout)
+        except FutureTimeout:
+            return 504, {'success': False, 'product_id': job.product_id, 'error': 'Результат не готов, задание в очереди'}
+        except Exception as e:
+            return 500, {'success': False, 'product_id': job.product_id, 'error': str(e)}
+
+    def do_GET(self):
+        if urlsplit(self.path).path == '/health':
+            self._send_json(200, self.service.health())
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query)
+        use_selenium = (query.get('selenium') or ['1'])[0] in ('1', 'true')
+
+        try:
+            match = re.match(r'^/parse/(\d+)$', parts.path)
+            if match:
+                job = self.service.submit(int(match.group(1)), use_selenium)
+                if job is None:
+                    self._send_json(404, {'success': False, 'error': 'Товар не найден'})
+                    return
+                self._send_json(*self._wait(job))
+                return
+
+            if parts.path == '/parse-batch':
+                count = int((query.get('count') or ['10'])[0])
+                jobs = self.service.submit_batch(count, use_selenium)
+                results = [self._wait(job)[1] for job in jobs]
+                self._send_json(200, {
+                    'success': all(r['success'] for r in results),
+                    'count': len(results),
+                    'results': results
+                })
+                return
+
+            self._send_json(404, {'error': 'not found'})
+
+        except QueueFull as e:
+            self._send_json(503, {'success': False, 'error': str(e)})
+        except Exception as e:
+            logger.error(f"❌ Ошибка запроса {self.path}: {e}")
+            self._send_json(500, {'success': False, 'error': str(e)})
+
+def main():
+    parser = argparse.ArgumentParser(description='Сервис парсинга с прогретыми браузерами и пулом соединений')
+    parser.add_argument('--host', default=RENDER_SERVICE_CONFIG['host'], help='Адрес (по умолчанию: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=RENDER_SERVICE_CONFIG['port'],
+                        help=f"Порт (по умолчанию: {RENDER_SERVICE_CONFIG['port']})")
+    parser.add_argument('--browsers', type=int, default=RENDER_SERVICE_CONFIG['browsers'],
+                        help='Прогретых браузеров (0 - только requests)')
+    parser.add_argument('--no-headless', action='store_true', help='Показывать браузеры')
+    args = parser.parse_args()
+
+    service = RenderService(browsers=args.browsers, headless=not args.no_headless)
+    service.prepare_schema()
+    service.start()
+
+    RenderHandler.service = service
+    server = ThreadingHTTPServer((args.host, args.port), RenderHandler)
+    server.daemon_threads = True
+
+    def stop(signum, frame):
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    print(f"🛰️  Сервис парсинга: http://{args.host}:{args.port} (браузеров: {args.browsers})")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        print("🔌 Сервис парсинга остановлен")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+# reparse_snapshots.py
+#!/usr/bin/env python3
+"""
+Офлайн-перепарсинг сохраненных снимков Selenium страниц.
+
+Берет последний снимок каждого URL из data/snapshots, прогоняет через
+экстрактор (по умолчанию src.universal_parser) в пуле процессов и
+показывает, сколько полей найдено. С --write записывает результаты в БД.
+Исправление селекторов стоит минут CPU вместо часов работы браузера.
+
+Примеры:
+  python reparse_snapshots.py                         # отчет по всем снимкам
+  python reparse_snapshots.py --workers 8 --write     # перепарсить и записать в БД
+  python reparse_snapshots.py --extractor mymodule:parse_page --limit 100
+"""
+
+import argparse
+import importlib
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+
+import psycopg2
+from bs4 import BeautifulSoup
+
+from src.config import DB_CONFIG
+from src.snapshot_store import SnapshotStore, load_snapshot
+from src.product_processor import missing_fields
+from src import pipeline_db
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_EXTRACTOR = 'src.universal_parser:parse_product_page'
+
+def _load_extractor(spec):
+    module_name, func_name = spec.split(':')
+    return getattr(importlib.import_module(module_name), func_name)
+
+def reparse_one(args):
+    """
+    Перепарсинг одного снимка (в процессе-воркере)
+
+    Экстрактор сам глушит ошибки и отдает пустые поля, поэтому успех -
+    только если есть все обязательные поля, как в ProductProcessor.
+    """
+    url, path, rendered_at, extractor_spec = args
+    result = {'success': False, 'data': None, 'error': None, 'source': 'snapshot', 'rendered_at': rendered_at}
+    try:
+        extractor = _load_extractor(extractor_spec)
+        soup = BeautifulSoup(load_snapshot(path), 'html.parser')
+        result['data'] = extractor(soup, url)
+    except Exception as e:
+        result['error'] = str(e)
+        return url, result
+
+    missing = missing_fields(result['data'])
+    if missing:
+        result['error'] = f"Нет обязательных полей: {', '.join(missing)}"
+    else:
+        result['success'] = True
+    return url, result
+
+def write_results(results):
+    """
+    Запись результатов в БД одной транзакцией
+
+    Пишутся только полные результаты и только если товар не перепарсен
+    после снимка (parsed_at новее времени снимка). parsed_at записывается
+    временем снимка, поэтому снимок можно перепарсить повторно.
+
+    Returns:
+        tuple: (записано, пропущено как устаревшие)
+    """
+    complete = [(url, result) for url, result in results if result['success']]
+    if not complete:
+        return 0, 0
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    written = stale = 0
+    try:
+        with conn.cursor() as cursor:
+            # FOR UPDATE: парсер не запишет товар между проверкой и записью
+            cursor.execute(
+                "SELECT id, url, parsed_at FROM products WHERE url = ANY(%s) FOR UPDATE;",
+                ([url for url, _ in complete],)
+            )
+            rows = {url: (product_id, parsed_at) for product_id, url, parsed_at in cursor.fetchall()}
+
+            for url, result in complete:
+                if url not in rows:
+                    continue
+                product_id, parsed_at = rows[url]
+                if parsed_at and parsed_at > result['rendered_at']:
+                    stale += 1
+                    continue
+                sql, params = pipeline_db.build_result_update(product_id, result, 'product')
+                cursor.execute(sql, params)
+                written += 1
+
+        conn.commit()
+    except Exception as e:
+        logger.error(f"❌ Ошибка записи результатов: {e}")
+        conn.rollback()
+        written = 0
+    finally:
+        conn.close()
+    return written, stale
+
+def main():
+    parser = argparse.ArgumentParser(description='Перепарсинг снимков Selenium страниц без браузера')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Процессов (по умолчанию: число CPU)')
+    parser.add_argument('--limit', type=int, help='Ограничение количества снимков')
+    parser.add_argument('--extractor', default=DEFAULT_EXTRACTOR, help=f'module:function (по умолчанию: {DEFAULT_EXTRACTOR})')
+    parser.add_argument('--snapshots', type=str, default=None, help='Каталог снимков (по умолчанию из SNAPSHOT_CONFIG)')
+    parser.add_argument('--write', action='store_true', help='Записать результаты в БД')
+    args = parser.parse_args()
+
+    store = SnapshotStore(base_dir=args.snapshots)
+    tasks = []
+    for url, path, rendered_at in store.iter_latest():
+        tasks.append((url, str(path), rendered_at, args.extractor))
+        if args.limit and len(tasks) >= args.limit:
+            break
+
+    if not tasks:
+        print("ℹ️ Снимков не найдено")
+        return
+
+    print(f"📸 Снимков: {len(tasks)}, процессов: {args.workers}, экстрактор: {args.extractor}")
+
+    start = time.monotonic()
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        results = list(executor.map(reparse_one, tasks, chunksize=16))
+    elapsed = time.monotonic() - start
+
+    fields = ['prod_name', 'prod_price_new', 'prod_article', 'prod_img_url', 'characteristics']
+    found = {field: 0 for field in fields}
+    errors = 0
+    for url, result in results:
+        if not result['success']:
+            errors += 1
+        for field in fields:
+            if (result['data'] or {}).get(field):
+                found[field] += 1
+
+    print(f"\n⏱️  Готово за {elapsed:.1f}с ({len(results) / max(elapsed, 0.001):.1f} страниц/с), "
+          f"неполных или с ошибкой: {errors}")
+    for field in fields:
+        print(f"   {field:16} {found[field]:6} из {len(results)}")
+
+    if args.write:
+        written, stale = write_results(results)
+        print(f"\n💾 Записано в БД: {written}, пропущено (товар перепарсен после снимка): {stale}")
+
+if __name__ == "__main__":
+    main()
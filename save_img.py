@@ -7,21 +7,51 @@
 import os
 import sys
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_batch
 import requests
 import logging
 from pathlib import Path
 import urllib.parse
+import re
 import time
+import asyncio
+import hashlib
+import queue
+import threading
+from collections import OrderedDict
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import argparse
+import json
+
+try:
+    import aiohttp
+except ImportError:  # без aiohttp доступен только режим потоков
+    aiohttp = None
 
 # Добавляем путь к проекту
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 try:
     from src.config import DB_CONFIG
+    from src.replica import ReadRouter
+    from src.rate_limiter import RateLimitedSession, PolitenessLimiter, get_rate_limiter
+    from src.image_writer import ImageInfoWriter
+    from src import image_derivatives
+    from src.config import IMAGE_DERIVATIVES_CONFIG, IMAGE_STORAGE_CONFIG, IMAGE_CACHE_CONFIG
+    from src.image_evictor import ImageEvictor
+    from src.image_sweeper import ImageSweeper
 except ImportError:
+    ImageSweeper = None
+    ImageInfoWriter = None
+    ImageEvictor = None
+    IMAGE_CACHE_CONFIG = {'max_mb': 0, 'interval': 300}
+    image_derivatives = None
+    IMAGE_DERIVATIVES_CONFIG = {'enabled': False}
+    IMAGE_STORAGE_CONFIG = {'backend': 'files', 'shard_size_mb': 1024, 'known_max': 50000}
+    ReadRouter = None
+    RateLimitedSession = requests.Session
+    PolitenessLimiter = None
+    get_rate_limiter = None
     # Настройки по умолчанию если config.py не найден
     DB_CONFIG = {
         'host': 'localhost',
@@ -31,6 +61,16 @@ except ImportError:
         'password': ''
     }
 
+try:
+    from src import phash
+except ImportError:  # без numpy поиск дубликатов недоступен
+    phash = None
+
+from src.image_store import (
+    ImageStore, CREATE_IMAGES_TABLE_SQL, INSERT_IMAGE_SQL, UPDATE_IMAGE_INFO_SQL, KNOWN_HASHES_SQL
+)
+from src.image_shards import ShardStore, is_shard_uri
+
 # Настройка логирования
 logging.basicConfig(
     level=logging.INFO,
@@ -45,10 +85,10 @@ logger = logging.getLogger(__name__)
 class ImageDownloader:
     """Загрузчик изображений товаров из базы данных"""
     
-    def __init__(self, base_dir='prod_images', max_workers=3):
+    def __init__(self, base_dir='prod_images', max_workers=3, derivatives=None):
         self.base_dir = Path(base_dir)
         self.max_workers = max_workers
-        self.session = requests.Session()
+        self.session = RateLimitedSession()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'image/webp,image/apng,image/*,*/*;q=0.8',
@@ -58,8 +98,25 @@ class ImageDownloader:
         # Создаем базовую директорию
         self.base_dir.mkdir(exist_ok=True, parents=True)
         
+        # Файлы хранятся по sha256, человекочитаемые пути - жесткие ссылки (или адреса в шардах)
+        if IMAGE_STORAGE_CONFIG['backend'] == 'shards':
+            self.store = ShardStore(self.base_dir, IMAGE_STORAGE_CONFIG['shard_size_mb'])
+        else:
+            self.store = ImageStore(self.base_dir)
+        # URL → (hash, путь объекта, размер, валидаторы HTTP): уже скачанное не качаем повторно.
+        # Не больше known_max URL: давно не встречавшиеся вытесняются (снова узнаются по хешу в хранилище)
+        self.known_images = OrderedDict()
+        self.known_max = IMAGE_STORAGE_CONFIG.get('known_max', 50000)
+        self.known_lock = threading.Lock()
+        
         # Подключаемся к базе данных
         self.connection = None
+        self.read_router = None
+        # Писатель информации о файлах на время пакетной загрузки (None - запись напрямую)
+        self.info_writer = None
+        # Превью после загрузки (пул процессов на время пакетной загрузки)
+        self.derivatives_enabled = IMAGE_DERIVATIVES_CONFIG['enabled'] if derivatives is None else derivatives
+        self.derivatives = None
         self.connect_db()
         
         # Создаем необходимые колонки в БД
@@ -75,6 +132,8 @@ class ImageDownloader:
                 user=DB_CONFIG['user'],
                 password=DB_CONFIG['password']
             )
+            if ReadRouter:
+                self.read_router = ReadRouter(self.connection)
             logger.info("✅ Подключение к PostgreSQL успешно")
         except Exception as e:
             logger.error(f"❌ Ошибка подключения к PostgreSQL: {e}")
@@ -98,7 +157,15 @@ class ImageDownloader:
                 columns_to_add = [
                     ('img_local_path', 'TEXT'),
                     ('img_file_size', 'INTEGER'),
-                    ('img_downloaded_at', 'TIMESTAMP')
+                    ('img_hash', 'TEXT'),  # sha256 содержимого
+                    ('img_downloaded_at', 'TIMESTAMP'),
+                    # Валидаторы HTTP для условной перепроверки (--all)
+                    ('img_etag', 'TEXT'),
+                    ('img_last_modified', 'TEXT'),
+                    ('img_content_length', 'BIGINT'),
+                    ('img_derivatives', 'JSONB'),  # превью: {"<размер>": "<путь>"}
+                    ('img_phash', 'BIGINT'),  # dHash для поиска почти одинаковых картинок
+                    ('img_evicted_at', 'TIMESTAMP')  # оригинал вытеснен по бюджету диска
                 ]
                 
                 added_count = 0
@@ -112,10 +179,15 @@ class ImageDownloader:
                             logger.error(f"❌ Ошибка добавления колонки {column_name}: {e}")
                 
                 if added_count > 0:
-                    self.connection.commit()
                     logger.info(f"✅ Добавлено {added_count} новых колонок в таблицу products")
                 else:
                     logger.info("✅ Все необходимые колонки уже существуют")
+                
+                # Объекты контентно-адресуемого хранилища
+                cursor.execute(CREATE_IMAGES_TABLE_SQL)
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_products_img_hash ON products(img_hash);")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_products_prod_img_url ON products(prod_img_url);")
+                self.connection.commit()
                     
         except Exception as e:
             logger.error(f"❌ Ошибка при создании колонок: {e}")
@@ -145,6 +217,11 @@ class ImageDownloader:
                     parsed_at,
                     img_local_path,
                     img_file_size,
+                    img_hash,
+                    img_etag,
+                    img_last_modified,
+                    img_content_length,
+                    img_derivatives,
                     img_downloaded_at
                 FROM products 
                 WHERE prod_img_url IS NOT NULL 
@@ -157,6 +234,9 @@ class ImageDownloader:
                 # Только не загруженные
                 if only_not_downloaded:
                     query += " AND img_local_path IS NULL"
+                    # Вытесненные загружаются заново только по запросу (--id, CRM)
+                    if not product_ids:
+                        query += " AND img_evicted_at IS NULL"
                 
                 # Если указаны конкретные ID
                 if product_ids:
@@ -221,6 +301,207 @@ class ImageDownloader:
             logger.error(f"❌ Ошибка парсинга URL {image_url}: {e}")
             return None, None, None
     
+    def prepare_target(self, product):
+        """
+        Человекочитаемый путь: каталог из URL, имя <артикул>_<id>
+        
+        Имя однозначно определяется товаром, поэтому повторная загрузка
+        заменяет ссылку, а не ищет свободный суффикс.
+        
+        Returns:
+            Path: Полный путь к файлу или None
+        """
+        local_path, base_name, extension = self.parse_image_url(product['prod_img_url'])
+        if not local_path:
+            return None
+        
+        article = product['prod_article'] or str(product['id'])
+        safe_name = article.replace('/', '_').replace('\\', '_').replace(':', '_')
+        return local_path / f"{safe_name}_{product['id']}{extension}"
+    
+    def load_known_images(self, products):
+        """Хеши уже скачанных URL (одним запросом на всю пачку)"""
+        urls = list({p['prod_img_url'] for p in products})
+        if not urls:
+            return
+        try:
+            with self.connection.cursor() as cursor:
+                cursor.execute(KNOWN_HASHES_SQL, (urls,))
+                for url, img_hash, path, file_size, *validators in cursor.fetchall():
+                    self.remember_known(url, (img_hash, path, file_size, tuple(validators)))
+            if self.known_images:
+                logger.info(f"♻️ Уже есть в хранилище: {len(self.known_images)} URL")
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось получить известные хеши: {e}")
+            self.connection.rollback()
+    
+    def remember_known(self, url, known):
+        with self.known_lock:
+            self.known_images[url] = known
+            self.known_images.move_to_end(url)
+            while len(self.known_images) > self.known_max:
+                self.known_images.popitem(last=False)
+    
+    def reuse_known(self, product, result):
+        """
+        Товар с уже скачанным URL: ссылка на существующий объект без загрузки
+        
+        Returns:
+            bool: True, если загрузка не нужна
+        """
+        with self.known_lock:
+            known = self.known_images.get(product['prod_img_url'])
+            if known:
+                self.known_images.move_to_end(product['prod_img_url'])
+        if not known or not self.store.exists(known[1]):
+            return False
+        
+        img_hash, object_path, file_size, validators = known
+        target = self.prepare_target(product)
+        local_path = self.store.link(object_path, target) if target else object_path
+        self.record_download(product['id'], str(local_path), file_size, img_hash, object_path, validators)
+        
+        result.update(success=True, local_path=str(local_path), file_size=file_size, img_hash=img_hash, reused=True)
+        logger.info(f"♻️ {product['id']}: уже загружено ({img_hash[:12]}) → {os.path.basename(local_path)}")
+        return True
+    
+    def store_download(self, product, tmp_path, img_hash, file_size, result, validators=(None, None, None)):
+        """Загруженный файл - в хранилище, ссылка по человекочитаемому пути, запись в БД"""
+        target = self.prepare_target(product)
+        extension = target.suffix if target else '.jpg'
+        object_path, is_new = self.store.commit(tmp_path, img_hash, extension)
+        local_path = self.store.link(object_path, target) if target else object_path
+        
+        self.remember_known(product['prod_img_url'], (img_hash, str(object_path), file_size, validators))
+        self.record_download(product['id'], str(local_path), file_size, img_hash, str(object_path), validators)
+        
+        result.update(success=True, local_path=str(local_path), file_size=file_size, img_hash=img_hash,
+                      deduplicated=not is_new)
+        return local_path
+    
+    def conditional_headers(self, product):
+        """
+        Заголовки условного GET для уже скачанного изображения
+        
+        Returns:
+            dict: If-None-Match / If-Modified-Since или пустой словарь
+        """
+        local_path = product.get('img_local_path')
+        if not local_path or not self.store.exists(local_path):
+            return {}
+        
+        headers = {}
+        if product.get('img_etag'):
+            headers['If-None-Match'] = product['img_etag']
+        if product.get('img_last_modified'):
+            headers['If-Modified-Since'] = product['img_last_modified']
+        return headers
+    
+    @staticmethod
+    def response_validators(headers):
+        """(ETag, Last-Modified, Content-Length) из заголовков ответа"""
+        content_length = headers.get('Content-Length')
+        return (
+            headers.get('ETag'),
+            headers.get('Last-Modified'),
+            int(content_length) if content_length and content_length.isdigit() else None
+        )
+    
+    def is_unchanged(self, product, status, validators):
+        """
+        Изображение на сервере не изменилось
+        
+        304 - ответ на условный GET. Сервер, игнорирующий условные заголовки,
+        отвечает 200: тогда сравниваем ETag, а без него - Last-Modified вместе
+        с Content-Length, и тело не читаем.
+        """
+        if not self.conditional_headers(product):
+            return False
+        if status == 304:
+            return True
+        
+        etag, last_modified, content_length = validators
+        if etag and product.get('img_etag'):
+            return etag == product['img_etag']
+        return bool(
+            last_modified and last_modified == product.get('img_last_modified')
+            and content_length and content_length == product.get('img_content_length')
+        )
+    
+    def mark_unchanged(self, product, result, started):
+        """Файл актуален: ничего не пишем ни на диск, ни в БД"""
+        result.update(
+            success=True, unchanged=True,
+            local_path=product['img_local_path'],
+            file_size=product.get('img_file_size') or 0,
+            img_hash=product.get('img_hash'),
+            seconds=time.monotonic() - started
+        )
+        logger.info(f"🟰 {product['id']}: не изменилось → {os.path.basename(product['img_local_path'])}")
+    
+    def open_partial(self, product):
+        """
+        Недокачанный файл товара и заголовки запроса
+        
+        Returns:
+            tuple: (путь .part, уже скачано байт, заголовки)
+        """
+        part_path = self.store.partial_path(f"{product['id']}:{product['prod_img_url']}")
+        offset, validator = self.store.read_partial(part_path)
+        if offset and validator:
+            # If-Range: если файл на сервере изменился, придет целиком (200)
+            return part_path, offset, {'Range': f'bytes={offset}-', 'If-Range': validator}
+        if offset:
+            # Без валидатора нельзя убедиться, что докачиваем тот же файл
+            self.store.discard_partial(part_path)
+        return part_path, 0, self.conditional_headers(product)
+    
+    @staticmethod
+    def resume_plan(status, headers, offset, validators):
+        """
+        Разбор ответа: докачка или загрузка с начала
+        
+        Returns:
+            tuple: (дописывать ли в .part, ожидаемый полный размер, валидаторы полного файла)
+            или None, если .part нужно выбросить и начать заново (416, чужой Content-Range)
+        """
+        etag, last_modified, content_length = validators
+        if status == 416:
+            return None
+        if status == 206:
+            match = re.match(r'bytes (\d+)-\d+/(\d+)', headers.get('Content-Range', ''))
+            if not match or int(match.group(1)) != offset:
+                return None
+            total = int(match.group(2))
+            return True, total, (etag, last_modified, total)
+        return False, content_length, validators
+    
+    def start_partial(self, part_path, append, validators):
+        """Хеш уже скачанной части (докачка) или новый .part с валидатором для будущей докачки"""
+        if append:
+            return self.store.hash_file(part_path)
+        self.store.write_partial_meta(part_path, validators[0], validators[1])
+        return hashlib.sha256()
+    
+    def finish_partial(self, product, part_path, digest, expected, validators, result, started):
+        """Проверка размера по Content-Length, перенос в хранилище и запись в БД"""
+        file_size = os.path.getsize(part_path)
+        if expected and file_size < expected:
+            # Обрыв соединения: .part остается и докачается при следующем запуске
+            raise IOError(f"получено {file_size} из {expected} байт, докачается при следующем запуске")
+        if file_size == 0 or (expected and file_size > expected):
+            self.store.discard_partial(part_path)
+            raise IOError("Файл пустой" if file_size == 0 else f"получено {file_size} байт вместо {expected}")
+        
+        local_path = self.store_download(product, part_path, digest.hexdigest(), file_size, result, validators)
+        result['seconds'] = time.monotonic() - started
+        
+        resumed = f" (докачано с {result['resumed'] // 1024} KB)" if result.get('resumed') else ""
+        dedup = " (дубликат, сохранена ссылка)" if result.get('deduplicated') else ""
+        prod_name = product['prod_name'] or f"product_{product['id']}"
+        logger.info(f"✅ {product['id']}: {prod_name[:30]}... → {os.path.basename(local_path)} "
+                    f"({file_size // 1024} KB){resumed}{dedup}")
+    
     def download_image(self, product):
         """
         Загрузка одного изображения
@@ -234,7 +515,6 @@ class ImageDownloader:
         product_id = product['id']
         image_url = product['prod_img_url']
         prod_name = product['prod_name'] or f"product_{product_id}"
-        article = product['prod_article'] or str(product_id)
         
         result = {
             'product_id': product_id,
@@ -246,79 +526,49 @@ class ImageDownloader:
         }
         
         try:
-            # Парсим URL для создания пути
-            local_path, base_name, extension = self.parse_image_url(image_url)
-            
-            if not local_path:
-                result['error'] = "Не удалось распарсить URL"
+            if self.reuse_known(product, result):
                 return result
             
-            # Создаем директории
-            local_path.mkdir(exist_ok=True, parents=True)
-            
-            # Используем артикул или ID в имени файла для удобства
-            safe_name = article.replace('/', '_').replace('\\', '_').replace(':', '_')
-            
-            # Проверяем, нет ли уже файла с таким именем
-            counter = 1
-            original_name = safe_name
-            filename = f"{safe_name}{extension}"
-            full_path = local_path / filename
-            
-            # Если файл существует, добавляем номер
-            while full_path.exists():
-                safe_name = f"{original_name}_{counter}"
-                filename = f"{safe_name}{extension}"
-                full_path = local_path / filename
-                counter += 1
-            
-            # Загружаем изображение
+            # Загружаем изображение (условно, если копия уже есть; докачка, если есть .part)
             logger.debug(f"📥 Загрузка {product_id}: {image_url}")
+            started = time.monotonic()
+            part_path, offset, headers = self.open_partial(product)
             
             response = self.session.get(
                 image_url, 
                 timeout=30,
-                stream=True
+                stream=True,
+                headers=headers
             )
+            
+            validators = self.response_validators(response.headers)
+            plan = self.resume_plan(response.status_code, response.headers, offset, validators)
+            if plan is None:
+                response.close()
+                self.store.discard_partial(part_path)
+                return self.download_image(product)
             response.raise_for_status()
             
-            # Определяем Content-Type для правильного расширения
-            content_type = response.headers.get('Content-Type', '')
-            if 'jpeg' in content_type or 'jpg' in content_type:
-                extension = '.jpg'
-            elif 'png' in content_type:
-                extension = '.png'
-            elif 'webp' in content_type:
-                extension = '.webp'
-            elif 'gif' in content_type:
-                extension = '.gif'
-            
-            # Сохраняем файл
-            with open(full_path, 'wb') as f:
+            if self.is_unchanged(product, response.status_code, validators):
+                response.close()
+                self.store.discard_partial(part_path)
+                self.mark_unchanged(product, result, started)
+                return result
+            
+            # Пишем в .part, считая хеш по ходу записи
+            append, expected, validators = plan
+            if append:
+                result['resumed'] = offset
+            digest = self.start_partial(part_path, append, validators)
+            with open(part_path, 'ab' if append else 'wb') as f:
                 for chunk in response.iter_content(chunk_size=8192):
                     if chunk:
                         f.write(chunk)
+                        digest.update(chunk)
+                f.flush()
+                os.fsync(f.fileno())
             
-            # Получаем размер файла
-            file_size = os.path.getsize(full_path)
-            
-            # Проверяем, что файл не пустой
-            if file_size == 0:
-                os.remove(full_path)
-                result['error'] = "Файл пустой"
-                return result
-            
-            # Записываем информацию о загруженном файле в БД
-            self.save_download_info(product_id, str(full_path), file_size)
-            
-            result['success'] = True
-            result['local_path'] = str(full_path)
-            result['file_size'] = file_size
-            
-            logger.info(f"✅ {product_id}: {prod_name[:30]}... → {filename} ({file_size // 1024} KB)")
-            
-            # Небольшая пауза между запросами
-            time.sleep(0.5)
+            self.finish_partial(product, part_path, digest, expected, validators, result, started)
             
         except requests.exceptions.RequestException as e:
             result['error'] = f"Ошибка сети: {e}"
@@ -329,19 +579,126 @@ class ImageDownloader:
         
         return result
     
-    def save_download_info(self, product_id, local_path, file_size):
+    def record_download(self, product_id, local_path, file_size, img_hash=None, object_path=None,
+                        validators=(None, None, None)):
+        """Информация о файле - писателю (пакетная загрузка) или сразу в БД"""
+        if self.info_writer:
+            self.info_writer.put(product_id, local_path, file_size, img_hash, object_path, validators)
+        else:
+            self.save_download_info(product_id, local_path, file_size, img_hash, object_path, validators)
+    
+    def start_info_writer(self):
+        """Запуск писателя на время пакетной загрузки"""
+        if ImageInfoWriter is None:
+            return
+        try:
+            self.info_writer = ImageInfoWriter().start()
+        except Exception as e:
+            logger.warning(f"⚠️ Писатель информации не запущен, пишем напрямую: {e}")
+            self.info_writer = None
+    
+    def stop_info_writer(self):
+        if self.info_writer:
+            self.info_writer.close()
+            self.info_writer = None
+    
+    def start_derivatives(self):
+        """Запуск пула превью на время пакетной загрузки"""
+        if not self.derivatives_enabled or not image_derivatives:
+            return
+        if not image_derivatives.is_available():
+            logger.info("ℹ️ Pillow не установлен - превью не строятся")
+            return
+        self.derivatives = image_derivatives.DerivativeBuilder(self.base_dir).start()
+    
+    def queue_derivatives(self, product, result):
+        """Превью для загруженного изображения (неизменившиеся с готовыми превью пропускаем)"""
+        if not self.derivatives or not result['success'] or not result.get('img_hash'):
+            return
+        if result.get('unchanged') and product.get('img_derivatives'):
+            return
+        self.derivatives.submit(product['id'], result['local_path'], result['img_hash'])
+    
+    def write_derivatives(self, wait=True):
+        """
+        Запись путей превью в БД
+        
+        Args:
+            wait: False - только уже построенные (по ходу потоковой загрузки)
+        """
+        try:
+            results = self.derivatives.collect(wait=wait)
+            if results:
+                with self.connection.cursor() as cursor:
+                    execute_batch(cursor, image_derivatives.UPDATE_DERIVATIVES_SQL, [
+                        (json.dumps(paths), phash, product_id) for product_id, paths, phash in results
+                    ])
+                self.connection.commit()
+                logger.debug(f"💾 Записаны превью для {len(results)} товаров")
+        except Exception as e:
+            logger.error(f"❌ Ошибка сохранения превью: {e}")
+            self.connection.rollback()
+    
+    def finish_derivatives(self):
+        """Ожидание пула превью и запись путей в БД"""
+        if not self.derivatives:
+            return
+        
+        try:
+            self.write_derivatives()
+            stats = self.derivatives.stats
+            logger.info(f"🖼️ Превью: {stats['images']} изображений для {stats['products']} товаров, "
+                        f"ошибок {stats['failed']}")
+        finally:
+            self.derivatives.close()
+            self.derivatives = None
+    
+    def build_missing_derivatives(self, limit=None):
+        """
+        Превью и перцептивный хеш для уже загруженных изображений, у которых их нет
+        
+        Returns:
+            int: Количество товаров, поставленных в обработку
+        """
+        query = """
+        SELECT id, img_local_path, img_hash
+        FROM products
+        WHERE img_hash IS NOT NULL
+          AND img_local_path IS NOT NULL
+          AND (img_derivatives IS NULL OR img_phash IS NULL)
+        ORDER BY id
+        """
+        params = []
+        if limit:
+            query += " LIMIT %s"
+            params.append(limit)
+        
+        with self.connection.cursor() as cursor:
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+        
+        self.start_derivatives()
+        if not self.derivatives:
+            return 0
+        
+        for product_id, local_path, img_hash in rows:
+            if self.store.exists(local_path):
+                self.derivatives.submit(product_id, local_path, img_hash)
+        
+        count = len(self.derivatives.waiting)
+        self.finish_derivatives()
+        return count
+    
+    def save_download_info(self, product_id, local_path, file_size, img_hash=None, object_path=None,
+                           validators=(None, None, None)):
         """
         Сохранение информации о загруженном изображении в БД
         """
         try:
             with self.connection.cursor() as cursor:
-                cursor.execute("""
-                UPDATE products 
-                SET img_local_path = %s,
-                    img_file_size = %s,
-                    img_downloaded_at = NOW()
-                WHERE id = %s;
-                """, (local_path, file_size, product_id))
+                if img_hash and object_path:
+                    cursor.execute(INSERT_IMAGE_SQL, (img_hash, object_path, file_size))
+                cursor.execute(UPDATE_IMAGE_INFO_SQL, (local_path, file_size, img_hash, *validators, product_id))
                 
                 self.connection.commit()
                 logger.debug(f"💾 Информация о файле сохранена для товара {product_id}")
@@ -350,6 +707,64 @@ class ImageDownloader:
             logger.warning(f"⚠️ Не удалось сохранить информацию о файле: {e}")
             self.connection.rollback()
     
+    @staticmethod
+    def new_stats(total):
+        return {
+            'total': total,
+            'success': 0,
+            'failed': 0,
+            'total_size': 0,
+            'reused': 0,
+            'deduplicated': 0,
+            # Условная перепроверка: не изменилось / скачано заново
+            'unchanged': 0,
+            'bytes_saved': 0,
+            'revalidate_seconds': 0.0,
+            'bytes_downloaded': 0,
+            'download_seconds': 0.0,
+            # Докачка после обрыва
+            'resumed': 0,
+            'bytes_resumed': 0
+        }
+    
+    @staticmethod
+    def count_result(stats, product, result):
+        """Учет результата загрузки одного изображения"""
+        if not result['success']:
+            stats['failed'] += 1
+            logger.warning(f"⚠️ Не удалось загрузить {product['id']}: {result['error']}")
+            return
+        
+        stats['success'] += 1
+        stats['total_size'] += result['file_size']
+        stats['reused'] += result.get('reused', False)
+        stats['deduplicated'] += result.get('deduplicated', False)
+        if result.get('resumed'):
+            stats['resumed'] += 1
+            stats['bytes_resumed'] += result['resumed']
+        
+        if result.get('unchanged'):
+            stats['unchanged'] += 1
+            stats['bytes_saved'] += result['file_size']
+            stats['revalidate_seconds'] += result['seconds']
+        elif 'seconds' in result:
+            stats['bytes_downloaded'] += result['file_size']
+            stats['download_seconds'] += result['seconds']
+    
+    @staticmethod
+    def seconds_saved(stats):
+        """
+        Оценка сэкономленного времени: неизмененные байты по скорости
+        полных загрузок этого запуска минус время самих перепроверок
+        
+        Returns:
+            float или None, если полных загрузок не было
+        """
+        if not stats['bytes_downloaded'] or not stats['download_seconds']:
+            return None
+        per_byte = stats['download_seconds'] / stats['bytes_downloaded']
+        return max(0.0, stats['bytes_saved'] * per_byte - stats['revalidate_seconds'])
+    
     def download_images_batch(self, products, max_workers=None):
         """
         Пакетная загрузка изображений с многопоточностью
@@ -364,15 +779,22 @@ class ImageDownloader:
         if max_workers is None:
             max_workers = self.max_workers
         
-        stats = {
-            'total': len(products),
-            'success': 0,
-            'failed': 0,
-            'total_size': 0
-        }
+        stats = self.new_stats(len(products))
         
         logger.info(f"🚀 Начинаю загрузку {len(products)} изображений ({max_workers} потоков)")
         
+        self.start_info_writer()
+        self.start_derivatives()
+        try:
+            self._download_with_threads(products, max_workers, stats)
+        finally:
+            self.stop_info_writer()
+            self.finish_derivatives()
+        
+        return stats
+    
+    def _download_with_threads(self, products, max_workers, stats):
+        """Загрузка пулом потоков; БД трогает только писатель"""
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
             # Создаем задачи
             future_to_product = {
@@ -386,12 +808,8 @@ class ImageDownloader:
                 try:
                     result = future.result()
                     
-                    if result['success']:
-                        stats['success'] += 1
-                        stats['total_size'] += result['file_size']
-                    else:
-                        stats['failed'] += 1
-                        logger.warning(f"⚠️ Не удалось загрузить {product['id']}: {result['error']}")
+                    self.count_result(stats, product, result)
+                    self.queue_derivatives(product, result)
                         
                 except Exception as e:
                     stats['failed'] += 1
@@ -399,12 +817,136 @@ class ImageDownloader:
         
         return stats
     
+    def download_images_async(self, products, concurrency=8, rate=None):
+        """
+        Асинхронная загрузка изображений (aiohttp, общий пул соединений)
+        
+        Args:
+            products: Список товаров
+            concurrency: Одновременных загрузок
+            rate: Не больше N запросов в секунду от этого запуска (None - только общий лимит хоста)
+            
+        Returns:
+            dict: Статистика загрузки (как у download_images_batch)
+        """
+        if aiohttp is None:
+            logger.warning("⚠️ aiohttp не установлен - используем потоки")
+            return self.download_images_batch(products)
+        
+        logger.info(f"🚀 Начинаю асинхронную загрузку {len(products)} изображений (одновременно: {concurrency})")
+        self.start_info_writer()
+        self.start_derivatives()
+        try:
+            return asyncio.run(self._download_all_async(products, concurrency, rate))
+        finally:
+            self.stop_info_writer()
+            self.finish_derivatives()
+    
+    async def _download_all_async(self, products, concurrency, rate):
+        stats = self.new_stats(len(products))
+        
+        queue = asyncio.Queue()
+        for product in products:
+            queue.put_nowait(product)
+        
+        limiter = PolitenessLimiter(1.0 / rate) if rate and PolitenessLimiter else None
+        timeout = aiohttp.ClientTimeout(total=60, sock_read=30)
+        connector = aiohttp.TCPConnector(limit=concurrency, ttl_dns_cache=300)
+        
+        async def worker():
+            while True:
+                try:
+                    product = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                
+                result = await self._download_image_async(session, product, limiter)
+                self.count_result(stats, product, result)
+                self.queue_derivatives(product, result)
+        
+        started = time.monotonic()
+        async with aiohttp.ClientSession(
+            timeout=timeout, connector=connector, headers=dict(self.session.headers)
+        ) as session:
+            await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+        
+        elapsed = time.monotonic() - started
+        stats['elapsed'] = elapsed
+        logger.info(f"⏱️  {stats['success']} изображений за {elapsed:.1f}с ({stats['success'] / max(elapsed, 0.001):.1f}/с)")
+        return stats
+    
+    async def _download_image_async(self, session, product, limiter=None):
+        """Загрузка одного изображения с потоковой записью на диск"""
+        product_id = product['id']
+        image_url = product['prod_img_url']
+        prod_name = product['prod_name'] or f"product_{product_id}"
+        
+        result = {
+            'product_id': product_id,
+            'image_url': image_url,
+            'success': False,
+            'error': None,
+            'local_path': None,
+            'file_size': 0
+        }
+        
+        try:
+            if self.reuse_known(product, result):
+                return result
+            
+            if limiter:
+                await limiter.acquire()
+            if get_rate_limiter:
+                await get_rate_limiter().acquire_async()
+            
+            logger.debug(f"📥 Загрузка {product_id}: {image_url}")
+            started = time.monotonic()
+            part_path, offset, headers = self.open_partial(product)
+            
+            async with session.get(image_url, headers=headers) as response:
+                validators = self.response_validators(response.headers)
+                plan = self.resume_plan(response.status, response.headers, offset, validators)
+                if plan is None:
+                    response.close()
+                    self.store.discard_partial(part_path)
+                    return await self._download_image_async(session, product, limiter)
+                response.raise_for_status()
+                
+                if self.is_unchanged(product, response.status, validators):
+                    response.close()
+                    self.store.discard_partial(part_path)
+                    self.mark_unchanged(product, result, started)
+                    return result
+                
+                append, expected, validators = plan
+                if append:
+                    result['resumed'] = offset
+                digest = self.start_partial(part_path, append, validators)
+                with open(part_path, 'ab' if append else 'wb') as f:
+                    async for chunk in response.content.iter_chunked(64 * 1024):
+                        f.write(chunk)
+                        digest.update(chunk)
+                    f.flush()
+                    os.fsync(f.fileno())
+            
+            self.finish_partial(product, part_path, digest, expected, validators, result, started)
+            
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            result['error'] = f"Ошибка сети: {e}"
+            logger.error(f"❌ {product_id}: Ошибка загрузки: {e}")
+        except Exception as e:
+            result['error'] = f"Ошибка: {e}"
+            logger.error(f"❌ {product_id}: Неожиданная ошибка: {e}")
+        
+        return result
+    
     def show_statistics(self):
         """
-        Показать статистику загруженных изображений
+        Показать статистику загруженных изображений (с реплики, если она настроена)
         """
         try:
-            with self.connection.cursor(cursor_factory=RealDictCursor) as cursor:
+            conn = self.read_router.connection() if self.read_router else self.connection
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
                 # Статистика по товарам
                 cursor.execute("""
                 SELECT 
@@ -470,6 +1012,150 @@ class ImageDownloader:
         except Exception as e:
             logger.error(f"Ошибка получения статистики: {e}")
     
+    def find_duplicates(self, max_distance=6):
+        """
+        Группы почти одинаковых изображений по img_phash (с реплики, если она настроена)
+        
+        Returns:
+            tuple: (группы, {id: товар}, секунд на поиск)
+        """
+        conn = self.read_router.connection() if self.read_router else self.connection
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT id, img_phash FROM products WHERE img_phash IS NOT NULL;")
+            items = cursor.fetchall()
+        
+        started = time.monotonic()
+        clusters = phash.find_clusters(items, max_distance)
+        elapsed = time.monotonic() - started
+        logger.info(f"🔍 {len(items)} хешей, найдено групп: {len(clusters)} ({elapsed:.2f}с)")
+        
+        ids = [key for cluster in clusters for key in cluster['keys']]
+        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            cursor.execute("""
+            SELECT id, prod_name, prod_article, img_local_path, img_hash
+            FROM products
+            WHERE id = ANY(%s);
+            """, (ids,))
+            products = {row['id']: row for row in cursor.fetchall()}
+        
+        return clusters, products, elapsed
+    
+    def show_duplicates(self, max_distance=6, limit=20):
+        """Отчет о почти одинаковых изображениях"""
+        clusters, products, elapsed = self.find_duplicates(max_distance)
+        
+        print(f"\n🔍 ПОЧТИ ОДИНАКОВЫЕ ИЗОБРАЖЕНИЯ (расстояние ≤ {max_distance} бит)")
+        print("="*50)
+        print(f"Групп: {len(clusters)}, товаров в них: {sum(len(c['keys']) for c in clusters)} "
+              f"(поиск {elapsed:.2f}с)")
+        
+        for number, cluster in enumerate(clusters[:limit], 1):
+            files = {products[key]['img_hash'] for key in cluster['keys'] if key in products}
+            print(f"\n#{number}: {len(cluster['keys'])} товаров, {len(files)} файлов, "
+                  f"расстояние до {cluster['max_distance']}")
+            for key in cluster['keys'][:10]:
+                product = products.get(key)
+                if not product:
+                    continue
+                name = product['prod_name'] or f"Товар {key}"
+                print(f"  • {key} [{product['prod_article'] or '—'}] {name[:40]}")
+                print(f"    📁 {product['img_local_path']}")
+            if len(cluster['keys']) > 10:
+                print(f"  ... и еще {len(cluster['keys']) - 10}")
+        
+        if len(clusters) > limit:
+            print(f"\n... и еще {len(clusters) - limit} групп (--limit)")
+        print("="*50)
+    
+    def migrate_to_shards(self, delete_files=False, batch_size=200):
+        """
+        Перенос объектов из каталогов в шарды
+        
+        Адреса в images.path и products.img_local_path заменяются адресами
+        в шардах (одна транзакция на batch_size изображений). Файлы удаляются
+        только с delete_files и только после commit.
+        
+        Returns:
+            dict: Статистика переноса
+        """
+        store = self.store if isinstance(self.store, ShardStore) else \
+            ShardStore(self.base_dir, IMAGE_STORAGE_CONFIG['shard_size_mb'])
+        stats = {'images': 0, 'bytes': 0, 'missing': 0, 'files_deleted': 0}
+        
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT hash, path FROM images WHERE path NOT LIKE 'shard:%' ORDER BY hash;")
+            objects = cursor.fetchall()
+        logger.info(f"📦 Объектов для переноса в шарды: {len(objects)}")
+        
+        for start in range(0, len(objects), batch_size):
+            to_delete = []
+            with self.connection.cursor() as cursor:
+                for img_hash, path in objects[start:start + batch_size]:
+                    if not os.path.exists(path):
+                        stats['missing'] += 1
+                        continue
+                    
+                    uri, _ = store.append(path, img_hash, os.path.splitext(path)[1])
+                    cursor.execute("""
+                    SELECT img_local_path FROM products
+                    WHERE img_hash = %s AND img_local_path NOT LIKE 'shard:%%';
+                    """, (img_hash,))
+                    to_delete.append(path)
+                    to_delete.extend(row[0] for row in cursor.fetchall())
+                    
+                    cursor.execute("UPDATE images SET path = %s WHERE hash = %s;", (uri, img_hash))
+                    cursor.execute("""
+                    UPDATE products SET img_local_path = %s
+                    WHERE img_hash = %s AND img_local_path NOT LIKE 'shard:%%';
+                    """, (uri, img_hash))
+                    
+                    stats['images'] += 1
+                    stats['bytes'] += os.path.getsize(path)
+            self.connection.commit()
+            
+            if delete_files:
+                for path in set(to_delete):
+                    try:
+                        os.remove(path)
+                        stats['files_deleted'] += 1
+                    except OSError:
+                        pass
+            
+            logger.info(f"📦 Перенесено {stats['images']}/{len(objects)}")
+        
+        if delete_files:
+            self.cleanup_empty_dirs()
+        return stats
+    
+    def evict(self):
+        """
+        Проход вытеснения по бюджету диска (IMG_CACHE_MAX_MB)
+        
+        Returns:
+            dict: Статистика или None, если бюджет не задан
+        """
+        if ImageEvictor is None or not IMAGE_CACHE_CONFIG['max_mb']:
+            return None
+        evictor = ImageEvictor()
+        try:
+            return evictor.run_once()
+        finally:
+            evictor.close()
+    
+    def sweep(self, dry_run=False, min_age_hours=1.0):
+        """
+        Сверка файлов с БД: удаление файлов без ссылок, обнуление ссылок без файлов
+        
+        Returns:
+            tuple: (статистика, примеры путей)
+        """
+        sweeper = ImageSweeper(self.connection, self.base_dir, DB_CONFIG,
+                               min_age_hours=min_age_hours, dry_run=dry_run)
+        stats = sweeper.run()
+        if not dry_run:
+            self.cleanup_empty_dirs()
+        return stats, sweeper.samples
+    
     def cleanup_empty_dirs(self, base_path=None):
         """
         Очистка пустых директорий
@@ -481,6 +1167,8 @@ class ImageDownloader:
         for root, dirs, files in os.walk(base_path, topdown=False):
             for dir_name in dirs:
                 dir_path = os.path.join(root, dir_name)
+                if Path(dir_path) in (self.store.objects_dir, self.store.tmp_dir):
+                    continue
                 try:
                     if not os.listdir(dir_path):
                         os.rmdir(dir_path)
@@ -494,12 +1182,113 @@ class ImageDownloader:
     
     def close(self):
         """Закрытие соединений"""
+        if self.read_router:
+            self.read_router.close()
+        
         if self.connection:
             self.connection.close()
             logger.info("🔌 Соединение с PostgreSQL закрыто")
         
         self.session.close()
 
+class ImageDownloadStream:
+    """
+    Загрузка изображений по мере парсинга товаров (process_products.py --with-images)
+    
+    Процессор товаров передает товар в submit сразу после записи нового
+    или изменившегося prod_img_url, потоки загружают его через
+    ImageDownloader.download_image - с тем же общим ограничителем запросов
+    к хосту. Один URL в работе загружается один раз: товары с тем же URL
+    ждут его и получают ссылку на готовый объект без запроса. Готовые превью
+    записываются каждые flush_every товаров, а не только в close().
+    """
+    
+    def __init__(self, downloader, workers=None):
+        self.downloader = downloader
+        self.workers = workers or downloader.max_workers
+        self.queue = queue.Queue()
+        self.in_flight = {}  # URL → товары, ожидающие его загрузки
+        self.lock = threading.Lock()
+        self.stats = downloader.new_stats(0)
+        self.threads = []
+        self.evictor = None
+        self.flush_every = max(1, IMAGE_DERIVATIVES_CONFIG.get('flush_every', 100))
+    
+    def start(self):
+        self.downloader.start_info_writer()
+        self.downloader.start_derivatives()
+        if ImageEvictor is not None and IMAGE_CACHE_CONFIG['max_mb']:
+            # Долгий запуск: бюджет диска соблюдается по ходу загрузки
+            self.evictor = ImageEvictor().start()
+        for number in range(max(1, self.workers)):
+            thread = threading.Thread(target=self._run, name=f'image-stream-{number}', daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        logger.info(f"🖼️ Потоковая загрузка изображений запущена ({len(self.threads)} потоков)")
+        return self
+    
+    def submit(self, product):
+        """Постановка товара в очередь (не блокирует парсинг)"""
+        url = product['prod_img_url']
+        with self.lock:
+            self.stats['total'] += 1
+            waiting = self.in_flight.get(url)
+            if waiting is not None:
+                waiting.append(product)
+                return
+            self.in_flight[url] = []
+        self.queue.put(product)
+    
+    def _run(self):
+        while True:
+            product = self.queue.get()
+            if product is None:
+                return
+            
+            try:
+                result = self.downloader.download_image(product)
+            except Exception as e:
+                result = {'success': False, 'error': f"Ошибка: {e}"}
+            
+            with self.lock:
+                followers = self.in_flight.pop(product['prod_img_url'], [])
+                self._count(product, result)
+            
+            for follower in followers:
+                follower_result = {'product_id': follower['id'], 'success': False,
+                                   'error': result['error'], 'local_path': None, 'file_size': 0}
+                if result['success']:
+                    self.downloader.reuse_known(follower, follower_result)
+                with self.lock:
+                    self._count(follower, follower_result)
+    
+    def _count(self, product, result):
+        self.downloader.count_result(self.stats, product, result)
+        self.downloader.queue_derivatives(product, result)
+        done = self.stats['success'] + self.stats['failed']
+        if self.downloader.derivatives and done % self.flush_every == 0:
+            self.downloader.write_derivatives(wait=False)
+    
+    def close(self):
+        """Дожидается очереди, записывает информацию о файлах и превью"""
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+        
+        self.downloader.stop_info_writer()
+        self.downloader.finish_derivatives()
+        if self.evictor:
+            self.evictor.close()
+            self.evictor = None
+        
+        stats = self.stats
+        logger.info(f"🖼️ Изображения: загружено {stats['success']} из {stats['total']} "
+                    f"(уже были {stats['reused']}, дубликатов {stats['deduplicated']}), "
+                    f"ошибок {stats['failed']}, {stats['total_size'] / (1024 * 1024):.2f} MB")
+        return stats
+
 def main():
     """Основная функция"""
     parser = argparse.ArgumentParser(
@@ -510,19 +1299,39 @@ def main():
   python save_img.py                      # Загрузить все незагруженные изображения
   python save_img.py --limit 10           # Загрузить 10 изображений
   python save_img.py --id 1 2 3           # Загрузить по ID товаров
-  python save_img.py --all                # Загрузить все, даже уже загруженные
+  python save_img.py --all                # Перепроверить все (изменившиеся - загрузить заново)
   python save_img.py --threads 5          # Использовать 5 потоков
+  python save_img.py --async --concurrency 16 --rate 10  # aiohttp, до 10 запросов/с
   python save_img.py --stats              # Только статистика
   python save_img.py --cleanup            # Очистить пустые директории
+  python save_img.py --derivatives        # Построить недостающие превью
+  python save_img.py --find-duplicates --max-distance 4  # Почти одинаковые картинки
+  python save_img.py --migrate-shards --delete-files     # Перенести файлы в шарды (IMG_STORAGE=shards)
+  IMG_CACHE_MAX_MB=2048 python save_img.py --evict --watch  # Держать оригиналы в 2 ГБ (LRU)
+  python save_img.py --sweep --dry-run    # Файлы без ссылок в БД и ссылки без файлов (только отчет)
         """
     )
     
     parser.add_argument('--limit', type=int, help='Ограничение количества изображений')
     parser.add_argument('--id', type=int, nargs='+', help='ID конкретных товаров для загрузки')
-    parser.add_argument('--all', action='store_true', help='Загрузить все изображения, даже уже загруженные')
+    parser.add_argument('--all', action='store_true', help='Все изображения: уже загруженные перепроверяются условным GET')
     parser.add_argument('--threads', type=int, default=3, help='Количество потоков (по умолчанию: 3)')
+    parser.add_argument('--async', dest='use_async', action='store_true', help='Асинхронная загрузка (aiohttp)')
+    parser.add_argument('--concurrency', type=int, default=8, help='Одновременных загрузок в режиме --async (по умолчанию: 8)')
+    parser.add_argument('--rate', type=float, default=None, help='Не больше N запросов в секунду (режим --async)')
     parser.add_argument('--stats', action='store_true', help='Показать статистику')
     parser.add_argument('--cleanup', action='store_true', help='Очистить пустые директории')
+    parser.add_argument('--derivatives', action='store_true', help='Только построить недостающие превью')
+    parser.add_argument('--no-derivatives', action='store_true', help='Не строить превью после загрузки')
+    parser.add_argument('--find-duplicates', action='store_true', help='Отчет о почти одинаковых изображениях (img_phash)')
+    parser.add_argument('--max-distance', type=int, default=6, help='Порог расстояния Хэмминга для --find-duplicates (по умолчанию: 6)')
+    parser.add_argument('--migrate-shards', action='store_true', help='Перенести загруженные файлы в шарды')
+    parser.add_argument('--delete-files', action='store_true', help='С --migrate-shards: удалить перенесенные файлы')
+    parser.add_argument('--evict', action='store_true', help='Вытеснить давно не нужные оригиналы под бюджет IMG_CACHE_MAX_MB')
+    parser.add_argument('--watch', action='store_true', help='С --evict: повторять каждые IMG_EVICT_INTERVAL секунд')
+    parser.add_argument('--sweep', action='store_true', help='Сверить файлы с БД: удалить файлы без ссылок, обнулить ссылки без файлов')
+    parser.add_argument('--dry-run', action='store_true', help='С --sweep: только отчет, ничего не менять')
+    parser.add_argument('--min-age-hours', type=float, default=1.0, help='С --sweep: не удалять файлы моложе N часов (по умолчанию: 1)')
     parser.add_argument('--output', type=str, default='prod_images', help='Базовая директория для сохранения')
     
     args = parser.parse_args()
@@ -530,7 +1339,10 @@ def main():
     print("🖼️  ЗАГРУЗЧИК ИЗОБРАЖЕНИЙ ДЛЯ HELLO54.RU")
     print("="*60)
     
-    downloader = ImageDownloader(base_dir=args.output, max_workers=args.threads)
+    downloader = ImageDownloader(
+        base_dir=args.output, max_workers=args.threads,
+        derivatives=False if args.no_derivatives else None
+    )
     
     try:
         if args.stats:
@@ -541,8 +1353,60 @@ def main():
             # Очистка пустых директорий
             print("🧹 Очистка пустых директорий...")
             downloader.cleanup_empty_dirs()
+            removed = downloader.store.prune_partials()
+            if removed:
+                print(f"🗑️ Удалено брошенных недокачанных файлов: {removed}")
             print("✅ Готово!")
             
+        elif args.sweep:
+            if ImageSweeper is None:
+                print("❌ Сверка недоступна: не найден src/config.py")
+                return
+            stats, samples = downloader.sweep(dry_run=args.dry_run, min_age_hours=args.min_age_hours)
+            print(f"\n🔎 СВЕРКА ФАЙЛОВ С БД{' (без изменений)' if args.dry_run else ''}")
+            print("="*50)
+            print(f"📁 Файлов: {stats['files']}, 🔗 ссылок в БД: {stats['references']}")
+            print(f"🗑️ Файлов без ссылок: {stats['orphans']} ({stats['orphan_bytes'] / (1024 * 1024):.2f} MB), "
+                  f"удалено {stats['deleted']}, моложе {args.min_age_hours:g} ч: {stats['too_new']}")
+            print(f"❓ Ссылок без файлов: {stats['missing']}, исправлено записей: {stats['fixed']}")
+            for title, key in (("Файлы без ссылок", 'orphan'), ("Ссылки без файлов", 'missing')):
+                if samples[key]:
+                    print(f"\n{title} (первые {len(samples[key])}):")
+                    for path in samples[key]:
+                        print(f"  • {path}")
+            
+        elif args.migrate_shards:
+            stats = downloader.migrate_to_shards(delete_files=args.delete_files)
+            print(f"✅ В шарды перенесено {stats['images']} изображений "
+                  f"({stats['bytes'] / (1024 * 1024):.2f} MB), нет файла: {stats['missing']}, "
+                  f"удалено файлов: {stats['files_deleted']}")
+            if IMAGE_STORAGE_CONFIG['backend'] != 'shards':
+                print("ℹ️ Чтобы новые загрузки шли в шарды, задайте IMG_STORAGE=shards")
+            
+        elif args.evict:
+            if ImageEvictor is None or not IMAGE_CACHE_CONFIG['max_mb']:
+                print("ℹ️ Бюджет не задан: укажите IMG_CACHE_MAX_MB")
+                return
+            while True:
+                stats = downloader.evict()
+                print(f"💽 Занято {stats['used_before'] / (1024 * 1024):.1f} из {IMAGE_CACHE_CONFIG['max_mb']} MB "
+                      f"({stats['images']} изображений), вытеснено {stats['evicted']} "
+                      f"({stats['bytes_freed'] / (1024 * 1024):.1f} MB, файлов {stats['files_removed']})")
+                if not args.watch:
+                    break
+                time.sleep(IMAGE_CACHE_CONFIG['interval'])
+            
+        elif args.find_duplicates:
+            if phash is None:
+                print("❌ Для поиска дубликатов нужен numpy")
+                return
+            downloader.show_duplicates(max_distance=args.max_distance, limit=args.limit or 20)
+            
+        elif args.derivatives:
+            # Превью для уже загруженных изображений
+            count = downloader.build_missing_derivatives(limit=args.limit)
+            print(f"✅ Превью построены для {count} товаров")
+            
         else:
             # Загрузка изображений
             # Получаем товары для загрузки
@@ -564,10 +1428,13 @@ def main():
             
             print(f"📥 Найдено {len(products)} товаров с изображениями")
             print(f"💾 Будет сохранено в: {args.output}/")
-            print(f"🧵 Потоков: {args.threads}")
+            if args.use_async:
+                print(f"⚡ Асинхронно: {args.concurrency} одновременно" + (f", до {args.rate} запросов/с" if args.rate else ""))
+            else:
+                print(f"🧵 Потоков: {args.threads}")
             
             if args.all:
-                print("⚠️  Режим: загрузка ВСЕХ изображений (даже уже загруженных)")
+                print("⚠️  Режим: загрузка ВСЕХ изображений (уже загруженные - условным GET по ETag/Last-Modified)")
             else:
                 print("✅ Режим: загрузка только НЕЗАГРУЖЕННЫХ изображений")
             
@@ -576,8 +1443,15 @@ def main():
                 print("❌ Отменено")
                 return
             
+            # URL, уже скачанные для других товаров, не качаем повторно
+            if not args.all:
+                downloader.load_known_images(products)
+            
             # Загружаем изображения
-            stats = downloader.download_images_batch(products)
+            if args.use_async:
+                stats = downloader.download_images_async(products, concurrency=args.concurrency, rate=args.rate)
+            else:
+                stats = downloader.download_images_batch(products)
             
             # Показываем результаты
             print(f"\n🎉 ЗАГРУЗКА ЗАВЕРШЕНА!")
@@ -585,6 +1459,17 @@ def main():
             print(f"✅ Успешно: {stats['success']}")
             print(f"❌ Ошибок: {stats['failed']}")
             print(f"📊 Всего: {stats['total']}")
+            if stats['reused'] or stats['deduplicated']:
+                print(f"♻️ Без загрузки (URL уже в хранилище): {stats['reused']}")
+                print(f"🔗 Дубликаты по содержимому: {stats['deduplicated']}")
+            if stats['resumed']:
+                print(f"⏯️ Докачано после обрыва: {stats['resumed']} "
+                      f"(не скачано повторно {stats['bytes_resumed'] / (1024 * 1024):.2f} MB)")
+            if stats['unchanged']:
+                saved = downloader.seconds_saved(stats)
+                print(f"🟰 Не изменилось на сервере: {stats['unchanged']} "
+                      f"(не скачано {stats['bytes_saved'] / (1024 * 1024):.2f} MB"
+                      + (f", сэкономлено ~{saved:.1f}с" if saved is not None else "") + ")")
             
             if stats['total_size'] > 0:
                 size_mb = stats['total_size'] / (1024 * 1024)
@@ -596,6 +1481,12 @@ def main():
             # Очищаем пустые директории
             downloader.cleanup_empty_dirs()
             
+            # Бюджет диска (IMG_CACHE_MAX_MB): вытесняем давно не нужные оригиналы
+            evicted = downloader.evict()
+            if evicted and evicted['evicted']:
+                print(f"🧹 Вытеснено давно не нужных изображений: {evicted['evicted']} "
+                      f"({evicted['bytes_freed'] / (1024 * 1024):.1f} MB)")
+            
     except KeyboardInterrupt:
         print("\n\n⏹️  Загрузка прервана пользователем")
     except Exception as e:
@@ -19,6 +19,30 @@ DB_CONFIG = {
     'password': os.getenv('DB_PASSWORD', 'Hello54Parser2024!')
 }
 
+# Реплика для read-only запросов (статистика, отчеты). Без DB_REPLICA_HOST - все идет в primary
+DB_REPLICA_CONFIG = None
+if os.getenv('DB_REPLICA_HOST'):
+    DB_REPLICA_CONFIG = {
+        'host': os.getenv('DB_REPLICA_HOST'),
+        'port': int(os.getenv('DB_REPLICA_PORT', DB_CONFIG['port'])),
+        'database': os.getenv('DB_REPLICA_NAME', DB_CONFIG['database']),
+        'user': os.getenv('DB_REPLICA_USER', DB_CONFIG['user']),
+        'password': os.getenv('DB_REPLICA_PASSWORD', DB_CONFIG['password'])
+    }
+
+REPLICA_CONFIG = {
+    'max_lag_seconds': float(os.getenv('DB_REPLICA_MAX_LAG', 5.0)),  # больше - читаем с primary
+    'connect_timeout': int(os.getenv('DB_REPLICA_CONNECT_TIMEOUT', 3)),
+    'retry_seconds': float(os.getenv('DB_REPLICA_RETRY', 30.0)),  # после отказа реплики - столько читаем с primary
+}
+
+# Слой данных на psycopg 3 (pipeline mode + prepared statements)
+# Включать, когда воркеры работают далеко от БД и каждый round-trip дорогой
+DB_PIPELINE_CONFIG = {
+    'enabled': os.getenv('DB_PIPELINE', '0') == '1',
+    'prepare_threshold': int(os.getenv('DB_PREPARE_THRESHOLD', 0)),  # 0 = готовить сразу
+}
+
 # НАСТРОЙКИ ПАРСЕРА С ОГРАНИЧЕНИЕМ 5 СТРАНИЦ
 PARSER_CONFIG = {
     'delay_between_requests': float(os.getenv('REQUEST_DELAY', 1.0)),
@@ -27,6 +51,99 @@ PARSER_CONFIG = {
     'timeout': 15
 }
 
+# Общий лимит запросов к hello54.ru для ВСЕХ процессов на хосте (token bucket в файле)
+RATE_LIMIT_CONFIG = {
+    'requests_per_second': float(os.getenv('HOST_RATE_LIMIT', 2.0)),
+    'burst': int(os.getenv('HOST_RATE_BURST', 4)),
+    'state_file': os.getenv('HOST_RATE_STATE_FILE', str(BASE_DIR / 'data' / 'rate_limiter.json'))
+}
+
+# Настройки Selenium: облегченный профиль Chrome (мы читаем только DOM)
+SELENIUM_CONFIG = {
+    'lean_profile': os.getenv('SELENIUM_LEAN', '1') == '1',
+    'page_load_strategy': os.getenv('SELENIUM_PAGE_LOAD_STRATEGY', 'eager'),  # normal / eager / none
+    'disk_cache_dir': os.getenv('SELENIUM_CACHE_DIR', str(BASE_DIR / 'data' / 'chrome_cache')),
+    # Таймауты и бюджеты ожидания (секунды)
+    'page_load_timeout': int(os.getenv('SELENIUM_PAGE_LOAD_TIMEOUT', 30)),
+    # Пул браузеров: воркер без результата page_load_timeout + столько секунд считается зависшим
+    'hang_margin': float(os.getenv('SELENIUM_HANG_MARGIN', 60.0)),
+    'script_timeout': int(os.getenv('SELENIUM_SCRIPT_TIMEOUT', 30)),
+    'ready_budget': float(os.getenv('SELENIUM_READY_BUDGET', 5.0)),              # ключевые элементы товара
+    'characteristics_budget': float(os.getenv('SELENIUM_CHARS_BUDGET', 2.0)),   # блок характеристик
+    # Сколько вкладок одного браузера загружают страницы одновременно
+    'tabs': int(os.getenv('SELENIUM_TABS', 1)),
+    # Блокируются через CDP Network.setBlockedURLs: шрифты, медиа, аналитика, чаты
+    'blocked_url_patterns': [
+        '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+        '*.mp4', '*.webm', '*.mp3',
+        '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*',
+        '*mc.yandex.ru*', '*an.yandex.ru*', '*top-fwz1.mail.ru*',
+        '*jivosite.com*', '*jivo.ru*', '*bitrix24.ru*', '*carrotquest*',
+        '*vk.com/rtrg*', '*facebook.net*', '*connect.facebook*',
+    ] + [p for p in os.getenv('SELENIUM_BLOCKED_URLS', '').split(',') if p],
+}
+
+# Снимки отрисованных Selenium страниц (для перепарсинга без браузера)
+SNAPSHOT_CONFIG = {
+    'enabled': os.getenv('SELENIUM_SNAPSHOTS', '1') == '1',
+    'dir': os.getenv('SNAPSHOT_DIR', str(BASE_DIR / 'data' / 'snapshots')),
+    'compress_level': int(os.getenv('SNAPSHOT_COMPRESS_LEVEL', 6)),
+    # Хранение: последние N снимков URL (при каждой записи) и не старше max_age_days (проход раз в сутки)
+    'keep_per_url': int(os.getenv('SNAPSHOT_KEEP_PER_URL', 2)),
+    'max_age_days': float(os.getenv('SNAPSHOT_MAX_AGE_DAYS', 30)),  # 0 - без ограничения по возрасту
+}
+
+# Перехват XHR/JSON ответов через CDP и их повтор обычным requests
+XHR_CAPTURE_CONFIG = {
+    'enabled': os.getenv('SELENIUM_CAPTURE_XHR', '0') == '1',
+    'replay': os.getenv('XHR_REPLAY', '1') == '1',  # повторять сохраненные шаблоны при эскалации
+    'templates_file': os.getenv('XHR_TEMPLATES_FILE', str(BASE_DIR / 'data' / 'xhr_templates.json')),
+    'max_body_kb': int(os.getenv('XHR_MAX_BODY_KB', 512)),
+    # Регулярные выражения для URL запросов, которые стоит сохранять (компоненты Bitrix)
+    'url_patterns': [
+        r'/bitrix/services/main/ajax\.php',
+        r'/bitrix/components/.+\.php',
+        r'/ajax/',
+        r'\.json(\?|$)',
+    ] + [p for p in os.getenv('XHR_URL_PATTERNS', '').split(',') if p],
+}
+
+# Долгоживущий сервис рендеринга/парсинга (render_service.py): теплые браузеры и пул соединений
+RENDER_SERVICE_CONFIG = {
+    'host': os.getenv('RENDER_SERVICE_HOST', '127.0.0.1'),
+    'port': int(os.getenv('RENDER_SERVICE_PORT', 8765)),
+    'browsers': int(os.getenv('RENDER_SERVICE_BROWSERS', 1)),
+    'queue_size': int(os.getenv('RENDER_SERVICE_QUEUE', 100)),
+    'db_pool_size': int(os.getenv('RENDER_SERVICE_DB_POOL', 4)),
+    'recycle_pages': int(os.getenv('RENDER_SERVICE_RECYCLE_PAGES', 200)),
+    'request_timeout': float(os.getenv('RENDER_SERVICE_TIMEOUT', 120)),  # ожидание результата клиентом
+}
+
+# Хранилище файлов изображений: files - объекты и жесткие ссылки, shards - большие файлы-шарды
+IMAGE_STORAGE_CONFIG = {
+    'backend': os.getenv('IMG_STORAGE', 'files'),
+    'shard_size_mb': int(os.getenv('IMG_SHARD_SIZE_MB', 1024)),
+    'known_max': int(os.getenv('IMG_KNOWN_MAX', 50000)),  # URL в памяти загрузчика (уже скачанные)
+}
+
+# Бюджет диска для оригиналов изображений: давно не нужные вытесняются (LRU) и загружаются заново по запросу
+IMAGE_CACHE_CONFIG = {
+    'max_mb': int(os.getenv('IMG_CACHE_MAX_MB', 0)),  # 0 - без ограничения
+    'low_watermark': float(os.getenv('IMG_CACHE_LOW_WATERMARK', 0.9)),  # вытесняем до этой доли бюджета
+    'min_age_hours': float(os.getenv('IMG_EVICT_MIN_AGE_HOURS', 24)),  # свежие не трогаем
+    'interval': float(os.getenv('IMG_EVICT_INTERVAL', 300)),  # период фонового вытеснения, сек
+}
+
+# Уменьшенные копии изображений для списков CRM (строятся после загрузки в пуле процессов)
+IMAGE_DERIVATIVES_CONFIG = {
+    'enabled': os.getenv('IMG_DERIVATIVES', '1') == '1',
+    'sizes': [int(x) for x in os.getenv('IMG_DERIVATIVE_SIZES', '64,160,320').split(',') if x],
+    'format': os.getenv('IMG_DERIVATIVE_FORMAT', 'webp'),  # webp или jpeg
+    'quality': int(os.getenv('IMG_DERIVATIVE_QUALITY', 80)),
+    'workers': int(os.getenv('IMG_DERIVATIVE_WORKERS', 0)) or None,  # None - по числу ядер
+    'flush_every': int(os.getenv('IMG_DERIVATIVE_FLUSH_EVERY', 100)),  # потоковая загрузка: запись готовых превью каждые N товаров
+}
+
 # Настройки логирования
 LOG_CONFIG = {
     'level': os.getenv('LOG_LEVEL', 'INFO'),
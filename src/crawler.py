@@ -7,6 +7,7 @@ import urllib.parse
 import logging
 from datetime import datetime
 from src.config import PARSER_CONFIG
+from src.rate_limiter import RateLimitedSession
 
 logger = logging.getLogger(__name__)
 
@@ -16,7 +17,7 @@ class Hello54Crawler:
     def __init__(self, db_manager):
         self.base_url = "https://hello54.ru"
         self.db = db_manager
-        self.session = requests.Session()
+        self.session = RateLimitedSession()
         self.session.headers.update({
             'User-Agent': PARSER_CONFIG['user_agent'],
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
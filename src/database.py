@@ -3,7 +3,9 @@ import psycopg2
 from psycopg2.extras import RealDictCursor
 import logging
 from datetime import datetime
-from src.config import DB_CONFIG
+from src.config import DB_CONFIG, DB_PIPELINE_CONFIG
+from src import pipeline_db
+from src.replica import ReadRouter
 
 logger = logging.getLogger(__name__)
 
@@ -70,19 +72,38 @@ class DatabaseManager:
  
     def __init__(self):
         self.connection = None
+        self.pipeline_db = None
+        self.read_router = None
         self.connect()
         self.create_tables()
+        self.init_pipeline_db()
     
     def connect(self):
         """Подключение к PostgreSQL"""
         try:
             self.connection = psycopg2.connect(**DB_CONFIG)
+            self.read_router = ReadRouter(self.connection)
             logger.info("✅ Подключение к PostgreSQL успешно")
             return True
         except Exception as e:
             logger.error(f"❌ Ошибка подключения к PostgreSQL: {e}")
             return False
     
+    def init_pipeline_db(self):
+        """Подключение слоя psycopg 3 для пакетной записи (если включен)"""
+        if not DB_PIPELINE_CONFIG['enabled']:
+            return
+        
+        if not pipeline_db.is_available():
+            logger.warning("⚠️ DB_PIPELINE=1, но psycopg 3 не установлен - используем psycopg2")
+            return
+        
+        try:
+            self.pipeline_db = pipeline_db.PipelineDatabase()
+        except Exception as e:
+            logger.warning(f"⚠️ Pipeline-слой недоступен, используем psycopg2: {e}")
+            self.pipeline_db = None
+    
     def create_tables(self):
         """Создание таблиц если их нет"""
         if not self.connection:
@@ -168,6 +189,9 @@ class DatabaseManager:
         if not urls:
             return 0
         
+        if self.pipeline_db:
+            return self.pipeline_db.save_product_urls(urls, category_id)
+        
         added_count = 0
         
         try:
@@ -227,10 +251,11 @@ class DatabaseManager:
         except Exception as e:
             logger.error(f"Ошибка логирования: {e}")
     
-    def get_statistics(self):
-        """Получение статистики"""
+    def get_statistics(self, prefer_primary=False):
+        """Получение статистики (с реплики, если она настроена)"""
         try:
-            with self.connection.cursor(cursor_factory=RealDictCursor) as cursor:
+            conn = self.read_router.connection(prefer_primary)
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
                 cursor.execute("""
                 SELECT 
                     COUNT(*) as total_products,
@@ -262,5 +287,11 @@ class DatabaseManager:
     
     def close(self):
         """Закрытие соединения"""
+        if self.pipeline_db:
+            self.pipeline_db.close()
+        
+        if self.read_router:
+            self.read_router.close()
+        
         if self.connection:
             self.connection.close()
\ No newline at end of file
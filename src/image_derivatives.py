@@ -0,0 +1,151 @@
+# src/image_derivatives.py
+"""
+Уменьшенные копии изображений (превью для списков CRM).
+
+Декодирование и кодирование JPEG/WebP упираются в CPU, поэтому копии
+строятся в пуле процессов, а не в потоках загрузчика. Путь копии задается
+хешем исходника: <base>/derivatives/<size>/<h[:2]>/<hash><ext>. Готовые
+файлы при повторном запуске пропускаются, одинаковые картинки разных
+товаров обрабатываются один раз. Пути пишутся в products.img_derivatives
+(JSONB вида {"160": "prod_images/derivatives/160/ab/ab12....webp"}), а
+перцептивный хеш из того же декодирования - в products.img_phash.
+"""
+
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from src.config import IMAGE_DERIVATIVES_CONFIG
+from src.image_shards import open_source
+
+try:
+    from PIL import Image
+except ImportError:  # без Pillow этап превью пропускается
+    Image = None
+
+try:
+    from src.phash import dhash
+except ImportError:  # без numpy превью строятся, хеш не считается
+    dhash = None
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = {'webp': '.webp', 'jpeg': '.jpg'}
+
+UPDATE_DERIVATIVES_SQL = """
+UPDATE products
+SET img_derivatives = %s::jsonb,
+    img_phash = COALESCE(%s, img_phash)
+WHERE id = %s;
+"""
+
+def is_available():
+    """Установлен ли Pillow"""
+    return Image is not None
+
+def derivative_path(base_dir, img_hash, size, fmt):
+    return Path(base_dir) / 'derivatives' / str(size) / img_hash[:2] / f"{img_hash}{EXTENSIONS[fmt]}"
+
+def render_derivatives(source_path, img_hash, base_dir, sizes, fmt, quality):
+    """
+    Построение недостающих копий одного изображения (выполняется в процессе пула)
+
+    Returns:
+        tuple: ({"<size>": "<путь>"} для всех размеров, dHash или None)
+    """
+    paths = {str(size): str(derivative_path(base_dir, img_hash, size, fmt)) for size in sizes}
+    missing = [size for size in sizes if not os.path.exists(paths[str(size)])]
+
+    with Image.open(open_source(source_path)) as img:
+        # JPEG декодируется сразу в уменьшенном масштабе (для остальных форматов - без эффекта)
+        img.draft('RGB', (max(missing + [64]), max(missing + [64])))
+        phash = dhash(img) if dhash else None
+        has_alpha = 'A' in img.getbands() or 'transparency' in img.info
+        img = img.convert('RGBA' if has_alpha and fmt == 'webp' else 'RGB')
+
+        for size in sorted(missing, reverse=True):
+            thumb = img.copy()
+            thumb.thumbnail((size, size), Image.LANCZOS)
+
+            target = Path(paths[str(size)])
+            target.parent.mkdir(exist_ok=True, parents=True)
+            tmp = target.with_name(f".{target.name}.{os.getpid()}")
+            if fmt == 'webp':
+                thumb.save(tmp, format='WEBP', quality=quality, method=4)
+            else:
+                thumb.save(tmp, format='JPEG', quality=quality, optimize=True, progressive=True)
+            os.replace(tmp, target)
+
+    return paths, phash
+
+class DerivativeBuilder:
+    """Пул процессов для превью: задачи ставятся по мере загрузки, результаты собираются по готовности или в конце"""
+
+    def __init__(self, base_dir, sizes=None, fmt=None, quality=None, workers=None):
+        self.base_dir = str(base_dir)
+        self.sizes = sizes or IMAGE_DERIVATIVES_CONFIG['sizes']
+        self.format = fmt or IMAGE_DERIVATIVES_CONFIG['format']
+        self.quality = quality or IMAGE_DERIVATIVES_CONFIG['quality']
+        self.workers = workers or IMAGE_DERIVATIVES_CONFIG['workers']
+        if self.format not in EXTENSIONS:
+            raise ValueError(f"Неизвестный формат превью: {self.format}")
+
+        self.executor = None
+        self.by_hash = {}   # hash → future (одна задача на картинку)
+        self.waiting = []   # (product_id, future)
+        self.stats = {'images': 0, 'products': 0, 'failed': 0}
+
+    def start(self):
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self
+
+    def submit(self, product_id, source_path, img_hash):
+        """Постановка товара в очередь (не блокирует загрузку)"""
+        future = self.by_hash.get(img_hash)
+        if future is None:
+            future = self.executor.submit(
+                render_derivatives, str(source_path), img_hash,
+                self.base_dir, self.sizes, self.format, self.quality
+            )
+            self.by_hash[img_hash] = future
+            self.stats['images'] += 1
+        self.waiting.append((product_id, future))
+
+    def collect(self, wait=True):
+        """
+        Результаты поставленных задач
+
+        Args:
+            wait: False - только уже готовые, остальные остаются в очереди
+
+        Returns:
+            list: [(product_id, {"<size>": "<путь>"}, dHash), ...]
+        """
+        results = []
+        pending = []
+        for product_id, future in self.waiting:
+            if not wait and not future.done():
+                pending.append((product_id, future))
+                continue
+            try:
+                results.append((product_id, *future.result()))
+                self.stats['products'] += 1
+            except Exception as e:
+                self.stats['failed'] += 1
+                logger.warning(f"⚠️ Превью для товара {product_id} не построены: {e}")
+
+        self.waiting = pending
+        self.by_hash = {img_hash: future for img_hash, future in self.by_hash.items() if not future.done()}
+        return results
+
+    def close(self):
+        if self.executor:
+            self.executor.shutdown()
+            self.executor = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,212 @@
+# src/image_evictor.py
+"""
+Вытеснение давно не нужных оригиналов изображений под бюджет диска (LRU).
+
+Занятое место считается по images.file_size (объект хранится один раз,
+жесткие ссылки места не занимают). Когда сумма больше бюджета, удаляются
+объекты с самым старым последним использованием, пока не останется
+low_watermark бюджета. Использование - самое позднее из:
+images.last_accessed_at (CRM отдал оригинал), parsed_at товаров с этой
+картинкой (товар еще в каталоге) и images.created_at.
+
+Сначала commit в БД (img_local_path = NULL, img_evicted_at = NOW(),
+строка images удаляется), затем удаление файлов: БД не ссылается на
+удаленный файл. Превью и img_hash остаются - списки CRM работают, а
+оригинал загружается заново по запросу (save_img.py --id, CRM).
+
+Шарды не вытесняются: место в середине шарда не освобождается без
+перепаковки.
+"""
+
+import logging
+import os
+import threading
+
+import psycopg2
+
+from src.config import DB_CONFIG, IMAGE_CACHE_CONFIG
+from src.image_shards import is_shard_uri
+
+logger = logging.getLogger(__name__)
+
+USAGE_SQL = """
+SELECT COALESCE(SUM(file_size), 0), COUNT(*)
+FROM images
+WHERE path NOT LIKE 'shard:%';
+"""
+
+# Кандидаты от давно не использованных к недавним
+CANDIDATES_SQL = """
+SELECT i.hash, i.path, COALESCE(i.file_size, 0)
+FROM images i
+LEFT JOIN products p ON p.img_hash = i.hash
+WHERE i.path NOT LIKE 'shard:%%'
+GROUP BY i.hash, i.path, i.file_size, i.last_accessed_at, i.created_at
+HAVING GREATEST(i.last_accessed_at, MAX(p.parsed_at), i.created_at) < NOW() - make_interval(hours => %s)
+ORDER BY GREATEST(i.last_accessed_at, MAX(p.parsed_at), i.created_at) NULLS FIRST;
+"""
+
+EVICT_LINKS_SQL = """
+SELECT img_local_path FROM products
+WHERE img_hash = ANY(%s) AND img_local_path IS NOT NULL;
+"""
+
+EVICT_PRODUCTS_SQL = """
+UPDATE products
+SET img_local_path = NULL,
+    img_evicted_at = NOW()
+WHERE img_hash = ANY(%s);
+"""
+
+EVICT_IMAGES_SQL = "DELETE FROM images WHERE hash = ANY(%s);"
+
+class ImageEvictor:
+    """Вытеснение по бюджету: разовый проход (run_once) или фоновый поток (start)"""
+
+    def __init__(self, max_mb=None, low_watermark=None, min_age_hours=None,
+                 batch_size=200, db_config=None):
+        max_mb = IMAGE_CACHE_CONFIG['max_mb'] if max_mb is None else max_mb
+        self.max_bytes = max_mb * 1024 * 1024
+        self.low_watermark = low_watermark or IMAGE_CACHE_CONFIG['low_watermark']
+        self.min_age_hours = IMAGE_CACHE_CONFIG['min_age_hours'] if min_age_hours is None else min_age_hours
+        self.batch_size = batch_size
+        self.db_config = db_config or DB_CONFIG
+
+        self.connection = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def connect(self):
+        """Свое соединение: проход может идти в фоновом потоке"""
+        if self.connection is None:
+            self.connection = psycopg2.connect(
+                host=self.db_config['host'],
+                port=self.db_config['port'],
+                database=self.db_config['database'],
+                user=self.db_config['user'],
+                password=self.db_config['password']
+            )
+        return self.connection
+
+    def usage(self):
+        """
+        Returns:
+            tuple: (байт в объектах-файлах, количество объектов)
+        """
+        with self.connect().cursor() as cursor:
+            cursor.execute(USAGE_SQL)
+            used, count = cursor.fetchone()
+        self.connection.commit()
+        return int(used), count
+
+    def select_victims(self, need_bytes):
+        """Самые давно использованные объекты суммарно на need_bytes (курсор на сервере)"""
+        victims = []
+        freed = 0
+        with self.connection.cursor(name='image_evict_candidates') as cursor:
+            cursor.itersize = 1000
+            cursor.execute(CANDIDATES_SQL, (self.min_age_hours,))
+            for img_hash, path, file_size in cursor:
+                victims.append((img_hash, path))
+                freed += file_size
+                if freed >= need_bytes:
+                    break
+        self.connection.commit()
+        return victims, freed
+
+    def evict(self, victims):
+        """
+        Удаление объектов: сначала ссылки в БД, затем файлы
+
+        Returns:
+            int: Количество удаленных файлов (объекты и жесткие ссылки)
+        """
+        removed = 0
+        for start in range(0, len(victims), self.batch_size):
+            batch = victims[start:start + self.batch_size]
+            hashes = [img_hash for img_hash, _ in batch]
+            try:
+                with self.connection.cursor() as cursor:
+                    cursor.execute(EVICT_LINKS_SQL, (hashes,))
+                    paths = {row[0] for row in cursor.fetchall()}
+                    cursor.execute(EVICT_PRODUCTS_SQL, (hashes,))
+                    cursor.execute(EVICT_IMAGES_SQL, (hashes,))
+                self.connection.commit()
+            except Exception as e:
+                logger.error(f"❌ Ошибка вытеснения изображений: {e}")
+                self.connection.rollback()
+                continue
+
+            paths.update(path for _, path in batch)
+            for path in paths:
+                if is_shard_uri(path):
+                    continue
+                try:
+                    os.remove(path)
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.warning(f"⚠️ Не удалось удалить {path}: {e}")
+        return removed
+
+    def run_once(self):
+        """
+        Один проход вытеснения
+
+        Returns:
+            dict: Статистика прохода
+        """
+        stats = {'used_before': 0, 'images': 0, 'evicted': 0, 'bytes_freed': 0, 'files_removed': 0}
+        if not self.enabled:
+            return stats
+
+        used, count = self.usage()
+        stats.update(used_before=used, images=count)
+        if used <= self.max_bytes:
+            logger.debug(f"💽 Изображения: {used / (1024 * 1024):.1f} из {self.max_bytes / (1024 * 1024):.0f} MB")
+            return stats
+
+        need = used - int(self.max_bytes * self.low_watermark)
+        victims, freed = self.select_victims(need)
+        if not victims:
+            logger.warning(f"⚠️ Бюджет изображений превышен ({used / (1024 * 1024):.1f} MB), "
+                           f"но все использовались за последние {self.min_age_hours:g} ч")
+            return stats
+
+        stats['files_removed'] = self.evict(victims)
+        stats.update(evicted=len(victims), bytes_freed=freed)
+        logger.info(f"🧹 Вытеснено {len(victims)} изображений ({freed / (1024 * 1024):.1f} MB), "
+                    f"было {used / (1024 * 1024):.1f} из {self.max_bytes / (1024 * 1024):.0f} MB")
+        return stats
+
+    def _run(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"❌ Ошибка фонового вытеснения: {e}")
+                if self.connection:
+                    self.connection.rollback()
+
+    def start(self, interval=None):
+        """Фоновый поток: проход раз в interval секунд"""
+        if not self.enabled:
+            return self
+        interval = interval or IMAGE_CACHE_CONFIG['interval']
+        self._thread = threading.Thread(target=self._run, args=(interval,), name='image-evictor', daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        if self._thread:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        if self.connection:
+            self.connection.close()
+            self.connection = None
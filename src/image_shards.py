@@ -0,0 +1,198 @@
+# src/image_shards.py
+"""
+Хранение изображений в больших файлах-шардах вместо тысяч мелких файлов.
+
+Изображения дописываются в <base>/shards/00001.bin, 00002.bin, ... до
+shard_size_mb каждый. Запись: заголовок (MAGIC, sha256, длина) + байты
+файла. Индекс - в БД: img_local_path и images.path хранят адрес вида
+shard:prod_images/shards/00001.bin:<смещение>:<длина>.jpg, по которому
+файл читается срезом mmap без поиска по каталогам. Заголовки позволяют
+восстановить индекс сканированием шардов (так же строится словарь
+hash → адрес при запуске загрузчика).
+
+Только стандартная библиотека: модуль читает и CRM.
+Писатель один на каталог (save_img.py), читателей сколько угодно.
+"""
+
+import io
+import logging
+import mmap
+import os
+import shutil
+import struct
+import threading
+from pathlib import Path
+
+from src.image_store import ImageStore
+
+logger = logging.getLogger(__name__)
+
+URI_PREFIX = 'shard:'
+MAGIC = b'IMG1'
+HEADER = struct.Struct('>4s32sQ')  # MAGIC, sha256 (байты), длина
+
+def is_shard_uri(path):
+    return isinstance(path, str) and path.startswith(URI_PREFIX)
+
+def make_uri(shard_path, offset, length, extension):
+    return f"{URI_PREFIX}{shard_path}:{offset}:{length}{extension}"
+
+def parse_uri(uri):
+    """
+    Returns:
+        tuple: (путь шарда, смещение, длина, расширение)
+    """
+    shard_path, offset, tail = uri[len(URI_PREFIX):].rsplit(':', 2)
+    length, dot, extension = tail.partition('.')
+    return shard_path, int(offset), int(length), dot + extension
+
+class ShardReader:
+    """Чтение изображений срезами mmap (отображения шардов кешируются)"""
+
+    def __init__(self, base_dir=None):
+        self.base_dir = Path(base_dir) if base_dir else None
+        self._maps = {}
+        self._lock = threading.Lock()
+
+    def _resolve(self, shard_path):
+        path = Path(shard_path)
+        if self.base_dir and not path.is_absolute():
+            path = self.base_dir / path
+        return path
+
+    def _map(self, path, needed):
+        """Отображение шарда; переотображаем, если шард дописан после прошлого чтения"""
+        with self._lock:
+            mapped = self._maps.get(path)
+            if mapped is None or len(mapped) < needed:
+                if mapped is not None:
+                    mapped.close()
+                with open(path, 'rb') as f:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._maps[path] = mapped
+            return mapped
+
+    def read(self, uri):
+        """Байты изображения по адресу shard:..."""
+        shard_path, offset, length, _ = parse_uri(uri)
+        path = self._resolve(shard_path)
+        mapped = self._map(path, offset + length)
+        if len(mapped) < offset + length:
+            raise ValueError(f"Адрес за концом шарда: {uri}")
+        return mapped[offset:offset + length]
+
+    def exists(self, uri):
+        shard_path, offset, length, _ = parse_uri(uri)
+        try:
+            return os.path.getsize(self._resolve(shard_path)) >= offset + length
+        except OSError:
+            return False
+
+    def close(self):
+        with self._lock:
+            for mapped in self._maps.values():
+                mapped.close()
+            self._maps = {}
+
+_readers = {}
+
+def read_uri(uri, base_dir=None):
+    """Чтение по адресу через общий для процесса ShardReader"""
+    reader = _readers.get(base_dir)
+    if reader is None:
+        reader = _readers.setdefault(base_dir, ShardReader(base_dir))
+    return reader.read(uri)
+
+def open_source(path):
+    """Файловый объект или путь для Image.open (адрес шарда или обычный файл)"""
+    if is_shard_uri(path):
+        return io.BytesIO(read_uri(path))
+    return path
+
+class ShardStore(ImageStore):
+    """
+    ImageStore с объектами в шардах: commit дописывает файл в текущий шард,
+    link не создает файлов (товар ссылается на адрес в шарде)
+    """
+
+    def __init__(self, base_dir='prod_images', shard_size_mb=1024):
+        super().__init__(base_dir)
+        self.shards_dir = self.base_dir / 'shards'
+        self.shards_dir.mkdir(exist_ok=True, parents=True)
+        self.max_shard_bytes = shard_size_mb * 1024 * 1024
+        self.reader = ShardReader()
+        self._lock = threading.Lock()
+
+        self.index = {}  # sha256 → адрес
+        self.current = 1
+        self._load_index()
+
+    def _shard_path(self, number):
+        return self.shards_dir / f"{number:05d}.bin"
+
+    def _load_index(self):
+        """Словарь hash → адрес по заголовкам записей; недописанный хвост отрезается"""
+        shards = sorted(self.shards_dir.glob('*.bin'))
+        for path in shards:
+            size = path.stat().st_size
+            position = 0
+            with open(path, 'rb') as f:
+                while position + HEADER.size <= size:
+                    magic, digest, length = HEADER.unpack(f.read(HEADER.size))
+                    if magic != MAGIC or position + HEADER.size + length > size:
+                        break
+                    self.index[digest.hex()] = make_uri(path, position + HEADER.size, length, '')
+                    position += HEADER.size + length
+                    f.seek(position)
+
+            if position < size:
+                logger.warning(f"⚠️ Шард {path.name}: отрезан недописанный хвост ({size - position} байт)")
+                with open(path, 'r+b') as f:
+                    f.truncate(position)
+
+        if shards:
+            self.current = int(shards[-1].stem)
+        logger.debug(f"📦 Шарды: {len(shards)}, изображений: {len(self.index)}")
+
+    def append(self, source_path, img_hash, extension):
+        """
+        Дописывание файла в шард (исходный файл не трогаем)
+
+        Returns:
+            tuple: (адрес, True если запись новая)
+        """
+        with self._lock:
+            uri = self.index.get(img_hash)
+            if uri:
+                shard_path, offset, length, _ = parse_uri(uri)
+                return make_uri(shard_path, offset, length, extension), False
+
+            length = os.path.getsize(source_path)
+            shard = self._shard_path(self.current)
+            if shard.exists() and shard.stat().st_size + HEADER.size + length > self.max_shard_bytes:
+                self.current += 1
+                shard = self._shard_path(self.current)
+
+            with open(shard, 'ab') as out, open(source_path, 'rb') as src:
+                offset = os.fstat(out.fileno()).st_size + HEADER.size
+                out.write(HEADER.pack(MAGIC, bytes.fromhex(img_hash), length))
+                shutil.copyfileobj(src, out, 1024 * 1024)
+                out.flush()
+                os.fsync(out.fileno())
+
+            uri = make_uri(shard, offset, length, extension)
+            self.index[img_hash] = uri
+            return uri, True
+
+    def commit(self, tmp_path, img_hash, extension):
+        uri, is_new = self.append(tmp_path, img_hash, extension)
+        self.discard_partial(tmp_path)
+        return uri, is_new
+
+    def link(self, object_path, target_path):
+        return object_path
+
+    def exists(self, path):
+        if is_shard_uri(path):
+            return self.reader.exists(path)
+        return super().exists(path)
@@ -0,0 +1,196 @@
+# src/image_store.py
+"""
+Контентно-адресуемое хранилище изображений.
+
+Файл хранится один раз под именем sha256 своего содержимого:
+<base>/objects/<h[:2]>/<h[2:4]>/<h><ext>. Человекочитаемые пути
+(каталог из URL + артикул) - жесткие ссылки на объект, поэтому одинаковые
+картинки цветовых вариантов занимают место один раз. Таблица images
+описывает объекты, products.img_hash связывает товар с объектом.
+
+Загрузка идет в tmp/<ключ>.part с постоянным именем: после обрыва файл
+докачивается через Range, а в хранилище попадает только проверенный и
+сброшенный на диск (fsync + rename) файл.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+CREATE_IMAGES_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS images (
+    hash TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    file_size INTEGER,
+    created_at TIMESTAMP DEFAULT NOW(),
+    last_accessed_at TIMESTAMP
+);
+ALTER TABLE images ADD COLUMN IF NOT EXISTS last_accessed_at TIMESTAMP;
+"""
+
+INSERT_IMAGE_SQL = """
+INSERT INTO images (hash, path, file_size)
+VALUES (%s, %s, %s)
+ON CONFLICT (hash) DO NOTHING;
+"""
+
+UPDATE_IMAGE_INFO_SQL = """
+UPDATE products
+SET img_local_path = %s,
+    img_file_size = %s,
+    img_hash = %s,
+    img_etag = %s,
+    img_last_modified = %s,
+    img_content_length = %s,
+    img_downloaded_at = NOW(),
+    img_evicted_at = NULL
+WHERE id = %s;
+"""
+
+# Уже скачанные URL: повторно не качаем, если объект на месте
+KNOWN_HASHES_SQL = """
+SELECT DISTINCT ON (p.prod_img_url)
+       p.prod_img_url, i.hash, i.path, i.file_size,
+       p.img_etag, p.img_last_modified, p.img_content_length
+FROM products p
+JOIN images i ON i.hash = p.img_hash
+WHERE p.prod_img_url = ANY(%s);
+"""
+
+class ImageStore:
+    """Объекты по sha256 и жесткие ссылки на них"""
+
+    def __init__(self, base_dir='prod_images'):
+        self.base_dir = Path(base_dir)
+        self.objects_dir = self.base_dir / 'objects'
+        self.tmp_dir = self.base_dir / 'tmp'
+        self.objects_dir.mkdir(exist_ok=True, parents=True)
+        self.tmp_dir.mkdir(exist_ok=True, parents=True)
+
+    def exists(self, path):
+        return os.path.exists(path)
+
+    def object_path(self, img_hash, extension):
+        return self.objects_dir / img_hash[:2] / img_hash[2:4] / f"{img_hash}{extension}"
+
+    def partial_path(self, key):
+        """Недокачанный файл с постоянным именем (ключ - id товара и URL)"""
+        return self.tmp_dir / f"{hashlib.sha1(key.encode('utf-8')).hexdigest()}.part"
+
+    @staticmethod
+    def _meta_path(part_path):
+        return Path(f"{part_path}.json")
+
+    def read_partial(self, part_path):
+        """
+        Состояние недокачанного файла
+
+        Returns:
+            tuple: (размер, валидатор для If-Range или None)
+        """
+        try:
+            offset = os.path.getsize(part_path)
+        except OSError:
+            return 0, None
+
+        try:
+            with open(self._meta_path(part_path), encoding='utf-8') as f:
+                meta = json.load(f)
+            return offset, meta.get('etag') or meta.get('last_modified')
+        except (OSError, ValueError):
+            return offset, None
+
+    def write_partial_meta(self, part_path, etag, last_modified):
+        """Валидатор ответа, с которого начата загрузка (без него докачка невозможна)"""
+        with open(self._meta_path(part_path), 'w', encoding='utf-8') as f:
+            json.dump({'etag': etag, 'last_modified': last_modified}, f)
+
+    def discard_partial(self, part_path):
+        for path in (Path(part_path), self._meta_path(part_path)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def hash_file(path, digest=None):
+        """sha256 уже скачанной части (докачка продолжает тот же хеш)"""
+        digest = digest or hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest
+
+    def prune_partials(self, max_age_days=7):
+        """Удаление брошенных недокачанных файлов"""
+        cutoff = time.time() - max_age_days * 86400
+        removed = 0
+        for path in self.tmp_dir.glob('*.part'):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    self.discard_partial(path)
+                    removed += 1
+            except OSError:
+                pass
+        return removed
+
+    @staticmethod
+    def _fsync_dir(path):
+        """Сброс записи каталога: rename переживает сбой питания"""
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:  # Windows: каталоги так не открываются
+            return
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def commit(self, tmp_path, img_hash, extension):
+        """
+        Перенос загруженного (и уже сброшенного на диск) файла в хранилище
+
+        Returns:
+            tuple: (путь объекта, True если объект новый)
+        """
+        object_path = self.object_path(img_hash, extension)
+        if object_path.exists():
+            # Такие байты уже есть - копию не храним
+            self.discard_partial(tmp_path)
+            return object_path, False
+
+        object_path.parent.mkdir(exist_ok=True, parents=True)
+        os.replace(tmp_path, object_path)
+        self._fsync_dir(object_path.parent)
+        self.discard_partial(tmp_path)  # остаток: метаданные докачки
+        return object_path, True
+
+    def link(self, object_path, target_path):
+        """
+        Жесткая ссылка target_path → объект (заменяет старый файл атомарно)
+
+        Returns:
+            Path: target_path или путь объекта, если ссылки не поддерживаются
+        """
+        target_path = Path(target_path)
+        target_path.parent.mkdir(exist_ok=True, parents=True)
+
+        try:
+            if target_path.exists() and os.path.samefile(target_path, object_path):
+                return target_path
+
+            tmp_link = target_path.with_name(f".{target_path.name}.{uuid.uuid4().hex[:8]}")
+            os.link(object_path, tmp_link)
+            os.replace(tmp_link, target_path)
+            return target_path
+
+        except OSError as e:
+            # Другой диск или ФС без жестких ссылок: товар ссылается на объект через БД
+            logger.debug(f"ℹ️ Жесткая ссылка не создана ({target_path}): {e}")
+            return object_path
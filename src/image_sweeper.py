@@ -0,0 +1,274 @@
+# src/image_sweeper.py
+"""
+Сверка файлов изображений с БД: файлы без ссылок и ссылки без файлов.
+
+Оба списка идут потоками в одном порядке - побайтовом порядке путей:
+- БД: все пути, на которые есть ссылки (img_local_path, images.path,
+  значения img_derivatives, файлы шардов из адресов shard:...),
+  серверным курсором с ORDER BY path COLLATE "C";
+- диск: обход os.scandir, записи каталога сортируются по имени, а к
+  имени каталога добавляется разделитель, поэтому обход в глубину выдает пути в
+  том же порядке, что и сортировка полных путей.
+
+Слияние двух отсортированных потоков за один проход: в памяти только
+текущая запись каждого потока и записи одного каталога, поэтому
+миллионы файлов не загружаются целиком.
+
+Исправления: файл без ссылок удаляется (если не изменялся min_age_hours -
+его может прямо сейчас записывать загрузчик), ссылка без файла
+обнуляется в БД - следующий запуск save_img.py загрузит изображение или
+сошлется на уцелевший объект без загрузки.
+"""
+
+import logging
+import os
+import time
+
+import psycopg2
+
+logger = logging.getLogger(__name__)
+
+# (путь, вид ссылки); UNION убирает повторы - одно превью или шард у многих товаров
+REFERENCES_SQL = """
+SELECT path, kind FROM (
+    SELECT img_local_path AS path, 'link' AS kind
+    FROM products
+    WHERE img_local_path IS NOT NULL AND img_local_path NOT LIKE 'shard:%%'
+    UNION
+    SELECT path, 'object' FROM images WHERE path NOT LIKE 'shard:%%'
+    UNION
+    SELECT d.value, 'derivative'
+    FROM products, jsonb_each_text(products.img_derivatives) AS d
+    WHERE products.img_derivatives IS NOT NULL
+    UNION
+    SELECT substring(img_local_path FROM '^shard:(.*):[0-9]+:[0-9]+'), 'shard'
+    FROM products
+    WHERE img_local_path LIKE 'shard:%%'
+    UNION
+    SELECT substring(path FROM '^shard:(.*):[0-9]+:[0-9]+'), 'shard' FROM images WHERE path LIKE 'shard:%%'
+) refs
+WHERE path LIKE %s
+ORDER BY path COLLATE "C", kind;
+"""
+
+# Исправления ссылок без файлов (пачками по списку путей)
+FIX_SQL = {
+    'link': "UPDATE products SET img_local_path = NULL WHERE img_local_path = ANY(%s);",
+    'object': "DELETE FROM images WHERE path = ANY(%s);",
+    'derivative': """
+    UPDATE products SET img_derivatives = NULL
+    WHERE img_derivatives IS NOT NULL
+      AND EXISTS (SELECT 1 FROM jsonb_each_text(img_derivatives) AS d WHERE d.value = ANY(%s));
+    """,
+    'shard': """
+    WITH lost AS (SELECT 'shard:' || s || ':' AS prefix FROM unnest(%s::text[]) AS s)
+    UPDATE products SET img_local_path = NULL
+    WHERE img_local_path LIKE 'shard:%%'
+      AND EXISTS (SELECT 1 FROM lost WHERE starts_with(img_local_path, lost.prefix));
+    """,
+}
+
+FIX_SHARD_IMAGES_SQL = """
+WITH lost AS (SELECT 'shard:' || s || ':' AS prefix FROM unnest(%s::text[]) AS s)
+DELETE FROM images
+WHERE path LIKE 'shard:%%'
+  AND EXISTS (SELECT 1 FROM lost WHERE starts_with(path, lost.prefix));
+"""
+
+ANY_REFERENCE_SQL = """
+SELECT
+    EXISTS (SELECT 1 FROM products WHERE img_local_path IS NOT NULL),
+    EXISTS (SELECT 1 FROM products WHERE img_local_path LIKE %s OR img_local_path LIKE %s);
+"""
+
+def like_prefix(prefix):
+    """Шаблон LIKE для путей, начинающихся с prefix"""
+    return prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+def walk_sorted(root, skip=()):
+    """
+    Файлы под root в побайтовом порядке полных путей
+
+    Yields:
+        tuple: (путь, os.stat_result)
+    """
+    try:
+        entries = list(os.scandir(root))
+    except OSError as e:
+        logger.warning(f"⚠️ Каталог не прочитан {root}: {e}")
+        return
+
+    def sort_key(entry):
+        return entry.name + os.sep if entry.is_dir(follow_symlinks=False) else entry.name
+
+    for entry in sorted(entries, key=sort_key):
+        if entry.is_dir(follow_symlinks=False):
+            if entry.path not in skip:
+                yield from walk_sorted(entry.path, skip)
+        elif entry.is_file(follow_symlinks=False):
+            try:
+                yield entry.path, entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+
+def grouped(rows):
+    """(путь, вид) по одному на строку → (путь, {виды}) по одному на путь"""
+    current, kinds = None, set()
+    for path, kind in rows:
+        if path != current:
+            if current is not None:
+                yield current, kinds
+            current, kinds = path, set()
+        kinds.add(kind)
+    if current is not None:
+        yield current, kinds
+
+def merge_diff(db_paths, fs_files):
+    """
+    Слияние отсортированных потоков
+
+    Yields:
+        tuple: ('orphan', путь, stat) - файл без ссылок
+               ('missing', путь, {виды}) - ссылка без файла
+               ('ok', путь, None)
+    """
+    db_item = next(db_paths, None)
+    fs_item = next(fs_files, None)
+    while db_item is not None or fs_item is not None:
+        if fs_item is None or (db_item is not None and db_item[0] < fs_item[0]):
+            yield 'missing', db_item[0], db_item[1]
+            db_item = next(db_paths, None)
+        elif db_item is None or fs_item[0] < db_item[0]:
+            yield 'orphan', fs_item[0], fs_item[1]
+            fs_item = next(fs_files, None)
+        else:
+            yield 'ok', fs_item[0], None
+            db_item = next(db_paths, None)
+            fs_item = next(fs_files, None)
+
+class ImageSweeper:
+    """Сверка каталога изображений с БД и исправление расхождений"""
+
+    def __init__(self, connection, base_dir, db_config, min_age_hours=1.0,
+                 dry_run=False, batch_size=1000, sample_size=20):
+        self.connection = connection  # исправления
+        self.base_dir = str(base_dir).rstrip('/\\')
+        self.db_config = db_config
+        self.min_age_seconds = min_age_hours * 3600
+        self.dry_run = dry_run
+        self.batch_size = batch_size
+        self.sample_size = sample_size
+
+        self.pending = {kind: [] for kind in FIX_SQL}
+        self.stats = {
+            'files': 0, 'references': 0,
+            'orphans': 0, 'orphan_bytes': 0, 'too_new': 0, 'deleted': 0,
+            'missing': 0, 'fixed': 0,
+        }
+        self.samples = {'orphan': [], 'missing': []}
+
+    def references(self, read_connection):
+        """Пути из БД серверным курсором (свое соединение: исправления коммитятся по ходу)"""
+        with read_connection.cursor(name='image_sweep_references') as cursor:
+            cursor.itersize = 5000
+            cursor.execute(REFERENCES_SQL, (like_prefix(self.base_dir + os.sep),))
+            for row in cursor:
+                yield row
+
+    def check_prefix(self):
+        """
+        Защита от несовпадения путей: если у товаров есть файлы, но ни один
+        не лежит под base_dir, сверка объявила бы сиротами все файлы
+        """
+        prefix = self.base_dir + os.sep
+        with self.connection.cursor() as cursor:
+            cursor.execute(ANY_REFERENCE_SQL, (like_prefix(prefix), like_prefix('shard:' + prefix)))
+            has_paths, under_base = cursor.fetchone()
+        self.connection.commit()
+        if has_paths and not under_base:
+            raise RuntimeError(f"Пути в БД не начинаются с {prefix}: запустите с тем же --output, что и загрузку")
+
+    def on_orphan(self, path, stat):
+        self.stats['orphans'] += 1
+        self.stats['orphan_bytes'] += stat.st_size
+        # ctime: новая жесткая ссылка на старый объект имеет старый mtime
+        if time.time() - max(stat.st_mtime, stat.st_ctime) < self.min_age_seconds:
+            self.stats['too_new'] += 1
+            return
+        if len(self.samples['orphan']) < self.sample_size:
+            self.samples['orphan'].append(path)
+        if self.dry_run:
+            return
+        try:
+            os.remove(path)
+            self.stats['deleted'] += 1
+        except OSError as e:
+            logger.warning(f"⚠️ Не удалось удалить {path}: {e}")
+
+    def on_missing(self, path, kinds):
+        self.stats['missing'] += 1
+        if len(self.samples['missing']) < self.sample_size:
+            self.samples['missing'].append(f"{path} ({', '.join(sorted(kinds))})")
+        if self.dry_run:
+            return
+        for kind in kinds:
+            self.pending[kind].append(path)
+            if len(self.pending[kind]) >= self.batch_size:
+                self.flush(kind)
+
+    def flush(self, kind):
+        paths = self.pending[kind]
+        if not paths:
+            return
+        try:
+            with self.connection.cursor() as cursor:
+                cursor.execute(FIX_SQL[kind], (paths,))
+                fixed = cursor.rowcount
+                if kind == 'shard':
+                    cursor.execute(FIX_SHARD_IMAGES_SQL, (paths,))
+            self.connection.commit()
+            self.stats['fixed'] += max(fixed, 0)
+        except Exception as e:
+            logger.error(f"❌ Ошибка исправления ссылок ({kind}): {e}")
+            self.connection.rollback()
+        self.pending[kind] = []
+
+    def run(self):
+        """
+        Сверка и исправление (dry_run - только отчет)
+
+        Returns:
+            dict: Статистика
+        """
+        self.check_prefix()
+        skip = {os.path.join(self.base_dir, 'tmp')}  # недокачанные файлы чистит prune_partials
+
+        read_connection = psycopg2.connect(
+            host=self.db_config['host'],
+            port=self.db_config['port'],
+            database=self.db_config['database'],
+            user=self.db_config['user'],
+            password=self.db_config['password']
+        )
+        try:
+            db_paths = grouped(self.references(read_connection))
+            fs_files = walk_sorted(self.base_dir, skip)
+            for state, path, info in merge_diff(db_paths, fs_files):
+                if state != 'missing':
+                    self.stats['files'] += 1
+                if state != 'orphan':
+                    self.stats['references'] += 1
+
+                if state == 'orphan':
+                    self.on_orphan(path, info)
+                elif state == 'missing':
+                    self.on_missing(path, info)
+
+                if (self.stats['files'] + self.stats['missing']) % 100000 == 0:
+                    logger.info(f"🔎 Проверено файлов: {self.stats['files']}, ссылок: {self.stats['references']}")
+        finally:
+            read_connection.close()
+
+        for kind in self.pending:
+            self.flush(kind)
+        return self.stats
@@ -0,0 +1,141 @@
+# src/image_writer.py
+"""
+Единственный писатель информации о загруженных изображениях.
+
+Потоки и корутины загрузчика не трогают БД: они кладут записи
+(id, путь, размер, хеш, путь объекта, валидаторы HTTP) в очередь, а один поток-писатель на своем
+соединении сохраняет их пачками - одна транзакция на batch_size записей
+или на flush_interval секунд. Загрузки не ждут commit, а транзакции
+разных потоков не перемешиваются на общем соединении.
+"""
+
+import logging
+import queue
+import threading
+import time
+
+import psycopg2
+from psycopg2.extras import execute_batch
+
+from src.config import DB_CONFIG, DB_PIPELINE_CONFIG
+from src import pipeline_db
+from src.image_store import INSERT_IMAGE_SQL, UPDATE_IMAGE_INFO_SQL
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+class ImageInfoWriter:
+    """Поток, пакетно записывающий информацию о файлах изображений"""
+
+    def __init__(self, batch_size=50, flush_interval=1.0, queue_size=1000, db_config=None):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.db_config = db_config or DB_CONFIG
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.stats = {'written': 0, 'batches': 0, 'failed': 0}
+
+        self.connection = None
+        self.pipeline_db = None
+        self._thread = threading.Thread(target=self._run, name='image-info-writer', daemon=True)
+
+    def start(self):
+        """Подключение и запуск потока"""
+        if DB_PIPELINE_CONFIG['enabled'] and pipeline_db.is_available():
+            try:
+                self.pipeline_db = pipeline_db.PipelineDatabase(self.db_config)
+            except Exception as e:
+                logger.warning(f"⚠️ Pipeline-слой недоступен, используем psycopg2: {e}")
+
+        if not self.pipeline_db:
+            self.connection = psycopg2.connect(
+                host=self.db_config['host'],
+                port=self.db_config['port'],
+                database=self.db_config['database'],
+                user=self.db_config['user'],
+                password=self.db_config['password']
+            )
+
+        self._thread.start()
+        return self
+
+    def put(self, product_id, local_path, file_size, img_hash=None, object_path=None,
+            validators=(None, None, None)):
+        """Постановка записи в очередь (блокируется, если писатель отстал на queue_size записей)"""
+        self.queue.put((product_id, local_path, file_size, img_hash, object_path, validators))
+
+    def _run(self):
+        batch = []
+        deadline = None
+
+        while True:
+            try:
+                if batch:
+                    item = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                else:
+                    item = self.queue.get()
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                self._flush(batch)
+                return
+
+            if item is not None:
+                if not batch:
+                    deadline = time.monotonic() + self.flush_interval
+                batch.append(item)
+
+            if batch and (len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self._flush(batch)
+                batch = []
+
+    def _flush(self, batch):
+        if not batch:
+            return
+
+        if self.pipeline_db:
+            written = self.pipeline_db.save_download_infos(batch)
+        else:
+            try:
+                with self.connection.cursor() as cursor:
+                    execute_batch(cursor, INSERT_IMAGE_SQL, [
+                        (img_hash, object_path, file_size)
+                        for _, _, file_size, img_hash, object_path, _ in batch
+                        if img_hash and object_path
+                    ])
+                    execute_batch(cursor, UPDATE_IMAGE_INFO_SQL, [
+                        (local_path, file_size, img_hash, *validators, product_id)
+                        for product_id, local_path, file_size, img_hash, _, validators in batch
+                    ])
+                self.connection.commit()
+                written = len(batch)
+            except Exception as e:
+                logger.error(f"❌ Ошибка пакетной записи информации об изображениях: {e}")
+                self.connection.rollback()
+                written = 0
+
+        self.stats['batches'] += 1
+        self.stats['written'] += written
+        self.stats['failed'] += len(batch) - written
+        logger.debug(f"💾 Записана информация о {written} изображениях")
+
+    def close(self):
+        """Запись остатка очереди и остановка потока"""
+        if self._thread.is_alive():
+            self.queue.put(_STOP)
+            self._thread.join()
+
+        if self.pipeline_db:
+            self.pipeline_db.close()
+        if self.connection:
+            self.connection.close()
+
+        logger.info(f"💾 Информация об изображениях: записано {self.stats['written']} "
+                    f"({self.stats['batches']} транзакций), ошибок {self.stats['failed']}")
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,347 @@
+# src/network_capture.py
+"""
+Перехват XHR/JSON запросов страницы через CDP и их повтор без браузера.
+
+SeleniumParser с включенным performance-логом собирает ответы на запросы,
+URL которых подходит под XHR_CAPTURE_CONFIG['url_patterns']. Из каждого
+такого запроса строится шаблон: метод, URL и тело, в которых артикул и
+адрес страницы заменены на {{article}} / {{page_url}}, плюс пути в JSON,
+по которым лежат уже извлеченные из DOM поля (цена, название...).
+Шаблоны хранятся в data/xhr_templates.json, XhrReplayer выполняет их
+обычным requests и достает поля по сохраненным путям.
+"""
+
+import base64
+import json
+import logging
+import os
+import re
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import quote, quote_plus, urlsplit, parse_qsl
+
+from src.config import XHR_CAPTURE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Скалярные поля товара, которые ищем в JSON ответах
+CAPTURED_FIELDS = ('prod_name', 'prod_price_new', 'prod_price_old', 'prod_article', 'prod_img_url')
+PRICE_FIELDS = ('prod_price_new', 'prod_price_old')
+
+# Заголовки, которые имеет смысл повторять (cookie и сессионные токены - нет)
+REPLAY_HEADERS = {'accept', 'content-type', 'x-requested-with', 'bx-ajax'}
+
+def enable_performance_log(chrome_options):
+    """Включение performance-лога Chrome (события Network.* через get_log)"""
+    chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+
+def article_from_url(url):
+    match = re.search(r'-(\d+)\.html$', url or '')
+    return match.group(1) if match else None
+
+def _normalize(value):
+    """Значение для сравнения: числа как float, строки без лишних пробелов"""
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return round(float(value), 2)
+    if isinstance(value, str):
+        text = ' '.join(value.split())
+        number = re.sub(r'[\s ₽]|руб\.?', '', text).replace(',', '.')
+        try:
+            return round(float(number), 2)
+        except ValueError:
+            return text.lower() or None
+    return None
+
+def find_paths(payload, value, path=()):
+    """Пути (кортежи ключей/индексов) ко всем вхождениям value в JSON"""
+    target = _normalize(value)
+    if target is None:
+        return []
+
+    if isinstance(payload, dict):
+        items = payload.items()
+    elif isinstance(payload, list):
+        items = enumerate(payload)
+    else:
+        return [list(path)] if _normalize(payload) == target else []
+
+    paths = []
+    for key, child in items:
+        paths.extend(find_paths(child, value, path + (key,)))
+    return paths
+
+def extract_path(payload, path):
+    for key in path:
+        try:
+            payload = payload[key]
+        except (KeyError, IndexError, TypeError):
+            return None
+    return payload
+
+def template_key(method, url):
+    """Ключ шаблона: метод, путь и имена параметров запроса"""
+    parts = urlsplit(url)
+    params = ','.join(sorted({name for name, _ in parse_qsl(parts.query, keep_blank_values=True)}))
+    return f"{method} {parts.path}?{params}"
+
+# Как значение было закодировано в исходном запросе: как есть, quote, quote_plus
+ENCODINGS = (
+    ('', lambda v: v),
+    ('|q', lambda v: quote(v, safe='')),
+    ('|qp', quote_plus),
+)
+
+def _substitute(text, values):
+    """Замена значений на {{плейсхолдеры}} (page_url раньше article - он его содержит)"""
+    if not text:
+        return text
+    for name in ('page_url', 'article'):
+        value = values.get(name)
+        if not value:
+            continue
+        for suffix, encode in ENCODINGS:
+            text = text.replace(encode(value), '{{%s%s}}' % (name, suffix))
+    return text
+
+def _fill(text, values):
+    if not text:
+        return text
+    for name, value in values.items():
+        for suffix, encode in ENCODINGS:
+            text = text.replace('{{%s%s}}' % (name, suffix), encode(str(value)))
+    return text
+
+class NetworkCapture:
+    """Сбор JSON ответов из performance-лога Chrome"""
+
+    def __init__(self, url_patterns=None, max_body_kb=None):
+        patterns = url_patterns or XHR_CAPTURE_CONFIG['url_patterns']
+        self.url_patterns = [re.compile(p) for p in patterns]
+        self.max_body_bytes = (max_body_kb or XHR_CAPTURE_CONFIG['max_body_kb']) * 1024
+
+    def matches(self, url):
+        return any(p.search(url) for p in self.url_patterns)
+
+    def reset(self, driver):
+        """Сброс накопленного лога перед загрузкой новой страницы"""
+        try:
+            driver.get_log('performance')
+        except Exception:
+            pass
+
+    def collect(self, driver):
+        """
+        Разбор performance-лога с последнего вызова
+
+        Returns:
+            list: dict(url, method, headers, post_data, status, payload) для JSON ответов
+        """
+        requests_by_id = {}
+        responses = {}
+        finished = set()
+
+        for entry in driver.get_log('performance'):
+            try:
+                message = json.loads(entry['message'])['message']
+            except (ValueError, KeyError):
+                continue
+
+            method = message.get('method')
+            params = message.get('params', {})
+            request_id = params.get('requestId')
+
+            if method == 'Network.requestWillBeSent':
+                request = params.get('request', {})
+                if self.matches(request.get('url', '')):
+                    requests_by_id[request_id] = request
+            elif method == 'Network.responseReceived' and request_id in requests_by_id:
+                responses[request_id] = params.get('response', {})
+            elif method == 'Network.loadingFinished':
+                finished.add(request_id)
+
+        captured = []
+        for request_id, request in requests_by_id.items():
+            response = responses.get(request_id)
+            if not response or request_id not in finished:
+                continue
+
+            try:
+                body = driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': request_id})
+            except Exception as e:
+                logger.debug(f"ℹ️ Тело ответа недоступно {request['url']}: {e}")
+                continue
+
+            text = body.get('body', '')
+            if body.get('base64Encoded'):
+                text = base64.b64decode(text).decode('utf-8', errors='replace')
+            if len(text) > self.max_body_bytes:
+                continue
+
+            try:
+                payload = json.loads(text)
+            except ValueError:
+                continue
+
+            captured.append({
+                'url': request['url'],
+                'method': request.get('method', 'GET'),
+                'headers': request.get('headers', {}),
+                'post_data': request.get('postData'),
+                'status': response.get('status'),
+                'payload': payload,
+            })
+
+        return captured
+
+def make_template(capture, page_url, data):
+    """Шаблон запроса из перехваченного ответа и данных, извлеченных из DOM"""
+    values = {
+        'page_url': page_url,
+        'article': (data or {}).get('prod_article') or article_from_url(page_url),
+    }
+    # Короткий артикул совпадет с чем угодно - не подставляем
+    if values['article'] and len(str(values['article'])) < 4:
+        values['article'] = None
+    values['article'] = str(values['article']) if values['article'] else None
+
+    url = _substitute(capture['url'], values)
+    post_data = _substitute(capture['post_data'], values)
+
+    fields = {}
+    for field in CAPTURED_FIELDS:
+        if data and data.get(field):
+            paths = find_paths(capture['payload'], data[field])
+            if paths:
+                fields[field] = paths[0]
+
+    return {
+        'key': template_key(capture['method'], url),
+        'method': capture['method'],
+        'url': url,
+        'headers': {k: v for k, v in capture['headers'].items() if k.lower() in REPLAY_HEADERS},
+        'post_data': post_data,
+        'fields': fields,
+        'placeholders': [name for name in values if '{{' + name in url + (post_data or '')],
+        'example_page': page_url,
+        'captured_at': datetime.now().isoformat(timespec='seconds'),
+    }
+
+class TemplateStore:
+    """Шаблоны XHR запросов в JSON файле (ключ - template_key)"""
+
+    def __init__(self, path=None):
+        self.path = Path(path or XHR_CAPTURE_CONFIG['templates_file'])
+        self.templates = self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return {}
+        try:
+            return json.loads(self.path.read_text(encoding='utf-8'))
+        except ValueError as e:
+            logger.warning(f"⚠️ Файл шаблонов XHR поврежден ({self.path}): {e}")
+            return {}
+
+    def update(self, templates):
+        """Слияние новых шаблонов: найденные пути полей дополняют старые"""
+        # Файл могли обновить другие браузеры пула
+        self.templates = self._load()
+        changed = False
+        for template in templates:
+            old = self.templates.get(template['key'])
+            if old:
+                fields = dict(old.get('fields', {}))
+                fields.update(template['fields'])
+                template = dict(template, fields=fields)
+                if dict(template, captured_at=None) == dict(old, captured_at=None):
+                    continue
+            self.templates[template['key']] = template
+            changed = True
+
+        if changed:
+            self.save()
+        return changed
+
+    def save(self):
+        self.path.parent.mkdir(exist_ok=True, parents=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(self.templates, ensure_ascii=False, indent=2), encoding='utf-8')
+        os.replace(tmp_path, self.path)
+
+    def with_fields(self):
+        """Шаблоны, из ответов которых известно, как достать поля товара"""
+        return [t for t in self.templates.values() if t.get('fields')]
+
+class XhrReplayer:
+    """Повтор сохраненных XHR запросов через requests"""
+
+    def __init__(self, session, store=None):
+        self.session = session
+        self.store = store or TemplateStore()
+
+    def has_templates(self):
+        return bool(self.store.with_fields())
+
+    def replay(self, template, page_url, article=None):
+        """
+        Выполнение одного шаблона
+
+        Returns:
+            JSON ответа или None (не хватает значений плейсхолдеров / ошибка)
+        """
+        values = {'page_url': page_url, 'article': article or article_from_url(page_url)}
+        if any(not values.get(name) for name in template.get('placeholders', [])):
+            return None
+
+        headers = dict(template.get('headers', {}))
+        headers['Referer'] = page_url
+
+        try:
+            response = self.session.request(
+                template['method'],
+                _fill(template['url'], values),
+                data=_fill(template.get('post_data'), values),
+                headers=headers,
+                timeout=10
+            )
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            logger.debug(f"ℹ️ Повтор XHR {template['key']} не удался: {e}")
+            return None
+
+    def fetch_fields(self, page_url, article=None, wanted=None):
+        """
+        Поля товара из повторенных XHR запросов
+
+        Args:
+            wanted: Какие поля нужны (None - все известные)
+
+        Returns:
+            dict: Найденные поля
+        """
+        found = {}
+        for template in self.store.with_fields():
+            needed = [f for f in template['fields'] if (wanted is None or f in wanted) and f not in found]
+            if not needed:
+                continue
+
+            payload = self.replay(template, page_url, article)
+            if payload is None:
+                continue
+
+            for field in needed:
+                value = extract_path(payload, template['fields'][field])
+                if value in (None, ''):
+                    continue
+                if field in PRICE_FIELDS:
+                    value = _normalize(value)
+                    if not isinstance(value, float):
+                        continue
+                elif not isinstance(value, str):
+                    value = str(value)
+                found[field] = value
+
+        return found
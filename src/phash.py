@@ -0,0 +1,163 @@
+# src/phash.py
+"""
+Перцептивный хеш изображений и поиск почти одинаковых картинок.
+
+dHash (64 бита: яркость соседних пикселей уменьшенной 9x8 копии) не
+меняется от пересжатия и ресайза, поэтому одна фотография из разных
+resize_cache дает одинаковый или близкий хеш. В БД хеш хранится как
+BIGINT (знаковый), расстояние между картинками - число различающихся бит.
+
+Поиск по всему каталогу: кандидаты отбираются по точному совпадению
+части хеша, затем сравниваются блоками - XOR двух блоков uint64 и
+popcount, без циклов Python по парам. Только numpy
+(Pillow нужен лишь для вычисления хеша), модуль импортируется и из CRM.
+"""
+
+import numpy as np
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+HASH_SIZE = 8
+
+def dhash(img):
+    """
+    dHash открытого изображения PIL
+
+    Returns:
+        int: 64-битный хеш со знаком (как BIGINT в PostgreSQL)
+    """
+    small = img.convert('L').resize((HASH_SIZE + 1, HASH_SIZE), Image.LANCZOS)
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    value = int(np.packbits(bits).view('>u8')[0])
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+def dhash_file(path):
+    with Image.open(path) as img:
+        img.draft('L', (64, 64))
+        return dhash(img)
+
+_M1 = np.uint64(0x5555555555555555)
+_M2 = np.uint64(0x3333333333333333)
+_M4 = np.uint64(0x0F0F0F0F0F0F0F0F)
+_H01 = np.uint64(0x0101010101010101)
+
+def popcount64(values):
+    """Число единичных бит в каждом элементе массива uint64 (массив изменяется)"""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values)
+    # SWAR: суммы бит по парам, четверкам, байтам, затем сумма байтов умножением
+    values -= (values >> np.uint64(1)) & _M1
+    values = (values & _M2) + ((values >> np.uint64(2)) & _M2)
+    values = (values + (values >> np.uint64(4))) & _M4
+    values *= _H01
+    return values >> np.uint64(56)
+
+def _block_pairs(values, indices, max_distance, block):
+    """Пары внутри группы кандидатов: XOR блоков и popcount"""
+    for start_a in range(0, len(indices), block):
+        left = indices[start_a:start_a + block]
+        for start_b in range(start_a, len(indices), block):
+            right = indices[start_b:start_b + block]
+            distances = popcount64(values[left][:, None] ^ values[right][None, :])
+
+            rows, cols = np.nonzero(distances <= max_distance)
+            for r, c in zip(rows.tolist(), cols.tolist()):
+                i, j = int(left[r]), int(right[c])
+                if i < j:
+                    yield i, j, int(distances[r, c])
+                elif j < i:
+                    yield j, i, int(distances[r, c])
+
+def near_pairs(hashes, max_distance=6, block=2048):
+    """
+    Все пары индексов (i < j) с расстоянием Хэмминга <= max_distance
+
+    Полный перебор n^2 на всем каталоге долог, поэтому сначала отбираются
+    кандидаты: хеш делится на max_distance + 1 частей, и у пары с
+    расстоянием <= max_distance хотя бы одна часть совпадает точно
+    (принцип Дирихле). Точно сравниваются только хеши с общей частью.
+
+    Args:
+        hashes: последовательность 64-битных хешей (со знаком или без)
+        block: размер блока сравнения; память на блок ~ block^2 * 16 байт
+
+    Yields:
+        tuple: (i, j, расстояние), каждая пара один раз
+    """
+    values = np.asarray(hashes, dtype=np.int64).view(np.uint64)
+    if len(values) < 2:
+        return
+
+    bounds = np.linspace(0, 64, max_distance + 2).astype(int)
+    seen = set()
+
+    for low, high in zip(bounds[:-1], bounds[1:]):
+        part = (values >> np.uint64(low)) & np.uint64((1 << int(high - low)) - 1)
+        order = np.argsort(part, kind='stable')
+        edges = np.flatnonzero(np.diff(part[order])) + 1
+
+        for group in np.split(order, edges):
+            if len(group) < 2:
+                continue
+            for pair in _block_pairs(values, group, max_distance, block):
+                if pair[:2] not in seen:
+                    seen.add(pair[:2])
+                    yield pair
+
+def find_clusters(items, max_distance=6, block=2048):
+    """
+    Группы почти одинаковых изображений
+
+    Одинаковые хеши сравниваются один раз: поиск идет по уникальным
+    значениям, затем группы разворачиваются обратно в товары.
+
+    Args:
+        items: [(ключ, хеш), ...] - ключ обычно id товара
+
+    Returns:
+        list: [{'keys': [...], 'hashes': [...], 'max_distance': N}, ...],
+              самые большие группы первыми; max_distance - наибольшее
+              расстояние среди пар, связавших группу
+    """
+    by_hash = {}
+    for key, value in items:
+        by_hash.setdefault(value, []).append(key)
+    unique = list(by_hash)
+
+    # Объединение в группы (disjoint set)
+    parent = list(range(len(unique)))
+    spread = {}
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for i, j, distance in near_pairs(unique, max_distance, block):
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parent[root_j] = root_i
+        spread[root_i] = max(spread.get(root_i, 0), spread.pop(root_j, 0), distance)
+
+    groups = {}
+    for index in range(len(unique)):
+        groups.setdefault(find(index), []).append(index)
+
+    clusters = []
+    for root, members in groups.items():
+        keys = [key for index in members for key in by_hash[unique[index]]]
+        if len(keys) < 2:
+            continue
+        clusters.append({
+            'keys': keys,
+            'hashes': [unique[index] for index in members],
+            'max_distance': spread.get(root, 0),
+        })
+
+    clusters.sort(key=lambda c: len(c['keys']), reverse=True)
+    return clusters
@@ -0,0 +1,266 @@
+# src/pipeline_db.py
+"""
+Слой доступа к данным на psycopg 3 для медленных каналов до БД.
+
+Горячие запросы (upsert URL, запись результата парсинга, запись информации
+об изображении) отправляются пачкой в pipeline mode и выполняются как
+серверные prepared statements. Вместо round-trip на каждый execute + commit
+получаем один round-trip на пачку.
+"""
+
+import logging
+import json
+from src.config import DB_CONFIG, DB_PIPELINE_CONFIG
+from src.image_store import INSERT_IMAGE_SQL, UPDATE_IMAGE_INFO_SQL
+
+try:
+    import psycopg
+except ImportError:  # psycopg 3 не обязателен, основной драйвер - psycopg2
+    psycopg = None
+
+logger = logging.getLogger(__name__)
+
+# ======================
+# ГОРЯЧИЕ ЗАПРОСЫ
+# ======================
+
+UPSERT_PRODUCT_URL_SQL = """
+INSERT INTO products (url, article, category_id, created_at)
+VALUES (%s, %s, %s, NOW())
+ON CONFLICT (url) DO NOTHING
+RETURNING id;
+"""
+
+UPDATE_CATEGORY_TOTAL_SQL = """
+UPDATE categories
+SET total_products = (
+    SELECT COUNT(*) FROM products
+    WHERE category_id = %s
+),
+updated_at = NOW()
+WHERE id = %s;
+"""
+
+UPDATE_RESULT_SUCCESS_SQL = """
+UPDATE products
+SET prod_name = %s,
+    prod_price_new = %s,
+    prod_price_old = %s,
+    prod_article = %s,
+    prod_img_url = %s,
+    prod_characteristics = %s,
+    parse_source = %s,
+    escalation_reason = %s,
+    parsed_at = COALESCE(%s::timestamp, NOW()),
+    parse_status = 'success',
+    parse_error = NULL,
+    parse_attempts = COALESCE(parse_attempts, 0) + 1,
+    updated_at = NOW()
+FROM (SELECT prod_img_url AS old_img_url FROM products WHERE id = %s) AS old
+WHERE products.id = %s
+RETURNING old.old_img_url,
+          products.img_local_path IS NOT NULL OR products.img_evicted_at IS NOT NULL;
+"""
+
+UPDATE_RESULT_STATUS_SQL = """
+UPDATE products
+SET parsed_at = NOW(),
+    parse_status = %s,
+    parse_error = %s,
+    parse_attempts = COALESCE(parse_attempts, 0) + 1,
+    updated_at = NOW()
+WHERE id = %s;
+"""
+
+def is_available():
+    """Установлен ли psycopg 3"""
+    return psycopg is not None
+
+def build_result_update(product_id, parse_result, prod_type='product'):
+    """
+    Построение UPDATE для результата парсинга товара
+
+    Returns:
+        tuple: (sql, params) - те же ветки, что и в ProductProcessor.update_product_data;
+        UPDATE успешного результата возвращает (прежний prod_img_url, есть ли файл)
+    """
+    if parse_result.get('success') and prod_type == 'product':
+        data = parse_result['data']
+
+        characteristics_json = None
+        if data.get('characteristics'):
+            try:
+                characteristics_json = json.dumps(data['characteristics'], ensure_ascii=False)
+            except Exception as e:
+                logger.warning(f"⚠️ Не удалось преобразовать характеристики в JSON: {e}")
+
+        return UPDATE_RESULT_SUCCESS_SQL, (
+            data['prod_name'],
+            data['prod_price_new'],
+            data['prod_price_old'],
+            data['prod_article'],
+            data['prod_img_url'],
+            characteristics_json,
+            parse_result.get('source'),
+            parse_result.get('escalation_reason'),
+            parse_result.get('rendered_at'),  # данные со снимка датируются временем снимка
+            product_id,
+            product_id
+        )
+
+    if prod_type != 'product':
+        return UPDATE_RESULT_STATUS_SQL, (
+            'skipped', 'Не является товаром (prod_type != "product")', product_id
+        )
+
+    return UPDATE_RESULT_STATUS_SQL, ('failed', parse_result.get('error'), product_id)
+
+class PipelineDatabase:
+    """Пакетная запись в PostgreSQL через psycopg 3 pipeline mode"""
+
+    def __init__(self, db_config=None, prepare_threshold=None):
+        if psycopg is None:
+            raise RuntimeError("psycopg 3 не установлен: pip install 'psycopg[binary]'")
+
+        self.db_config = db_config or DB_CONFIG
+        if prepare_threshold is None:
+            prepare_threshold = DB_PIPELINE_CONFIG['prepare_threshold']
+        self.prepare_threshold = prepare_threshold
+        self.connection = None
+        self.connect()
+
+    def connect(self):
+        """Подключение к PostgreSQL"""
+        try:
+            self.connection = psycopg.connect(
+                host=self.db_config['host'],
+                port=self.db_config['port'],
+                dbname=self.db_config['database'],
+                user=self.db_config['user'],
+                password=self.db_config['password'],
+                prepare_threshold=self.prepare_threshold
+            )
+            logger.info("✅ Подключение к PostgreSQL (psycopg 3, pipeline) успешно")
+        except Exception as e:
+            logger.error(f"❌ Ошибка подключения к PostgreSQL (psycopg 3): {e}")
+            raise
+
+    def save_product_urls(self, urls, category_id):
+        """
+        Upsert списка URL товаров одной пачкой
+
+        Returns:
+            int: Количество добавленных URL
+        """
+        if not urls:
+            return 0
+
+        import re
+        params = []
+        for url in urls:
+            match = re.search(r'-(\d+)\.html$', url)
+            params.append((url, match.group(1) if match else None, category_id))
+
+        try:
+            with self.connection.transaction():
+                with self.connection.cursor() as cursor:
+                    # executemany в psycopg 3 сам работает в pipeline mode
+                    cursor.executemany(UPSERT_PRODUCT_URL_SQL, params, returning=True)
+
+                    added_count = 0
+                    while True:
+                        if cursor.fetchone():
+                            added_count += 1
+                        if not cursor.nextset():
+                            break
+
+                    cursor.execute(UPDATE_CATEGORY_TOTAL_SQL, (category_id, category_id), prepare=True)
+
+            return added_count
+
+        except Exception as e:
+            logger.error(f"❌ Ошибка пакетного сохранения товаров: {e}")
+            return 0
+
+    def update_product_results(self, results):
+        """
+        Запись результатов парсинга одной транзакцией
+
+        pipeline снаружи транзакции: BEGIN, UPDATE и COMMIT уходят вместе и
+        синхронизируются один раз - один round-trip на пачку (и на один товар).
+
+        Args:
+            results: Список кортежей (product_id, parse_result, prod_type)
+
+        Returns:
+            tuple: (обновлено строк, {product_id: (прежний prod_img_url, есть ли файл)})
+        """
+        if not results:
+            return 0, {}
+
+        try:
+            with self.connection.pipeline():
+                with self.connection.transaction():
+                    # Свой курсор на запрос: у каждого свой rowcount после синхронизации
+                    cursors = []
+                    for product_id, parse_result, prod_type in results:
+                        sql, params = build_result_update(product_id, parse_result, prod_type)
+                        cursors.append((product_id, self.connection.execute(sql, params, prepare=True)))
+
+            updated = 0
+            previous = {}
+            for product_id, cursor in cursors:
+                updated += max(cursor.rowcount, 0)
+                if cursor.description and cursor.rowcount == 1:
+                    previous[product_id] = cursor.fetchone()
+
+        except Exception as e:
+            logger.error(f"❌ Ошибка пакетной записи результатов: {e}")
+            return 0, {}
+
+        if updated < len(results):
+            logger.warning(f"⚠️ Не найдено записей для обновления: {len(results) - updated} из {len(results)}")
+        logger.debug(f"💾 Записано результатов: {updated}")
+        return updated, previous
+
+    def save_download_infos(self, records):
+        """
+        Запись информации о загруженных изображениях одной транзакцией
+
+        Args:
+            records: Список кортежей (product_id, local_path, file_size, img_hash, object_path,
+                (etag, last_modified, content_length))
+
+        Returns:
+            int: Количество обновленных товаров
+        """
+        if not records:
+            return 0
+
+        try:
+            with self.connection.pipeline():
+                with self.connection.transaction():
+                    cursors = []
+                    for product_id, local_path, file_size, img_hash, object_path, validators in records:
+                        if img_hash and object_path:
+                            self.connection.execute(
+                                INSERT_IMAGE_SQL,
+                                (img_hash, object_path, file_size),
+                                prepare=True
+                            )
+                        cursors.append(self.connection.execute(
+                            UPDATE_IMAGE_INFO_SQL,
+                            (local_path, file_size, img_hash, *validators, product_id),
+                            prepare=True
+                        ))
+
+            return sum(max(cursor.rowcount, 0) for cursor in cursors)
+
+        except Exception as e:
+            logger.error(f"❌ Ошибка пакетной записи информации об изображениях: {e}")
+            return 0
+
+    def close(self):
+        """Закрытие соединения"""
+        if self.connection:
+            self.connection.close()
@@ -0,0 +1,239 @@
+# src/product_pipeline.py
+"""
+Конвейерная обработка товаров: загрузка → парсинг → запись в БД.
+
+Стадии работают одновременно и связаны ограниченными очередями
+(backpressure): асинхронные загрузчики (aiohttp) кладут HTML в очередь
+парсинга, парсеры (пул процессов, BeautifulSoup - CPU-bound) кладут
+результаты в очередь записи, единственный писатель сохраняет их пачками.
+Темп запросов к сайту задает бюджет вежливости (delay между запросами),
+а не задержки БД или парсинга.
+"""
+
+import asyncio
+import logging
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import aiohttp
+from bs4 import BeautifulSoup
+
+from src.universal_parser import parse_product_page as universal_parse_product
+from src.rate_limiter import get_rate_limiter, PolitenessLimiter
+
+logger = logging.getLogger(__name__)
+
+def parse_html(html, url):
+    """Парсинг HTML страницы товара (выполняется в процессе-воркере)"""
+    try:
+        soup = BeautifulSoup(html, 'html.parser')
+        return {
+            'success': True,
+            'data': universal_parse_product(soup, url),
+            'error': None,
+            'source': 'pipeline'
+        }
+    except Exception as e:
+        return {'success': False, 'data': None, 'error': str(e), 'source': 'pipeline'}
+
+def _ignore_sigint():
+    """Воркеры пула не должны падать по Ctrl-C - остановкой управляет конвейер"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+class ProductPipeline:
+    """Конвейер fetch → parse → write для ProductProcessor"""
+
+    def __init__(self, processor, fetch_concurrency=4, parse_workers=2,
+                 batch_size=20, flush_interval=2.0, queue_size=50):
+        self.processor = processor
+        self.fetch_concurrency = fetch_concurrency
+        self.parse_workers = parse_workers
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue_size = queue_size
+
+        self.stats = {'success': 0, 'skipped': 0, 'errors': 0}
+        self._stopping = None
+
+    def process_products(self, limit=10, delay=1.0, only_products=True, product_ids=None):
+        """
+        Обработка непропарсенных товаров (или товаров product_ids) конвейером
+
+        Returns:
+            tuple: (success_count, skipped_count, error_count)
+        """
+        products = self.processor.get_unparsed_products(limit, only_products, product_ids)
+
+        if not products:
+            logger.info("ℹ️ Нет товаров для обработки")
+            return 0, 0, 0
+
+        logger.info(
+            f"🏭 Конвейер: {len(products)} записей, загрузчиков {self.fetch_concurrency}, "
+            f"парсеров {self.parse_workers}, пачка {self.batch_size}, задержка {delay}с"
+        )
+
+        start = time.monotonic()
+        asyncio.run(self._run(products, delay))
+        elapsed = time.monotonic() - start
+
+        processed = sum(self.stats.values())
+        logger.info(
+            f"✅ Конвейер завершен за {elapsed:.1f}с ({processed / max(elapsed, 0.001):.2f} записей/с): "
+            f"{self.stats['success']} успешно, {self.stats['skipped']} пропущено, {self.stats['errors']} с ошибками"
+        )
+        return self.stats['success'], self.stats['skipped'], self.stats['errors']
+
+    def _install_signal_handler(self, loop):
+        """Ctrl-C: прекращаем брать новые товары и дожидаемся обработки уже начатых"""
+        def on_interrupt():
+            if not self._stopping.is_set():
+                logger.warning("⏹️  Остановка: дообрабатываем начатые товары...")
+                self._stopping.set()
+
+        try:
+            loop.add_signal_handler(signal.SIGINT, on_interrupt)
+        except (NotImplementedError, RuntimeError):
+            # Windows: обработчик в стиле signal.signal
+            signal.signal(signal.SIGINT, lambda signum, frame: loop.call_soon_threadsafe(on_interrupt))
+
+    async def _run(self, products, delay):
+        loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        self._install_signal_handler(loop)
+
+        fetch_queue = asyncio.Queue(maxsize=self.queue_size)
+        parse_queue = asyncio.Queue(maxsize=self.queue_size)
+        write_queue = asyncio.Queue(maxsize=self.queue_size)
+
+        # Локальная задержка процесса + общий лимит хоста (другие скрипты тоже качают)
+        limiter = PolitenessLimiter(delay)
+        host_limiter = get_rate_limiter()
+        parse_pool = ProcessPoolExecutor(max_workers=self.parse_workers, initializer=_ignore_sigint)
+        # psycopg2-соединение не потокобезопасно - пишем из одного потока
+        write_pool = ThreadPoolExecutor(max_workers=1)
+
+        timeout = aiohttp.ClientTimeout(total=10)
+        connector = aiohttp.TCPConnector(limit=self.fetch_concurrency)
+        headers = dict(self.processor.session.headers)
+
+        try:
+            async with aiohttp.ClientSession(timeout=timeout, connector=connector, headers=headers) as session:
+                fetchers = [
+                    asyncio.create_task(self._fetcher(session, limiter, host_limiter, fetch_queue, parse_queue))
+                    for _ in range(self.fetch_concurrency)
+                ]
+                parsers = [
+                    asyncio.create_task(self._parser(parse_pool, parse_queue, write_queue))
+                    for _ in range(self.parse_workers)
+                ]
+                writer = asyncio.create_task(self._writer(write_pool, write_queue))
+
+                await self._feeder(products, fetch_queue, write_queue)
+
+                # Дренаж: стадии завершаются по очереди, сигнал остановки - None
+                for _ in fetchers:
+                    await fetch_queue.put(None)
+                await asyncio.gather(*fetchers)
+
+                for _ in parsers:
+                    await parse_queue.put(None)
+                await asyncio.gather(*parsers)
+
+                await write_queue.put(None)
+                await writer
+        finally:
+            parse_pool.shutdown()
+            write_pool.shutdown()
+
+    async def _feeder(self, products, fetch_queue, write_queue):
+        """Подача товаров в конвейер (не-товары сразу идут на запись)"""
+        for product in products:
+            if self._stopping.is_set():
+                break
+
+            if product.get('prod_type') == 'product':
+                await fetch_queue.put(product)
+            else:
+                await write_queue.put((product, {'success': False}))
+
+    async def _fetcher(self, session, limiter, host_limiter, fetch_queue, parse_queue):
+        """Загрузка страниц с соблюдением бюджета вежливости"""
+        while True:
+            product = await fetch_queue.get()
+            if product is None:
+                return
+
+            url = product['url']
+            await limiter.acquire()
+            await host_limiter.acquire_async()
+            try:
+                async with session.get(url) as response:
+                    response.raise_for_status()
+                    html = await response.read()
+                await parse_queue.put((product, html, None))
+            except Exception as e:
+                logger.error(f"❌ Ошибка загрузки {url}: {e}")
+                await parse_queue.put((product, None, str(e)))
+
+    async def _parser(self, parse_pool, parse_queue, write_queue):
+        """Парсинг HTML в пуле процессов"""
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await parse_queue.get()
+            if item is None:
+                return
+
+            product, html, error = item
+            if error is not None:
+                result = {'success': False, 'data': None, 'error': error, 'source': 'pipeline'}
+            else:
+                result = await loop.run_in_executor(parse_pool, parse_html, html, product['url'])
+            await write_queue.put((product, result))
+
+    async def _writer(self, write_pool, write_queue):
+        """Пакетная запись результатов: по batch_size штук или раз в flush_interval секунд"""
+        loop = asyncio.get_running_loop()
+        batch = []
+        batch_started = None
+        done = False
+
+        while not done:
+            timeout = self.flush_interval
+            if batch_started is not None:
+                timeout = max(0.0, batch_started + self.flush_interval - time.monotonic())
+
+            try:
+                item = await asyncio.wait_for(write_queue.get(), timeout=timeout)
+                if item is None:
+                    done = True
+                else:
+                    if not batch:
+                        batch_started = time.monotonic()
+                    batch.append(item)
+            except asyncio.TimeoutError:
+                pass
+
+            expired = batch_started is not None and time.monotonic() - batch_started >= self.flush_interval
+            if batch and (done or expired or len(batch) >= self.batch_size):
+                await loop.run_in_executor(write_pool, self._flush, batch)
+                batch = []
+                batch_started = None
+
+    def _flush(self, batch):
+        """Запись пачки в БД и подсчет статистики"""
+        records = [(product['id'], result, product.get('prod_type')) for product, result in batch]
+        written = self.processor.update_products_batch(records)
+
+        if not written:
+            self.stats['errors'] += len(batch)
+            return
+
+        for product, result in batch:
+            if product.get('prod_type') != 'product':
+                self.stats['skipped'] += 1
+            elif result.get('success'):
+                self.stats['success'] += 1
+            else:
+                self.stats['errors'] += 1
@@ -8,18 +8,49 @@ import time
 import re
 import json
 from datetime import datetime
-from src.config import DB_CONFIG, PARSER_CONFIG
+from src.config import DB_CONFIG, PARSER_CONFIG, DB_PIPELINE_CONFIG, XHR_CAPTURE_CONFIG
 from src.selenium_parser import SeleniumParser
 from src.universal_parser import parse_product_page as universal_parse_product
+from src.replica import ReadRouter
+from src import pipeline_db
+from src.rate_limiter import RateLimitedSession
+from src.network_capture import XhrReplayer, CAPTURED_FIELDS
 
 logger = logging.getLogger(__name__)
 
+# Поля, без которых результат requests считается неполным (режим эскалации)
+REQUIRED_FIELDS = ('prod_name', 'prod_price_new', 'prod_article', 'characteristics')
+
+def missing_fields(data):
+    """Обязательные поля, которых нет или которые не прошли проверку"""
+    if not data:
+        return list(REQUIRED_FIELDS)
+    
+    missing = []
+    
+    name = data.get('prod_name')
+    if not name or len(name.strip()) < 3:
+        missing.append('prod_name')
+    
+    price = data.get('prod_price_new')
+    if not isinstance(price, (int, float)) or price <= 0:
+        missing.append('prod_price_new')
+    
+    if not data.get('prod_article'):
+        missing.append('prod_article')
+    
+    if not data.get('characteristics'):
+        missing.append('characteristics')
+    
+    return missing
+
 class ProductProcessor:
     """Обработчик товаров с поддержкой двух режимов: requests и selenium"""
     
-    def __init__(self, use_selenium=False, selenium_headless=True):
+    def __init__(self, use_selenium=False, selenium_headless=True, escalate=False,
+                 browsers=1, recycle_pages=50, max_browser_rss_mb=None, tabs=1):
         self.connection = None
-        self.session = requests.Session()
+        self.session = RateLimitedSession()
         self.session.headers.update({
             'User-Agent': PARSER_CONFIG['user_agent'],
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
@@ -28,14 +59,29 @@ class ProductProcessor:
         self.use_selenium = use_selenium
         self.selenium_headless = selenium_headless
         self.selenium_parser = None
+        self.escalate = escalate
+        self.selenium_unavailable = False
+        # Пул браузеров (browsers > 1): свой SeleniumParser в каждом процессе
+        self.browsers = browsers
+        self.recycle_pages = recycle_pages
+        self.max_browser_rss_mb = max_browser_rss_mb
+        # Вкладок на браузер: страницы одного браузера грузятся параллельно
+        self.tabs = max(1, tabs)
+        self.read_router = None
+        self.pipeline_db = None
+        # Загрузка изображений сразу после записи товара: callable(product) или None
+        self.image_sink = None
+        # Повтор XHR запросов, перехваченных Selenium (до запуска браузера при эскалации)
+        self.xhr_replayer = XhrReplayer(self.session) if XHR_CAPTURE_CONFIG['replay'] else None
         
         # Подключаемся к базе данных
         self.connect_db()
         self.ensure_columns_exist()
         self.classify_urls()
+        self.init_pipeline_db()
         
-        # Инициализируем Selenium если нужен
-        if self.use_selenium:
+        # Инициализируем Selenium если нужен (для пула браузеры запускаются в воркерах)
+        if self.use_selenium and self.browsers <= 1:
             self.init_selenium()
     
     def connect_db(self):
@@ -48,11 +94,27 @@ class ProductProcessor:
                 user=DB_CONFIG['user'],
                 password=DB_CONFIG['password']
             )
+            self.read_router = ReadRouter(self.connection)
             logger.info("✅ Подключение к PostgreSQL успешно")
         except Exception as e:
             logger.error(f"❌ Ошибка подключения к PostgreSQL: {e}")
             raise
     
+    def init_pipeline_db(self):
+        """Подключение слоя psycopg 3 для пакетной записи результатов (если включен)"""
+        if not DB_PIPELINE_CONFIG['enabled']:
+            return
+        
+        if not pipeline_db.is_available():
+            logger.warning("⚠️ DB_PIPELINE=1, но psycopg 3 не установлен - используем psycopg2")
+            return
+        
+        try:
+            self.pipeline_db = pipeline_db.PipelineDatabase()
+        except Exception as e:
+            logger.warning(f"⚠️ Pipeline-слой недоступен, используем psycopg2: {e}")
+            self.pipeline_db = None
+    
     def init_selenium(self):
         """Инициализация Selenium парсера"""
         try:
@@ -65,6 +127,7 @@ class ProductProcessor:
             logger.error(f"❌ Не удалось инициализировать Selenium: {e}")
             logger.warning("⚠️ Будет использоваться режим requests")
             self.use_selenium = False
+            self.selenium_unavailable = True
     
     def ensure_columns_exist(self):
         """Создание недостающих колонок в таблице products"""
@@ -78,7 +141,11 @@ class ProductProcessor:
             ('prod_characteristics', 'JSONB'),  # НОВАЯ КОЛОНКА ДЛЯ ХАРАКТЕРИСТИК
             ('parsed_at', 'TIMESTAMP'),
             ('parse_status', 'VARCHAR(20) DEFAULT \'pending\''),
-            ('parse_error', 'TEXT')
+            ('parse_error', 'TEXT'),
+            ('parse_source', 'VARCHAR(30)'),     # requests_fast / selenium_direct / escalated_selenium ...
+            ('escalation_reason', 'TEXT'),       # почему понадобился браузер (режим эскалации)
+            ('img_local_path', 'TEXT'),          # пишет save_img.py; здесь - для --with-images
+            ('img_evicted_at', 'TIMESTAMP')
         ]
         
         try:
@@ -147,11 +214,19 @@ class ProductProcessor:
             logger.error(f"❌ Ошибка при классификации URL: {e}")
             self.connection.rollback()
     
-    def get_unparsed_products(self, limit=10, only_products=True):
-        """Получение непропарсенных товаров (только с prod_type='product')"""
+    def get_unparsed_products(self, limit=10, only_products=True, product_ids=None):
+        """Получение непропарсенных товаров (только с prod_type='product'), либо товаров по ID"""
         try:
             with self.connection.cursor(cursor_factory=RealDictCursor) as cursor:
-                if only_products:
+                if product_ids:
+                    # Конкретные товары - независимо от статуса
+                    cursor.execute("""
+                    SELECT id, url, article, parse_status, prod_type
+                    FROM products 
+                    WHERE id = ANY(%s)
+                    ORDER BY id;
+                    """, (list(product_ids),))
+                elif only_products:
                     cursor.execute("""
                     SELECT id, url, article, parse_status, prod_type
                     FROM products 
@@ -207,8 +282,12 @@ class ProductProcessor:
         Парсинг страницы товара в двух режимах:
         1. Без Selenium (быстрый) - для простых страниц
         2. С Selenium (полный) - для динамических страниц
+        3. Эскалация - сначала requests, Selenium только для неполных результатов
         """
-        if self.use_selenium and self.selenium_parser:
+        if self.escalate:
+            logger.debug(f"🪜 Режим эскалации: {url}")
+            return self._parse_with_escalation(url)
+        elif self.use_selenium and self.selenium_parser:
             logger.debug(f"🔄 Использую Selenium для парсинга: {url}")
             return self._parse_with_selenium(url)
         else:
@@ -299,6 +378,84 @@ class ProductProcessor:
         
         return result
     
+    def _fill_from_xhr(self, url, result, missing):
+        """
+        Дополнение результата requests полями из повторенных XHR запросов.
+        
+        Returns:
+            dict: Результат, если недостающих полей не осталось, иначе None
+        """
+        if not self.xhr_replayer or not self.xhr_replayer.has_templates():
+            return None
+        
+        # Характеристики из XHR не достаются - браузер все равно понадобится
+        if any(field not in CAPTURED_FIELDS for field in missing):
+            return None
+        
+        data = result['data']
+        fields = self.xhr_replayer.fetch_fields(url, article=data.get('prod_article'), wanted=missing)
+        if not fields:
+            return None
+        
+        for key, value in fields.items():
+            if not data.get(key):
+                data[key] = value
+        
+        still_missing = missing_fields(data)
+        if still_missing:
+            logger.debug(f"ℹ️ XHR дополнил {list(fields)}, но не хватает: {still_missing}")
+            return None
+        
+        result['source'] = 'xhr_replay'
+        result['escalation_reason'] = 'нет полей: ' + ', '.join(missing)
+        logger.info(f"📡 Поля {', '.join(fields)} получены повтором XHR без браузера: {url}")
+        return result
+    
+    def _parse_with_escalation(self, url):
+        """
+        Сначала дешевый requests, Selenium - только если обязательные поля
+        не найдены или не прошли проверку. Причина эскалации пишется в результат.
+        """
+        result = self._parse_with_requests(url)
+        
+        if not result['success']:
+            reason = f"requests: {result['error']}"
+        else:
+            missing = missing_fields(result['data'])
+            if not missing:
+                result['escalation_reason'] = None
+                return result
+            reason = 'нет полей: ' + ', '.join(missing)
+            
+            xhr_result = self._fill_from_xhr(url, result, missing)
+            if xhr_result:
+                return xhr_result
+        
+        if not self.selenium_parser and not self.selenium_unavailable:
+            self.init_selenium()
+        
+        if not self.selenium_parser:
+            result['escalation_reason'] = f"{reason} (Selenium недоступен)"
+            return result
+        
+        logger.info(f"🪜 Эскалация в Selenium ({reason}): {url}")
+        selenium_result = self.selenium_parser.extract_data_directly(url)
+        
+        if not selenium_result['success'] or not selenium_result['data'] or not selenium_result['data'].get('prod_name'):
+            result['escalation_reason'] = f"{reason}; Selenium не помог"
+            return result
+        
+        # Дополняем результат браузера тем, что уже нашел requests
+        data = selenium_result['data']
+        if result['success'] and result['data']:
+            for key, value in result['data'].items():
+                if not data.get(key) and value:
+                    data[key] = value
+        
+        selenium_result['source'] = 'escalated_selenium'
+        selenium_result['escalation_reason'] = reason
+        return selenium_result
+    
     def _clean_price(self, price_text):
         """Очистка текста цены"""
         if not price_text:
@@ -314,6 +471,12 @@ class ProductProcessor:
     
     def update_product_data(self, product_id, parse_result, prod_type='product'):
         """Обновление данных товара в БД, включая характеристики"""
+        if self.pipeline_db:
+            # psycopg 3: BEGIN, prepared UPDATE ... RETURNING (прежний URL картинки) и COMMIT за один round-trip
+            if prod_type == 'product' and not parse_result['success']:
+                logger.warning(f"⚠️ Ошибка парсинга товара {product_id}: {parse_result.get('error')}")
+            return self.update_products_batch([(product_id, parse_result, prod_type)]) == 1
+        
         try:
             with self.connection.cursor() as cursor:
                 if parse_result['success'] and prod_type == 'product':
@@ -329,6 +492,7 @@ class ProductProcessor:
                             characteristics_json = None
                     
                     # Обновляем запись, включая характеристики
+                    # (old - строка до обновления: по ней видно, сменился ли URL картинки)
                     cursor.execute("""
                     UPDATE products 
                     SET prod_name = %s,
@@ -337,12 +501,17 @@ class ProductProcessor:
                         prod_article = %s,
                         prod_img_url = %s,
                         prod_characteristics = %s,  -- НОВОЕ ПОЛЕ
-                        parsed_at = NOW(),
+                        parse_source = %s,
+                        escalation_reason = %s,
+                        parsed_at = COALESCE(%s::timestamp, NOW()),
                         parse_status = 'success',
                         parse_error = NULL,
                         parse_attempts = COALESCE(parse_attempts, 0) + 1,
                         updated_at = NOW()  
-                    WHERE id = %s;
+                    FROM (SELECT prod_img_url AS old_img_url FROM products WHERE id = %s) AS old
+                    WHERE products.id = %s
+                    RETURNING old.old_img_url,
+                              products.img_local_path IS NOT NULL OR products.img_evicted_at IS NOT NULL;
                     """, (
                         data['prod_name'],
                         data['prod_price_new'],
@@ -350,11 +519,16 @@ class ProductProcessor:
                         data['prod_article'],
                         data['prod_img_url'],
                         characteristics_json,  # ДОБАВЛЕНО
+                        parse_result.get('source'),
+                        parse_result.get('escalation_reason'),
+                        parse_result.get('rendered_at'),
+                        product_id,
                         product_id
                     ))
                     
                     # Проверяем, сколько строк обновилось
                     rows_updated = cursor.rowcount
+                    previous = cursor.fetchone() if rows_updated == 1 else None
                     if rows_updated == 0:
                         logger.warning(f"⚠️ Запись с ID {product_id} не найдена для обновления")
                         return False
@@ -366,6 +540,7 @@ class ProductProcessor:
                         else:
                             logger.debug(f"✅ Товар {product_id} успешно обновлен (без характеристик)")
                         self.connection.commit()
+                        self._queue_image(product_id, data, *previous)
                         return True
                     else:
                         logger.error(f"❌ Обновлено {rows_updated} записей вместо 1 для ID {product_id}")
@@ -422,6 +597,78 @@ class ProductProcessor:
                 self.connection.rollback()
             return False
     
+    def update_products_batch(self, results):
+        """
+        Запись пачки результатов парсинга одной транзакцией
+        
+        Args:
+            results: Список кортежей (product_id, parse_result, prod_type)
+            
+        Returns:
+            int: Количество обновленных записей
+        """
+        if not results:
+            return 0
+        
+        if self.pipeline_db:
+            written, previous = self.pipeline_db.update_product_results(results)
+            self._queue_images(results, previous)
+            return written
+        
+        written = 0
+        previous = {}
+        try:
+            with self.connection.cursor() as cursor:
+                for product_id, parse_result, prod_type in results:
+                    sql, params = pipeline_db.build_result_update(product_id, parse_result, prod_type)
+                    cursor.execute(sql, params)
+                    written += max(cursor.rowcount, 0)
+                    if cursor.description and cursor.rowcount == 1:
+                        previous[product_id] = cursor.fetchone()
+            
+            self.connection.commit()
+        except Exception as e:
+            logger.error(f"❌ Ошибка пакетной записи результатов: {e}")
+            self.connection.rollback()
+            return 0
+        
+        if written < len(results):
+            logger.warning(f"⚠️ Не найдено записей для обновления: {len(results) - written} из {len(results)}")
+        logger.debug(f"💾 Записано результатов: {written}")
+        self._queue_images(results, previous)
+        return written
+    
+    def _queue_image(self, product_id, data, old_img_url, has_image):
+        """
+        Передача товара загрузчику изображений, если URL картинки новый или файла еще нет
+        
+        has_image: файл загружен или вытеснен по бюджету диска (тогда - только по запросу)
+        """
+        img_url = data.get('prod_img_url')
+        if not self.image_sink or not img_url:
+            return
+        if img_url == old_img_url and has_image:
+            return
+        
+        try:
+            self.image_sink({
+                'id': product_id,
+                'prod_img_url': img_url,
+                'prod_article': data.get('prod_article'),
+                'prod_name': data.get('prod_name'),
+            })
+        except Exception as e:
+            # Загрузка догонит товар при следующем запуске save_img.py
+            logger.warning(f"⚠️ Изображение товара {product_id} не поставлено в очередь: {e}")
+    
+    def _queue_images(self, results, previous):
+        """previous: {product_id: (прежний URL, есть ли файл)} из RETURNING записи; нет ключа - товар не обновлен"""
+        if not self.image_sink:
+            return
+        for product_id, parse_result, prod_type in results:
+            if product_id in previous:
+                self._queue_image(product_id, parse_result['data'], *previous[product_id])
+    
     def get_product_characteristics(self, product_id):
         """Получить характеристики конкретного товара"""
         try:
@@ -448,9 +695,93 @@ class ProductProcessor:
             logger.error(f"Ошибка получения характеристик: {e}")
             return {'success': False, 'error': str(e)}
             
-    def process_products(self, limit=10, delay=1.0, only_products=True):
-        """Обработка непропарсенных товаров"""
-        products = self.get_unparsed_products(limit, only_products)
+    def _split_products(self, products):
+        """
+        Товары - в задачи для браузера, не-товары помечаются сразу
+        
+        Returns:
+            tuple: (by_id, tasks, skipped_count, error_count)
+        """
+        skipped_count = 0
+        error_count = 0
+        by_id = {}
+        tasks = []
+        for product in products:
+            if product.get('prod_type') == 'product':
+                by_id[product['id']] = product
+                tasks.append((product['id'], product['url']))
+            elif self.update_product_data(product['id'], {'success': False}, product.get('prod_type')):
+                skipped_count += 1
+            else:
+                error_count += 1
+        return by_id, tasks, skipped_count, error_count
+    
+    def _save_browser_results(self, results, by_id, total, label):
+        """
+        Запись результатов браузера в порядке готовности
+        
+        Returns:
+            tuple: (success_count, error_count)
+        """
+        success_count = 0
+        error_count = 0
+        
+        for i, (product_id, result) in enumerate(results, 1):
+            url = by_id[product_id]['url']
+            logger.info(f"[{i}/{total}] Товар {product_id} обработан {label}: {url[:60]}...")
+            
+            # Как и в одиночном режиме: если браузер не нашел данные - пробуем requests
+            if not result['success'] or not result['data'] or not result['data'].get('prod_name'):
+                logger.warning(f"⚠️ Selenium не нашел данные, пробую requests: {url}")
+                result = self._parse_with_requests(url)
+                result['source'] = 'selenium_fallback'
+            
+            if self.update_product_data(product_id, result, 'product'):
+                success_count += 1
+            else:
+                error_count += 1
+        
+        return success_count, error_count
+    
+    def _process_with_pool(self, products):
+        """Обработка товаров пулом браузеров; не-товары помечаются сразу"""
+        from src.selenium_pool import SeleniumPool
+        
+        by_id, tasks, skipped_count, error_count = self._split_products(products)
+        
+        pool = SeleniumPool(
+            size=self.browsers,
+            headless=self.selenium_headless,
+            max_pages=self.recycle_pages,
+            max_rss_mb=self.max_browser_rss_mb,
+            tabs=self.tabs
+        )
+        pool.start()
+        
+        try:
+            success_count, failed = self._save_browser_results(pool.process(tasks), by_id, len(tasks), 'пулом')
+            error_count += failed
+        finally:
+            pool.log_health()
+            pool.close()
+        
+        logger.info(f"✅ Обработка пулом завершена: {success_count} успешно, {skipped_count} пропущено, {error_count} с ошибками")
+        return success_count, skipped_count, error_count
+    
+    def _process_with_tabs(self, products):
+        """Обработка товаров во вкладках одного браузера"""
+        by_id, tasks, skipped_count, error_count = self._split_products(products)
+        
+        results = self.selenium_parser.extract_many(tasks, tabs=self.tabs)
+        success_count, failed = self._save_browser_results(results, by_id, len(tasks), f"во вкладках ({self.tabs})")
+        error_count += failed
+        
+        logger.info(f"✅ Обработка во вкладках завершена: {success_count} успешно, {skipped_count} пропущено, {error_count} с ошибками")
+        return success_count, skipped_count, error_count
+    
+    def process_products(self, limit=10, delay=1.0, only_products=True, product_ids=None):
+        """Обработка непропарсенных товаров (или товаров product_ids)"""
+        products = self.get_unparsed_products(limit, only_products, product_ids)
         
         if not products:
             logger.info("ℹ️ Нет товаров для обработки")
@@ -458,6 +789,12 @@ class ProductProcessor:
         
         logger.info(f"🔍 Найдено {len(products)} записей для обработки")
         
+        if self.use_selenium and self.browsers > 1:
+            return self._process_with_pool(products)
+        
+        if self.use_selenium and self.selenium_parser and self.tabs > 1:
+            return self._process_with_tabs(products)
+        
         success_count = 0
         skipped_count = 0
         error_count = 0
@@ -489,10 +826,11 @@ class ProductProcessor:
         logger.info(f"✅ Обработка завершена: {success_count} успешно, {skipped_count} пропущено, {error_count} с ошибками")
         return success_count, skipped_count, error_count
     
-    def show_statistics(self):
-        """Показать статистику обработки"""
+    def show_statistics(self, prefer_primary=False):
+        """Показать статистику обработки (с реплики, если она настроена)"""
         try:
-            with self.connection.cursor(cursor_factory=RealDictCursor) as cursor:
+            conn = self.read_router.connection(prefer_primary)
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
                 cursor.execute("""
                 SELECT 
                     prod_type,
@@ -535,10 +873,24 @@ class ProductProcessor:
                 
                 categories = cursor.fetchall()
                 
+                # Каким способом получены данные: доля браузера в режиме эскалации
+                cursor.execute("""
+                SELECT 
+                    COALESCE(parse_source, 'unknown') as parse_source,
+                    COUNT(*) as count
+                FROM products
+                WHERE parse_status = 'success' AND prod_type = 'product'
+                GROUP BY parse_source
+                ORDER BY count DESC;
+                """)
+                
+                sources = cursor.fetchall()
+                
                 return {
                     'type_stats': type_stats,
                     'summary': summary,
-                    'categories': categories
+                    'categories': categories,
+                    'sources': sources
                 }
                 
         except Exception as e:
@@ -550,6 +902,12 @@ class ProductProcessor:
         if self.selenium_parser:
             self.selenium_parser.close()
         
+        if self.read_router:
+            self.read_router.close()
+        
+        if self.pipeline_db:
+            self.pipeline_db.close()
+        
         if self.connection:
             self.connection.close()
             logger.info("🔌 Соединение с PostgreSQL закрыто")
\ No newline at end of file
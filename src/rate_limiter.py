@@ -0,0 +1,155 @@
+# src/rate_limiter.py
+"""
+Общий для всех процессов ограничитель запросов к hello54.ru.
+
+main.py, process_products.py, save_img.py и процессы, запущенные из CRM,
+берут токены из одного token bucket. Его состояние (токены и время
+последнего пополнения) хранится в файле и меняется под файловой
+блокировкой, поэтому суммарный темп запросов с хоста ограничен
+RATE_LIMIT_CONFIG['requests_per_second'], а бюджет используется полностью.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+from src.config import RATE_LIMIT_CONFIG
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+class HostRateLimiter:
+    """Token bucket в файле под межпроцессной блокировкой"""
+
+    def __init__(self, rate=None, burst=None, state_file=None):
+        self.rate = rate or RATE_LIMIT_CONFIG['requests_per_second']
+        self.burst = burst or RATE_LIMIT_CONFIG['burst']
+        self.state_file = Path(state_file or RATE_LIMIT_CONFIG['state_file'])
+        self.state_file.parent.mkdir(exist_ok=True, parents=True)
+        self._executor = None  # поток для файловой блокировки в acquire_async
+
+    def _lock(self, f):
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+
+    def _unlock(self, f):
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _try_acquire(self):
+        """
+        Попытка взять токен
+
+        Returns:
+            float: 0 если токен получен, иначе сколько секунд подождать
+        """
+        fd = os.open(self.state_file, os.O_RDWR | os.O_CREAT, 0o644)
+        with os.fdopen(fd, 'r+') as f:
+            self._lock(f)
+            try:
+                now = time.time()
+                try:
+                    f.seek(0)
+                    state = json.loads(f.read() or '{}')
+                    tokens = float(state['tokens'])
+                    updated = float(state['updated'])
+                except (ValueError, KeyError):
+                    tokens, updated = float(self.burst), now
+
+                tokens = min(float(self.burst), tokens + max(0.0, now - updated) * self.rate)
+
+                wait = 0.0
+                if tokens >= 1.0:
+                    tokens -= 1.0
+                else:
+                    wait = (1.0 - tokens) / self.rate
+
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps({'tokens': tokens, 'updated': now}))
+                f.flush()
+                return wait
+            finally:
+                self._unlock(f)
+
+    def acquire(self):
+        """Блокирующее ожидание токена"""
+        while True:
+            wait = self._try_acquire()
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """
+        Ожидание токена без блокировки event loop
+
+        Блокировку файла может держать другой процесс, поэтому чтение и запись
+        состояния идут в отдельном потоке (не в общем executor: его занимает
+        и резолвинг DNS aiohttp); в цикле событий - только asyncio.sleep.
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='rate-limiter')
+        loop = asyncio.get_running_loop()
+        while True:
+            wait = await loop.run_in_executor(self._executor, self._try_acquire)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+class PolitenessLimiter:
+    """Глобальный интервал между началами запросов к сайту"""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self._lock = asyncio.Lock()
+        self._next_slot = 0.0
+
+    async def acquire(self):
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._next_slot = max(now, self._next_slot) + self.delay
+
+_rate_limiter = None
+
+def get_rate_limiter():
+    """Ограничитель по умолчанию для текущего процесса"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = HostRateLimiter()
+        logger.debug(
+            f"🚦 Общий лимит запросов: {_rate_limiter.rate}/с (burst {_rate_limiter.burst}), "
+            f"состояние: {_rate_limiter.state_file}"
+        )
+    return _rate_limiter
+
+class RateLimitedSession(requests.Session):
+    """requests.Session, каждый запрос которой берет токен из общего лимита"""
+
+    def __init__(self, rate_limiter=None):
+        super().__init__()
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+
+    def request(self, method, url, *args, **kwargs):
+        self.rate_limiter.acquire()
+        return super().request(method, url, *args, **kwargs)
@@ -0,0 +1,86 @@
+# src/render_client.py
+"""
+Клиент сервиса парсинга (render_service.py).
+
+Только стандартная библиотека: клиентом могут быть скрипты проекта и CRM.
+Если сервис не запущен, вызовы бросают RenderServiceUnavailable - вызывающий
+код переходит на старый путь (запуск process_products.py). Если сервис принял
+запрос, но не ответил за timeout, возвращается ошибка с 'timeout': True -
+парсинг еще идет в сервисе, и повторный запуск того же товара не нужен.
+"""
+
+import json
+import logging
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_URL = 'http://127.0.0.1:8765'
+
+class RenderServiceUnavailable(Exception):
+    """Сервис парсинга не отвечает"""
+
+class RenderClient:
+    """HTTP-клиент сервиса парсинга"""
+
+    def __init__(self, base_url=None, timeout=None):
+        if base_url is None or timeout is None:
+            try:
+                from src.config import RENDER_SERVICE_CONFIG
+                base_url = base_url or f"http://{RENDER_SERVICE_CONFIG['host']}:{RENDER_SERVICE_CONFIG['port']}"
+                timeout = timeout or RENDER_SERVICE_CONFIG['request_timeout'] + 5
+            except ImportError:  # вне проекта парсера (например, из CRM)
+                base_url = base_url or DEFAULT_URL
+                timeout = timeout or 125
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def _request(self, method, path, params=None, timeout=None):
+        url = f"{self.base_url}{path}"
+        if params:
+            url += '?' + urlencode(params)
+
+        try:
+            with urlopen(Request(url, method=method), timeout=timeout or self.timeout) as response:
+                return json.loads(response.read().decode('utf-8'))
+        except HTTPError as e:
+            # 404/503/504 - ответ сервиса с описанием ошибки
+            try:
+                return json.loads(e.read().decode('utf-8'))
+            except ValueError:
+                return {'success': False, 'error': f"HTTP {e.code}"}
+        except TimeoutError:
+            # Соединение и запрос прошли (их ошибки - URLError), сервис занят парсингом
+            return {
+                'success': False, 'timeout': True,
+                'error': f"Сервис парсинга не ответил за {timeout or self.timeout} с, задание продолжает выполняться"
+            }
+        except (URLError, ConnectionError) as e:
+            raise RenderServiceUnavailable(f"Сервис парсинга недоступен ({self.base_url}): {e}")
+
+    def health(self):
+        return self._request('GET', '/health', timeout=2)
+
+    def is_available(self):
+        try:
+            return not self.health().get('timeout')
+        except RenderServiceUnavailable:
+            return False
+
+    def parse_product(self, product_id, use_selenium=True):
+        """
+        Парсинг одного товара с записью в БД
+
+        Returns:
+            dict: success, product_id, source, prod_name, error, seconds...
+        """
+        return self._request('POST', f"/parse/{product_id}", {'selenium': int(use_selenium)})
+
+    def parse_batch(self, count, use_selenium=True):
+        """Парсинг N непропарсенных товаров"""
+        return self._request(
+            'POST', '/parse-batch', {'count': count, 'selenium': int(use_selenium)},
+            timeout=self.timeout * max(1, count)
+        )
@@ -0,0 +1,111 @@
+# src/replica.py
+"""
+Маршрутизация read-only запросов на реплику PostgreSQL.
+
+Тяжелые запросы статистики и отчетов уходят на реплику, чтобы не
+конкурировать с записью парсера на primary. Если реплика недоступна
+или отстает больше REPLICA_CONFIG['max_lag_seconds'] - читаем с primary.
+После отказа реплики повторное подключение - не раньше чем через
+REPLICA_CONFIG['retry_seconds']: иначе каждое чтение ждало бы connect_timeout.
+"""
+
+import logging
+import time
+import psycopg2
+from src.config import DB_REPLICA_CONFIG, REPLICA_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Отставание в секундах; 0 если вся полученная WAL уже применена
+# (иначе при отсутствии записей на primary отставание "растет" само)
+REPLICA_LAG_SQL = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM NOW() - pg_last_xact_replay_timestamp()), 0)
+END;
+"""
+
+def connect_replica(replica_config=None):
+    """Подключение к реплике в режиме read-only/autocommit, None при ошибке"""
+    replica_config = replica_config or DB_REPLICA_CONFIG
+    if not replica_config:
+        return None
+
+    try:
+        conn = psycopg2.connect(
+            host=replica_config['host'],
+            port=replica_config['port'],
+            database=replica_config['database'],
+            user=replica_config['user'],
+            password=replica_config['password'],
+            connect_timeout=REPLICA_CONFIG['connect_timeout']
+        )
+        conn.set_session(readonly=True, autocommit=True)
+        logger.info("✅ Подключение к реплике PostgreSQL успешно")
+        return conn
+    except Exception as e:
+        logger.warning(f"⚠️ Реплика недоступна, читаем с primary: {e}")
+        return None
+
+def replica_lag(conn):
+    """Отставание реплики в секундах, None если проверить не удалось"""
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(REPLICA_LAG_SQL)
+            return float(cursor.fetchone()[0])
+    except Exception as e:
+        logger.warning(f"⚠️ Не удалось проверить отставание реплики: {e}")
+        return None
+
+class ReadRouter:
+    """Выбор соединения для чтения: реплика или primary"""
+
+    def __init__(self, primary_connection, replica_config=None, max_lag_seconds=None):
+        self.primary = primary_connection
+        self.replica_config = replica_config or DB_REPLICA_CONFIG
+        self.max_lag_seconds = (
+            max_lag_seconds if max_lag_seconds is not None else REPLICA_CONFIG['max_lag_seconds']
+        )
+        self.replica = None
+        self.retry_at = 0.0  # time.monotonic(), до которого реплика считается недоступной
+
+    def _mark_down(self):
+        self.close()
+        self.retry_at = time.monotonic() + REPLICA_CONFIG['retry_seconds']
+
+    def connection(self, prefer_primary=False):
+        """
+        Соединение для read-only запроса
+
+        Args:
+            prefer_primary: Читать с primary (read-your-writes сразу после записи)
+        """
+        if prefer_primary or not self.replica_config or time.monotonic() < self.retry_at:
+            return self.primary
+
+        if self.replica is None or self.replica.closed:
+            self.replica = connect_replica(self.replica_config)
+            if self.replica is None:
+                self._mark_down()
+                return self.primary
+
+        lag = replica_lag(self.replica)
+        if lag is None:
+            self._mark_down()
+            return self.primary
+
+        if lag > self.max_lag_seconds:
+            logger.info(f"⏳ Реплика отстает на {lag:.1f}с (> {self.max_lag_seconds}с), читаем с primary")
+            return self.primary
+
+        return self.replica
+
+    def close(self):
+        """Закрытие соединения с репликой (primary закрывает владелец)"""
+        if self.replica is not None:
+            try:
+                self.replica.close()
+            except Exception:
+                pass
+            self.replica = None
@@ -5,47 +5,85 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from src.config import SELENIUM_CONFIG
 
 logger = logging.getLogger(__name__)
 
-def extract_characteristics_hello54(driver, timeout=15):
+# Где может находиться блок характеристик (проверяются все сразу, побеждает первый)
+PROPERTIES_CSS = [
+    ".b-properties",
+    ".b-card-detail__properties",
+    "div[class*='properties']",
+]
+PROPERTIES_XPATH = [
+    "//div[text()='Основные характеристики']/parent::div",
+    "//div[contains(text(), 'характеристик')]/parent::div",
+]
+
+# Тело JS-функции: пары [название, значение] из блока характеристик за один вызов.
+# Повторяет селекторы extract_characteristics_hello54 без scrollIntoView и find_element на строку.
+COLLECT_CHARACTERISTICS_JS = """
+    var byXPath = function(xpath) {
+        return document.evaluate(xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    };
+    var block = document.querySelector('.b-properties')
+        || document.querySelector('.b-card-detail__properties')
+        || document.querySelector("div[class*='properties']")
+        || byXPath("//div[text()='Основные характеристики']/parent::div")
+        || byXPath("//div[contains(text(), 'характеристик')]/parent::div");
+    if (!block) { return []; }
+
+    var clean = function(el) { return el ? (el.innerText || el.textContent || '').trim() : ''; };
+    var pairs = [];
+    var items = block.querySelectorAll('.b-properties__item');
+    if (items.length) {
+        items.forEach(function(item) {
+            var name = item.querySelector('.b-properties__name') || item.querySelector("div[class*='name']");
+            var value = item.querySelector('.b-properties__value') || item.querySelector("div[class*='value']");
+            if (name && value) { pairs.push([clean(name), clean(value)]); }
+        });
+        return pairs;
+    }
+
+    var names = block.querySelectorAll('.b-properties__name');
+    var values = block.querySelectorAll('.b-properties__value');
+    if (names.length === values.length) {
+        for (var i = 0; i < names.length; i++) { pairs.push([clean(names[i]), clean(values[i])]); }
+    }
+    return pairs;
+"""
+
+def _find_properties_block(driver):
+    """Первый найденный блок характеристик по любому из селекторов (без ожидания)"""
+    selectors = [(By.CSS_SELECTOR, css) for css in PROPERTIES_CSS] + [(By.XPATH, xp) for xp in PROPERTIES_XPATH]
+    for by, selector in selectors:
+        elements = driver.find_elements(by, selector)
+        if elements:
+            logger.info(f"✅ Найден блок характеристик: {selector}")
+            return elements[0]
+    return False
+
+def extract_characteristics_hello54(driver, timeout=None):
     """
     Извлечение характеристик товара для hello54.ru
-    ИСПРАВЛЕННАЯ версия
+    
+    Args:
+        driver: WebDriver с загруженной страницей
+        timeout: Общий бюджет ожидания блока (None - SELENIUM_CONFIG['characteristics_budget'])
     """
     characteristics = {}
+    if timeout is None:
+        timeout = SELENIUM_CONFIG['characteristics_budget']
     
     try:
         logger.info("🔍 Начинаю поиск характеристик...")
         
-        # 1. Ждем загрузки ВСЕЙ страницы
-        WebDriverWait(driver, timeout).until(
-            lambda d: d.execute_script("return document.readyState") == "complete"
-        )
-        
-        # 2. Ищем блок характеристик РАЗНЫМИ способами
+        # Одно общее условие: любой из селекторов, с общим бюджетом ожидания
         properties_div = None
-        
-        # Попробуем несколько селекторов
-        selectors_to_try = [
-            (By.CLASS_NAME, "b-properties"),
-            (By.CLASS_NAME, "b-card-detail__properties"),
-            (By.CSS_SELECTOR, "div[class*='properties']"),
-            (By.XPATH, "//div[contains(@class, 'properties')]"),
-            (By.XPATH, "//div[text()='Основные характеристики']/parent::div"),
-            (By.XPATH, "//div[contains(text(), 'характеристик')]/parent::div")
-        ]
-        
-        for by, selector in selectors_to_try:
-            try:
-                logger.debug(f"Пробую селектор: {selector}")
-                properties_div = WebDriverWait(driver, 3).until(
-                    EC.presence_of_element_located((by, selector))
-                )
-                logger.info(f"✅ Найден блок характеристик: {selector}")
-                break
-            except (TimeoutException, NoSuchElementException):
-                continue
+        try:
+            properties_div = WebDriverWait(driver, timeout, poll_frequency=0.1).until(_find_properties_block)
+        except TimeoutException:
+            pass
         
         if not properties_div:
             logger.warning("❌ Блок характеристик не найден ни одним селектором")
@@ -55,11 +93,9 @@ def extract_characteristics_hello54(driver, timeout=15):
             logger.debug(f"Page source length: {len(driver.page_source)}")
             return characteristics
         
-        # 3. Прокручиваем к блоку характеристик (если нужно)
+        # Прокручиваем к блоку характеристик (ленивый рендер), без паузы
         try:
             driver.execute_script("arguments[0].scrollIntoView(true);", properties_div)
-            import time
-            time.sleep(0.5)  # Даем время на прокрутку
         except:
             pass
         
@@ -91,9 +127,6 @@ def extract_characteristics_hello54(driver, timeout=15):
             # 5. Обрабатываем каждый элемент
             for i, item in enumerate(property_items):
                 try:
-                    # Прокручиваем к элементу
-                    driver.execute_script("arguments[0].scrollIntoView(true);", item)
-                    
                     # Ищем название и значение
                     name_elem = item.find_element(By.CLASS_NAME, "b-properties__name")
                     value_elem = item.find_element(By.CLASS_NAME, "b-properties__value")
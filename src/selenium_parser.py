@@ -7,22 +7,154 @@ from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 import time
 import logging
-from src.selenium_characteristics import extract_characteristics_hello54
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from src.selenium_characteristics import (
+    extract_characteristics_hello54, COLLECT_CHARACTERISTICS_JS, PROPERTIES_CSS, PROPERTIES_XPATH
+)
+from src.rate_limiter import get_rate_limiter
+from src.config import SELENIUM_CONFIG, SNAPSHOT_CONFIG, XHR_CAPTURE_CONFIG
+from src.snapshot_store import SnapshotStore
+from src.network_capture import NetworkCapture, TemplateStore, enable_performance_log, make_template
 
 logger = logging.getLogger(__name__)
 
+# Все поля товара и пары характеристик за один execute_script.
+# Селекторы те же, что и в поэлементном пути (_extract_with_elements).
+EXTRACT_PRODUCT_JS = """
+var text = function(el) { return el ? (el.innerText || el.textContent || '').trim() : null; };
+var q = function(sel) { return document.querySelector(sel); };
+
+var title = q('div.b-title h1') || q('h1');
+var code = q('div.b-card-detail__code span');
+var article = text(code);
+if (!article) {
+    var m = document.documentElement.outerHTML.match(/Артикул[:\\s]*(\\d+)/);
+    article = m ? m[1] : null;
+}
+var img = q('img.sp-image');
+
+var collectCharacteristics = function() {
+""" + COLLECT_CHARACTERISTICS_JS + """
+};
+
+return {
+    name: text(title),
+    price_new: text(q('div.b-price__value')),
+    price_old: text(q('div.b-price__sale')),
+    article: article,
+    img: img ? (img.src || img.getAttribute('src')) : null,
+    characteristics: collectCharacteristics()
+};
+"""
+
+# Признаки того, что карточка товара отрисована
+PRODUCT_READY_CSS = ['div.b-price__value', 'div.b-card-detail__code', 'div.b-title h1']
+
+# Ожидание ЛЮБОГО из селекторов: сразу, затем по сигналу MutationObserver, не дольше бюджета.
+# arguments: [css], [xpath], бюджет в мс, callback
+WAIT_FOR_ANY_JS = """
+var css = arguments[0], xpaths = arguments[1], budget = arguments[2];
+var done = arguments[arguments.length - 1];
+var started = performance.now();
+var finished = false, observer = null, timer = null;
+
+var match = function() {
+    for (var i = 0; i < css.length; i++) {
+        if (document.querySelector(css[i])) { return css[i]; }
+    }
+    for (var j = 0; j < xpaths.length; j++) {
+        var node = document.evaluate(xpaths[j], document, null,
+            XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+        if (node) { return xpaths[j]; }
+    }
+    return null;
+};
+var finish = function(selector) {
+    if (finished) { return; }
+    finished = true;
+    if (observer) { observer.disconnect(); }
+    if (timer) { clearTimeout(timer); }
+    done({selector: selector, waited_ms: performance.now() - started});
+};
+
+var found = match();
+if (found) { finish(found); return; }
+observer = new MutationObserver(function() { var f = match(); if (f) { finish(f); } });
+observer.observe(document.documentElement, {childList: true, subtree: true});
+timer = setTimeout(function() { finish(null); }, budget);
+"""
+
+# Состояние вкладки при параллельной загрузке (extract_many)
+TAB_STATE_JS = """
+var css = arguments[0];
+var found = css.some(function(sel) { return document.querySelector(sel) !== null; });
+return {found: found, state: document.readyState, url: location.href};
+"""
+
 class SeleniumParser:
     """
     Парсер на Selenium для загрузки динамических страниц.
     Используется только для сложных страниц, где нужен JavaScript.
     """
     
-    def __init__(self, headless=True, driver_path=None):
+    def __init__(self, headless=True, driver_path=None, lean=None, page_load_strategy=None, cache_slot=0,
+                 snapshot_store=None, capture_xhr=None):
+        """
+        Args:
+            headless: Без GUI
+            driver_path: Путь к chromedriver (None - из PATH)
+            lean: Облегченный профиль (None - из SELENIUM_CONFIG)
+            page_load_strategy: normal / eager / none (None - из SELENIUM_CONFIG)
+            cache_slot: Номер подкаталога дискового кэша (у каждого браузера пула свой)
+            snapshot_store: Куда сохранять отрисованный HTML (None - по SNAPSHOT_CONFIG)
+            capture_xhr: Перехватывать JSON ответы и сохранять шаблоны запросов (None - из XHR_CAPTURE_CONFIG)
+        """
         self.driver_path = driver_path
         self.headless = headless
+        self.lean = SELENIUM_CONFIG['lean_profile'] if lean is None else lean
+        self.page_load_strategy = page_load_strategy or SELENIUM_CONFIG['page_load_strategy']
+        self.cache_slot = cache_slot
+        if snapshot_store is None and SNAPSHOT_CONFIG['enabled']:
+            snapshot_store = SnapshotStore()
+        self.snapshot_store = snapshot_store
+        self.capture_xhr = XHR_CAPTURE_CONFIG['enabled'] if capture_xhr is None else capture_xhr
+        self.network_capture = NetworkCapture() if self.capture_xhr else None
+        self.xhr_templates = TemplateStore() if self.capture_xhr else None
+        # JSON ответы, перехваченные на последней странице
+        self.last_xhr = []
         self.driver = None
+        # Куда ушло время на последней странице: load / ready_wait / extract / characteristics_wait
+        self.last_timings = {}
         self.setup_driver()
     
+    def _apply_lean_profile(self, chrome_options):
+        """Без картинок и уведомлений, с дисковым кэшем, переживающим перезапуски"""
+        chrome_options.add_experimental_option('prefs', {
+            'profile.managed_default_content_settings.images': 2,
+            'profile.default_content_setting_values.notifications': 2,
+            'profile.default_content_setting_values.geolocation': 2,
+        })
+        chrome_options.add_argument('--blink-settings=imagesEnabled=false')
+        chrome_options.add_argument('--autoplay-policy=user-gesture-required')
+        chrome_options.add_argument('--disable-extensions')
+        chrome_options.add_argument('--disable-background-networking')
+        
+        cache_dir = Path(SELENIUM_CONFIG['disk_cache_dir']) / f"slot_{self.cache_slot}"
+        cache_dir.mkdir(exist_ok=True, parents=True)
+        chrome_options.add_argument(f'--disk-cache-dir={cache_dir.resolve()}')
+    
+    def _block_urls(self):
+        """Блокировка шрифтов, медиа и сторонних скриптов через CDP"""
+        patterns = SELENIUM_CONFIG['blocked_url_patterns']
+        try:
+            self.driver.execute_cdp_cmd('Network.enable', {})
+            self.driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': patterns})
+            logger.debug(f"🚫 Заблокировано шаблонов URL: {len(patterns)}")
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось включить блокировку URL через CDP: {e}")
+    
     def setup_driver(self):
         """Настройка ChromeDriver с увеличенными таймаутами"""
         chrome_options = Options()
@@ -30,13 +162,25 @@ class SeleniumParser:
         if self.headless:
             chrome_options.add_argument('--headless')  # Без GUI
         
+        if self.lean:
+            self._apply_lean_profile(chrome_options)
+        
+        if self.capture_xhr:
+            enable_performance_log(chrome_options)
+        
         chrome_options.add_argument('--no-sandbox')
         chrome_options.add_argument('--disable-dev-shm-usage')
         chrome_options.add_argument('--disable-gpu')
         chrome_options.add_argument('--window-size=1920,1080')
         
-        # Стратегия загрузки - eager для скорости
-        chrome_options.page_load_strategy = "eager"
+        # Фоновые вкладки (extract_many) не должны замедляться и блокироваться
+        chrome_options.add_argument('--disable-background-timer-throttling')
+        chrome_options.add_argument('--disable-backgrounding-occluded-windows')
+        chrome_options.add_argument('--disable-renderer-backgrounding')
+        chrome_options.add_argument('--disable-popup-blocking')
+        
+        # Стратегия загрузки (по умолчанию eager - не ждем картинки и iframe)
+        chrome_options.page_load_strategy = self.page_load_strategy
         
         # User-Agent
         chrome_options.add_argument('user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36')
@@ -48,24 +192,85 @@ class SeleniumParser:
             else:
                 self.driver = webdriver.Chrome(options=chrome_options)
             
-            # УВЕЛИЧЕННЫЕ ТАЙМАУТЫ (130 секунд как вы просили)
-            self.driver.set_page_load_timeout(130)  # Таймаут загрузки страницы
-            self.driver.set_script_timeout(130)     # Таймаут выполнения скриптов
+            # Таймауты из SELENIUM_CONFIG; ожидание элементов - отдельным бюджетом
+            self.driver.set_page_load_timeout(SELENIUM_CONFIG['page_load_timeout'])
+            self.driver.set_script_timeout(SELENIUM_CONFIG['script_timeout'])
+            
+            if self.lean:
+                self._block_urls()
             
-            logger.info("✅ Selenium ChromeDriver инициализирован с таймаутами 130с")
+            logger.info(f"✅ Selenium ChromeDriver инициализирован (таймаут загрузки {SELENIUM_CONFIG['page_load_timeout']}с)")
             
         except Exception as e:
             logger.error(f"❌ Ошибка инициализации Selenium: {e}")
             raise
     
-    def get_page_source(self, url, wait_for_elements=None, wait_time=10):
+    def wait_for_any(self, css=None, xpaths=None, budget=None):
+        """
+        Ожидание появления любого из селекторов одним вызовом (MutationObserver)
+        
+        Returns:
+            tuple: (найденный селектор или None, секунд ожидания)
+        """
+        if budget is None:
+            budget = SELENIUM_CONFIG['ready_budget']
+        
+        started = time.monotonic()
+        try:
+            result = self.driver.execute_async_script(
+                WAIT_FOR_ANY_JS, list(css or []), list(xpaths or []), int(budget * 1000)
+            )
+            selector = result.get('selector') if result else None
+        except Exception as e:
+            logger.debug(f"ℹ️ Ошибка ожидания элементов: {e}")
+            selector = None
+        
+        return selector, time.monotonic() - started
+    
+    def _save_snapshot(self, url, html=None):
+        """
+        Сохранение отрисованного DOM (один раз на рендер)
+        
+        Returns:
+            datetime: Время рендера (имя файла снимка) или None, если снимок не сохранен
+        """
+        if not self.snapshot_store:
+            return None
+        try:
+            if html is None:
+                html = self.driver.page_source
+            rendered_at = datetime.now()
+            if self.snapshot_store.save(url, html, rendered_at):
+                return rendered_at
+        except Exception as e:
+            logger.debug(f"ℹ️ Снимок не сохранен: {e}")
+        return None
+    
+    def _capture_xhr(self, url, data):
+        """Сбор JSON ответов страницы и обновление шаблонов запросов"""
+        if not self.network_capture:
+            return
+        try:
+            self.last_xhr = self.network_capture.collect(self.driver)
+            templates = [make_template(capture, url, data) for capture in self.last_xhr]
+            if self.xhr_templates.update(templates):
+                learned = sum(1 for t in templates if t['fields'])
+                logger.info(f"📡 XHR: перехвачено {len(self.last_xhr)}, шаблонов с полями товара {learned}")
+        except Exception as e:
+            logger.debug(f"ℹ️ XHR не перехвачены: {e}")
+    
+    def _log_timings(self, url):
+        timings = ', '.join(f"{name} {seconds:.2f}с" for name, seconds in self.last_timings.items())
+        logger.info(f"⏱️  {url[-60:]}: {timings}")
+    
+    def get_page_source(self, url, wait_for_elements=None, wait_time=None):
         """
         Получение полного HTML после загрузки JavaScript
         
         Args:
             url: URL страницы
-            wait_for_elements: Список селекторов для ожидания (например, ['.b-price__value', 'h1'])
-            wait_time: Время ожидания элементов в секундах
+            wait_for_elements: Селекторы для ожидания (например, ['.b-price__value', 'h1']) - ждем любой
+            wait_time: Общий бюджет ожидания в секундах (None - SELENIUM_CONFIG['ready_budget'])
             
         Returns:
             str: Полный HTML код страницы или None при ошибке
@@ -73,25 +278,26 @@ class SeleniumParser:
         try:
             logger.info(f"🌐 Selenium загружает: {url}")
             
-            # Загрузка страницы
+            # Загрузка страницы (в общем лимите запросов к сайту)
+            get_rate_limiter().acquire()
+            started = time.monotonic()
             self.driver.get(url)
+            self.last_timings = {'load': time.monotonic() - started}
             logger.debug("✅ Страница загружена")
             
-            # Ожидание динамических элементов если указаны
+            # Ожидание динамических элементов: одно общее условие вместо перебора
             if wait_for_elements:
-                wait = WebDriverWait(self.driver, wait_time)
-                for selector in wait_for_elements:
-                    try:
-                        element = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, selector)))
-                        logger.debug(f"✅ Элемент найден: {selector}")
-                    except Exception as e:
-                        logger.warning(f"⚠️ Не удалось найти элемент {selector}: {e}")
-            
-            # Дополнительная пауза для стабилизации
-            time.sleep(1)
+                selector, waited = self.wait_for_any(wait_for_elements, budget=wait_time)
+                self.last_timings['ready_wait'] = waited
+                if selector:
+                    logger.debug(f"✅ Элемент найден: {selector}")
+                else:
+                    logger.warning(f"⚠️ Не дождались ни одного из элементов: {wait_for_elements}")
             
             # Получение полного HTML
             html = self.driver.page_source
+            self._save_snapshot(url, html)
+            self._log_timings(url)
             logger.info(f"✅ HTML получен ({len(html)} символов)")
             
             return html
@@ -107,103 +313,31 @@ class SeleniumParser:
         """
         try:
             logger.info(f"🔍 Selenium прямое извлечение: {url}")
+            if self.network_capture:
+                self.network_capture.reset(self.driver)
+            get_rate_limiter().acquire()
+            started = time.monotonic()
             self.driver.get(url)
+            self.last_timings = {'load': time.monotonic() - started}
             
-            wait = WebDriverWait(self.driver, 20)
+            # Ожидаем ключевые элементы карточки (любой из них)
+            selector, waited = self.wait_for_any(PRODUCT_READY_CSS)
+            self.last_timings['ready_wait'] = waited
+            if not selector:
+                logger.debug("ℹ️ Ключевые элементы не появились за бюджет, извлекаем что есть")
             
-            # Ожидаем загрузки ключевых элементов
-            wait.until(EC.presence_of_element_located((By.TAG_NAME, "body")))
-            
-            data = {
-                'prod_name': None,
-                'prod_price_new': None,
-                'prod_price_old': None,
-                'prod_article': None,
-                'prod_img_url': None
-            }
-            
-            # 1. Название (div.b-title > h1) - для динамических страниц
-            try:
-                title_div = self.driver.find_element(By.CSS_SELECTOR, 'div.b-title')
-                h1_element = title_div.find_element(By.TAG_NAME, 'h1')
-                data['prod_name'] = h1_element.text.strip()
-                logger.debug(f"✅ Название найдено (div.b-title > h1): {data['prod_name'][:50]}...")
-            except:
-                # Альтернатива: обычный h1
-                try:
-                    h1_element = self.driver.find_element(By.TAG_NAME, 'h1')
-                    data['prod_name'] = h1_element.text.strip()
-                    logger.debug(f"✅ Название найдено (h1): {data['prod_name'][:50]}...")
-                except Exception as e:
-                    logger.warning(f"⚠️ Не удалось найти название: {e}")
-            
-            # 2. Цена (div.b-price__value) - для динамических страниц
-            try:
-                price_element = self.driver.find_element(By.CSS_SELECTOR, 'div.b-price__value')
-                data['prod_price_new'] = self._clean_price(price_element.text)
-                logger.debug(f"✅ Новая цена найдена: {data['prod_price_new']}")
-            except Exception as e:
-                logger.warning(f"⚠️ Не удалось найти цену: {e}")
-            
-            # 3. Старая цена (div.b-price__sale) - для динамических страниц
-            try:
-                old_price_element = self.driver.find_element(By.CSS_SELECTOR, 'div.b-price__sale')
-                data['prod_price_old'] = self._clean_price(old_price_element.text)
-                logger.debug(f"✅ Старая цена найдена: {data['prod_price_old']}")
-            except Exception as e:
-                logger.debug(f"ℹ️ Старая цена не найдена: {e}")
-            
-            # 4. Артикул (div.b-card-detail__code > span) - для динамических страниц
-            try:
-                code_div = self.driver.find_element(By.CSS_SELECTOR, 'div.b-card-detail__code')
-                span_element = code_div.find_element(By.TAG_NAME, 'span')
-                data['prod_article'] = span_element.text.strip()
-                logger.debug(f"✅ Артикул найден: {data['prod_article']}")
-            except:
-                # Альтернативный поиск артикула
-                try:
-                    # Ищем текст "Артикул" на странице
-                    page_text = self.driver.page_source
-                    import re
-                    match = re.search(r'Артикул[:\s]*(\d+)', page_text)
-                    if match:
-                        data['prod_article'] = match.group(1)
-                        logger.debug(f"✅ Артикул найден (регулярка): {data['prod_article']}")
-                except Exception as e:
-                    logger.warning(f"⚠️ Не удалось найти артикул: {e}")
-            
-            # 5. Изображение (img.sp-image) - для динамических страниц
-            try:
-                img_element = self.driver.find_element(By.CSS_SELECTOR, 'img.sp-image')
-                data['prod_img_url'] = img_element.get_attribute('src')
-                # Делаем URL абсолютным если нужно
-                if data['prod_img_url'] and data['prod_img_url'].startswith('/'):
-                    data['prod_img_url'] = 'https://hello54.ru' + data['prod_img_url']
-                logger.debug(f"✅ URL изображения найден: {data['prod_img_url'][:50]}...")
-            except Exception as e:
-                logger.debug(f"ℹ️ Изображение не найдено: {e}")
-            
-            # 6. Характеристики товара
-            try:
-                characteristics = extract_characteristics_hello54(self.driver)
-                if characteristics:
-                    data['characteristics'] = characteristics
-                    logger.info(f"✅ Собрано {len(characteristics)} характеристик")
-                    # Для отладки покажем первые 3
-                    for name, value in list(characteristics.items())[:3]:
-                        logger.debug(f"   • {name}: {value}")
-                else:
-                    data['characteristics'] = {}
-                    logger.warning("⚠️ Характеристики не найдены")
-            except Exception as e:
-                logger.error(f"❌ Ошибка сбора характеристик: {e}")
-                data['characteristics'] = {}
+            data = self.extract_loaded_page()
+            rendered_at = self._save_snapshot(url)
+            self._capture_xhr(url, data)
+            self._log_timings(url)
             
             return {
                 'success': True,
                 'data': data,  # Теперь с характеристиками!
                 'error': None,
-                'source': 'selenium_direct'
+                'source': 'selenium_direct',
+                'timings': dict(self.last_timings),
+                'rendered_at': rendered_at  # parsed_at = время снимка (reparse_snapshots.py)
             }
             
         except Exception as e:
@@ -215,6 +349,294 @@ class SeleniumParser:
                 'source': 'selenium_direct'
             }
     
+    def extract_many(self, tasks, tabs=None):
+        """
+        Параллельная загрузка страниц в нескольких вкладках одного браузера.
+        
+        Навигация запускается через window.open из управляющей вкладки, поэтому
+        chromedriver не ждет загрузку каждой страницы. Вкладки опрашиваются по
+        кругу; готовая страница извлекается, вкладка закрывается, а ее место
+        занимает следующий URL. Ошибка или зависание вкладки не задевает остальные.
+        
+        Args:
+            tasks: Итерируемое из пар (key, url)
+            tabs: Сколько вкладок одновременно (None - SELENIUM_CONFIG['tabs'])
+            
+        Yields:
+            tuple: (key, результат как у extract_data_directly) в порядке готовности
+        """
+        tabs = max(1, tabs or SELENIUM_CONFIG['tabs'])
+        pending = deque(tasks)
+        control = self.driver.current_window_handle
+        open_tabs = {}
+        
+        try:
+            while pending or open_tabs:
+                while pending and len(open_tabs) < tabs:
+                    key, url = pending.popleft()
+                    try:
+                        handle = self._open_tab(control, url)
+                    except Exception as e:
+                        handle = None
+                        logger.error(f"❌ Не удалось открыть вкладку для {url}: {e}")
+                    if handle is None:
+                        yield key, {'success': False, 'data': None, 'error': 'Не удалось открыть вкладку', 'source': 'selenium_tabs'}
+                        continue
+                    open_tabs[handle] = {'key': key, 'url': url, 'started': time.monotonic()}
+                
+                harvested = None
+                for handle, tab in open_tabs.items():
+                    status = self._tab_status(handle, tab)
+                    if status != 'wait':
+                        harvested = (handle, tab, status)
+                        break
+                
+                if harvested is None:
+                    time.sleep(0.05)
+                    continue
+                
+                handle, tab, status = harvested
+                del open_tabs[handle]
+                yield tab['key'], self._harvest_tab(control, handle, tab, status)
+        finally:
+            for handle in open_tabs:
+                self._close_tab(control, handle)
+    
+    def _open_tab(self, control, url):
+        """Новая вкладка с начатой загрузкой url; возвращает ее handle"""
+        get_rate_limiter().acquire()
+        self.driver.switch_to.window(control)
+        before = set(self.driver.window_handles)
+        self.driver.execute_script("window.open(arguments[0], '_blank');", url)
+        opened = set(self.driver.window_handles) - before
+        return opened.pop() if opened else None
+    
+    def _tab_status(self, handle, tab):
+        """ready - можно извлекать, wait - еще грузится, failed - ошибка или таймаут"""
+        now = time.monotonic()
+        try:
+            self.driver.switch_to.window(handle)
+            state = self.driver.execute_script(TAB_STATE_JS, PRODUCT_READY_CSS)
+        except Exception as e:
+            tab['error'] = f"Вкладка не отвечает: {e}"
+            return 'failed'
+        
+        if state['url'].startswith('chrome-error://'):
+            tab['error'] = 'Ошибка загрузки страницы'
+            return 'failed'
+        
+        if state['found']:
+            return 'ready'
+        
+        # DOM готов, а ключевых элементов нет - как и в одиночном режиме,
+        # после ready_budget извлекаем то, что есть
+        if state['state'] != 'loading':
+            tab.setdefault('interactive_at', now)
+            if now - tab['interactive_at'] >= SELENIUM_CONFIG['ready_budget']:
+                return 'ready'
+        
+        if now - tab['started'] >= SELENIUM_CONFIG['page_load_timeout'] + SELENIUM_CONFIG['ready_budget']:
+            tab['error'] = 'Таймаут загрузки вкладки'
+            return 'failed'
+        
+        return 'wait'
+    
+    def _harvest_tab(self, control, handle, tab, status):
+        """Извлечение данных из готовой вкладки и ее закрытие"""
+        url = tab['url']
+        try:
+            if status != 'ready':
+                logger.warning(f"⚠️ {tab['error']}: {url}")
+                return {'success': False, 'data': None, 'error': tab['error'], 'source': 'selenium_tabs'}
+            
+            self.last_timings = {'load': time.monotonic() - tab['started']}
+            data = self.extract_loaded_page()
+            rendered_at = self._save_snapshot(url)
+            self._log_timings(url)
+            
+            return {
+                'success': True,
+                'data': data,
+                'error': None,
+                'source': 'selenium_tabs',
+                'timings': dict(self.last_timings),
+                'rendered_at': rendered_at
+            }
+        except Exception as e:
+            logger.error(f"❌ Ошибка извлечения из вкладки {url}: {e}")
+            return {'success': False, 'data': None, 'error': f"Selenium ошибка: {e}", 'source': 'selenium_tabs'}
+        finally:
+            self._close_tab(control, handle)
+    
+    def _close_tab(self, control, handle):
+        try:
+            self.driver.switch_to.window(handle)
+            self.driver.close()
+        except Exception:
+            pass
+        try:
+            self.driver.switch_to.window(control)
+        except Exception:
+            pass
+    
+    def extract_loaded_page(self):
+        """
+        Извлечение данных из уже загруженной страницы.
+        Сначала одним execute_script, при ошибке - поэлементно через WebDriver.
+        """
+        started = time.monotonic()
+        data = self._extract_with_script()
+        if data is not None:
+            if not data.get('characteristics'):
+                # Блок характеристик мог еще не прогрузиться - ждем его с отдельным бюджетом
+                selector, waited = self.wait_for_any(
+                    PROPERTIES_CSS, PROPERTIES_XPATH, budget=SELENIUM_CONFIG['characteristics_budget']
+                )
+                self.last_timings['characteristics_wait'] = waited
+                if selector:
+                    retry = self._extract_with_script()
+                    if retry and retry.get('characteristics'):
+                        data['characteristics'] = retry['characteristics']
+                    else:
+                        data['characteristics'] = self._extract_characteristics_fallback()
+            self.last_timings['extract'] = time.monotonic() - started - self.last_timings.get('characteristics_wait', 0)
+            return data
+        
+        logger.debug("ℹ️ JS-извлечение не удалось, перехожу к поэлементному")
+        data = self._extract_with_elements()
+        self.last_timings['extract'] = time.monotonic() - started
+        return data
+    
+    def _extract_with_script(self):
+        """
+        Все поля и характеристики за один round-trip к chromedriver
+        
+        Returns:
+            dict: Данные товара или None, если скрипт не отработал
+        """
+        try:
+            raw = self.driver.execute_script(EXTRACT_PRODUCT_JS)
+        except Exception as e:
+            logger.debug(f"ℹ️ Ошибка execute_script: {e}")
+            return None
+        
+        if not raw or not raw.get('name'):
+            return None
+        
+        img_url = raw.get('img')
+        if img_url and img_url.startswith('/'):
+            img_url = 'https://hello54.ru' + img_url
+        
+        characteristics = {}
+        for name, value in raw.get('characteristics') or []:
+            name = (name or '').strip().rstrip(':').strip()
+            value = (value or '').strip()
+            if name and value:
+                characteristics[name] = value
+        
+        data = {
+            'prod_name': raw['name'].strip(),
+            'prod_price_new': self._clean_price(raw.get('price_new')),
+            'prod_price_old': self._clean_price(raw.get('price_old')),
+            'prod_article': (raw.get('article') or '').strip() or None,
+            'prod_img_url': img_url,
+            'characteristics': characteristics
+        }
+        logger.debug(f"⚡ JS-извлечение: {data['prod_name'][:50]}..., характеристик: {len(characteristics)}")
+        return data
+    
+    def _extract_characteristics_fallback(self):
+        """Характеристики через поэлементный поиск (с ожиданием блока)"""
+        try:
+            characteristics = extract_characteristics_hello54(self.driver)
+            if characteristics:
+                logger.info(f"✅ Собрано {len(characteristics)} характеристик")
+                # Для отладки покажем первые 3
+                for name, value in list(characteristics.items())[:3]:
+                    logger.debug(f"   • {name}: {value}")
+            else:
+                logger.warning("⚠️ Характеристики не найдены")
+            return characteristics or {}
+        except Exception as e:
+            logger.error(f"❌ Ошибка сбора характеристик: {e}")
+            return {}
+    
+    def _extract_with_elements(self):
+        """Поэлементное извлечение через WebDriver (запасной путь)"""
+        data = {
+            'prod_name': None,
+            'prod_price_new': None,
+            'prod_price_old': None,
+            'prod_article': None,
+            'prod_img_url': None
+        }
+        
+        # 1. Название (div.b-title > h1) - для динамических страниц
+        try:
+            title_div = self.driver.find_element(By.CSS_SELECTOR, 'div.b-title')
+            h1_element = title_div.find_element(By.TAG_NAME, 'h1')
+            data['prod_name'] = h1_element.text.strip()
+            logger.debug(f"✅ Название найдено (div.b-title > h1): {data['prod_name'][:50]}...")
+        except:
+            # Альтернатива: обычный h1
+            try:
+                h1_element = self.driver.find_element(By.TAG_NAME, 'h1')
+                data['prod_name'] = h1_element.text.strip()
+                logger.debug(f"✅ Название найдено (h1): {data['prod_name'][:50]}...")
+            except Exception as e:
+                logger.warning(f"⚠️ Не удалось найти название: {e}")
+        
+        # 2. Цена (div.b-price__value) - для динамических страниц
+        try:
+            price_element = self.driver.find_element(By.CSS_SELECTOR, 'div.b-price__value')
+            data['prod_price_new'] = self._clean_price(price_element.text)
+            logger.debug(f"✅ Новая цена найдена: {data['prod_price_new']}")
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось найти цену: {e}")
+        
+        # 3. Старая цена (div.b-price__sale) - для динамических страниц
+        try:
+            old_price_element = self.driver.find_element(By.CSS_SELECTOR, 'div.b-price__sale')
+            data['prod_price_old'] = self._clean_price(old_price_element.text)
+            logger.debug(f"✅ Старая цена найдена: {data['prod_price_old']}")
+        except Exception as e:
+            logger.debug(f"ℹ️ Старая цена не найдена: {e}")
+        
+        # 4. Артикул (div.b-card-detail__code > span) - для динамических страниц
+        try:
+            code_div = self.driver.find_element(By.CSS_SELECTOR, 'div.b-card-detail__code')
+            span_element = code_div.find_element(By.TAG_NAME, 'span')
+            data['prod_article'] = span_element.text.strip()
+            logger.debug(f"✅ Артикул найден: {data['prod_article']}")
+        except:
+            # Альтернативный поиск артикула
+            try:
+                # Ищем текст "Артикул" на странице
+                page_text = self.driver.page_source
+                import re
+                match = re.search(r'Артикул[:\s]*(\d+)', page_text)
+                if match:
+                    data['prod_article'] = match.group(1)
+                    logger.debug(f"✅ Артикул найден (регулярка): {data['prod_article']}")
+            except Exception as e:
+                logger.warning(f"⚠️ Не удалось найти артикул: {e}")
+        
+        # 5. Изображение (img.sp-image) - для динамических страниц
+        try:
+            img_element = self.driver.find_element(By.CSS_SELECTOR, 'img.sp-image')
+            data['prod_img_url'] = img_element.get_attribute('src')
+            # Делаем URL абсолютным если нужно
+            if data['prod_img_url'] and data['prod_img_url'].startswith('/'):
+                data['prod_img_url'] = 'https://hello54.ru' + data['prod_img_url']
+            logger.debug(f"✅ URL изображения найден: {data['prod_img_url'][:50]}...")
+        except Exception as e:
+            logger.debug(f"ℹ️ Изображение не найдено: {e}")
+        
+        # 6. Характеристики товара
+        data['characteristics'] = self._extract_characteristics_fallback()
+        
+        return data
+    
     def _clean_price(self, price_text):
         """Очистка текста цены"""
         if not price_text:
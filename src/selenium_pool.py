@@ -0,0 +1,322 @@
+# src/selenium_pool.py
+"""
+Пул браузеров Selenium: N процессов, в каждом свой SeleniumParser.
+
+Задачи раздаются из очереди процессора по одной на браузер; родитель
+следит за здоровьем каждого (страницы, ошибки подряд, перезапуски).
+Браузер пересоздается после max_pages страниц или когда RSS Chrome
+превышает max_rss_mb, так что цена запуска делится на много страниц,
+а утечки памяти Chrome не накапливаются. С tabs > 1 воркер получает
+пачку из tabs задач и грузит их во вкладках одного браузера (extract_many).
+Воркер, который дольше task_timeout не вернул ни одного результата
+(например, Chrome завис в driver.get), убивается вместе с браузером и
+перезапускается, а его задачи отмечаются как неудачные. Результаты каждый
+воркер пишет в свой канал (Pipe), который читает отдельный поток родителя:
+недописанное убитым воркером сообщение остается в его канале и не мешает
+остальным.
+"""
+
+import logging
+import multiprocessing
+import queue
+import signal
+import threading
+import time
+from collections import deque
+
+from src.config import SELENIUM_CONFIG
+
+try:
+    import psutil
+except ImportError:  # без psutil порог RSS не проверяется
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+def _browser_rss_mb(parser):
+    """Суммарный RSS chromedriver и всех процессов Chrome в МБ (None если неизвестно)"""
+    if psutil is None or not parser or not parser.driver:
+        return None
+
+    try:
+        root = psutil.Process(parser.driver.service.process.pid)
+        processes = [root] + root.children(recursive=True)
+        return sum(p.memory_info().rss for p in processes if p.is_running()) / (1024 * 1024)
+    except Exception:
+        return None
+
+def _worker_main(worker_id, inbox, outbox, headless, max_pages, max_rss_mb, tabs=1):
+    """Цикл процесса-воркера: держит браузер, обрабатывает задачи из inbox, результаты - в свой канал outbox"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(
+        level=logging.INFO,
+        format=f'%(asctime)s - browser-{worker_id} - %(levelname)s - %(message)s'
+    )
+
+    from src.selenium_parser import SeleniumParser
+
+    parser = None
+    pages = 0
+
+    while True:
+        task = inbox.get()
+        if task is None:
+            break
+
+        batch, recycle_first = task
+
+        if recycle_first and parser:
+            logger.info("♻️ Перезапуск браузера по запросу пула")
+            parser.close()
+            parser = None
+
+        if parser is None:
+            started = time.monotonic()
+            parser = SeleniumParser(headless=headless, cache_slot=worker_id)
+            pages = 0
+            logger.info(f"🚀 Браузер запущен за {time.monotonic() - started:.1f}с")
+
+        results = []
+        try:
+            if len(batch) == 1:
+                product_id, url = batch[0]
+                results.append((product_id, parser.extract_data_directly(url)))
+            else:
+                results.extend(parser.extract_many(batch, tabs=tabs))
+        except Exception as e:
+            done = {product_id for product_id, _ in results}
+            results.extend(
+                (product_id, {'success': False, 'data': None, 'error': f"Selenium ошибка: {e}", 'source': 'selenium_pool'})
+                for product_id, _ in batch if product_id not in done
+            )
+
+        pages += len(batch)
+        rss_mb = _browser_rss_mb(parser)
+
+        recycled = pages >= max_pages or bool(max_rss_mb and rss_mb and rss_mb > max_rss_mb)
+        if recycled:
+            rss_info = f", RSS {rss_mb:.0f} МБ" if rss_mb else ""
+            logger.info(f"♻️ Перезапуск браузера после {pages} страниц{rss_info}")
+            parser.close()
+            parser = None
+
+        for i, (product_id, result) in enumerate(results, 1):
+            meta = {'pages': pages, 'rss_mb': rss_mb, 'recycled': recycled and i == len(results)}
+            outbox.send((worker_id, product_id, result, meta))
+
+    if parser:
+        parser.close()
+    outbox.close()
+
+class SeleniumPool:
+    """Пул процессов с браузерами и раздачей задач"""
+
+    def __init__(self, size=2, headless=True, max_pages=50, max_rss_mb=None,
+                 max_consecutive_failures=3, max_restarts=5, result_timeout=5, tabs=1, task_timeout=None):
+        self.size = size
+        self.tabs = max(1, tabs)
+        self.headless = headless
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self.max_consecutive_failures = max_consecutive_failures
+        self.max_restarts = max_restarts
+        self.result_timeout = result_timeout
+        self.task_timeout = task_timeout or SELENIUM_CONFIG['page_load_timeout'] + SELENIUM_CONFIG['hang_margin']
+
+        # spawn: не наследуем соединения с БД родителя
+        self._ctx = multiprocessing.get_context('spawn')
+        # Результаты всех воркеров от потоков чтения их каналов
+        self._results = queue.Queue()
+        self.workers = {}
+        self.health = {}
+        # worker_id -> time.monotonic() выдачи пачки или последнего результата
+        self._progress_at = {}
+
+    def start(self):
+        """Запуск всех воркеров"""
+        for worker_id in range(self.size):
+            self.health[worker_id] = {
+                'pages': 0, 'failures': 0, 'consecutive_failures': 0,
+                'restarts': 0, 'recycles': 0, 'rss_mb': None
+            }
+            self._spawn(worker_id)
+        logger.info(
+            f"✅ Пул браузеров запущен: {self.size} процессов по {self.tabs} вкладок, "
+            f"перезапуск каждые {self.max_pages} страниц"
+        )
+
+    def _spawn(self, worker_id):
+        inbox = self._ctx.Queue()
+        outbox, writer = self._ctx.Pipe(duplex=False)
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker_id, inbox, writer, self.headless, self.max_pages, self.max_rss_mb, self.tabs),
+            daemon=True
+        )
+        process.start()
+        # Конец записи остается только у воркера: после его смерти recv() получит EOFError
+        writer.close()
+        threading.Thread(target=self._read_outbox, args=(outbox,),
+                         name=f'browser-{worker_id}-results', daemon=True).start()
+        self.workers[worker_id] = {'process': process, 'inbox': inbox}
+
+    def _read_outbox(self, outbox):
+        """Поток чтения канала одного воркера (до его завершения)"""
+        try:
+            while True:
+                self._results.put(outbox.recv())
+        except (EOFError, OSError):
+            pass
+        finally:
+            outbox.close()
+
+    def _dispatch(self, worker_id, pending, inflight):
+        """Выдать воркеру следующую пачку (до tabs задач)"""
+        if not pending or worker_id not in self.workers:
+            return
+
+        batch = [pending.popleft() for _ in range(min(self.tabs, len(pending)))]
+        health = self.health[worker_id]
+        recycle_first = health['consecutive_failures'] >= self.max_consecutive_failures
+        if recycle_first:
+            health['consecutive_failures'] = 0
+            health['recycles'] += 1
+
+        inflight[worker_id] = {product_id for product_id, _ in batch}
+        self._progress_at[worker_id] = time.monotonic()
+        self.workers[worker_id]['inbox'].put((batch, recycle_first))
+
+    def _kill(self, process):
+        """Остановка зависшего воркера вместе с chromedriver и Chrome"""
+        if psutil is not None:
+            try:
+                for child in psutil.Process(process.pid).children(recursive=True):
+                    child.kill()
+            except Exception:
+                pass
+        process.kill()
+        process.join(timeout=10)
+
+    def _check_workers(self, pending, inflight, failed):
+        """Перезапуск упавших и зависших воркеров; их текущие задачи отмечаются как неудачные"""
+        now = time.monotonic()
+        for worker_id, worker in list(self.workers.items()):
+            if worker['process'].is_alive():
+                if worker_id not in inflight or now - self._progress_at.get(worker_id, now) < self.task_timeout:
+                    continue
+                logger.warning(f"⚠️ Браузер {worker_id} завис: нет результата {self.task_timeout:.0f}с, перезапуск")
+                self._kill(worker['process'])
+                error = f'Браузер не ответил за {self.task_timeout:.0f}с'
+            else:
+                logger.warning(f"⚠️ Браузер {worker_id} упал (код {worker['process'].exitcode})")
+                error = 'Процесс браузера завершился аварийно'
+
+            health = self.health[worker_id]
+            lost = inflight.pop(worker_id, set())
+
+            for product_id in lost:
+                health['failures'] += 1
+                failed.append((product_id, {
+                    'success': False, 'data': None, 'error': error, 'source': 'selenium_pool'
+                }))
+
+            if health['restarts'] >= self.max_restarts:
+                logger.error(f"❌ Браузер {worker_id} отключен: превышен лимит перезапусков")
+                del self.workers[worker_id]
+                continue
+
+            health['restarts'] += 1
+            self._spawn(worker_id)
+            self._dispatch(worker_id, pending, inflight)
+
+    def process(self, tasks):
+        """
+        Обработка задач пулом
+
+        Args:
+            tasks: Список кортежей (product_id, url)
+
+        Yields:
+            tuple: (product_id, parse_result) в порядке готовности
+        """
+        pending = deque(tasks)
+        inflight = {}
+        failed = deque()
+
+        for worker_id in list(self.workers):
+            self._dispatch(worker_id, pending, inflight)
+
+        while inflight or failed:
+            while failed:
+                yield failed.popleft()
+
+            if not inflight:
+                break
+
+            try:
+                item = self._results.get(timeout=self.result_timeout)
+            except queue.Empty:
+                item = None
+
+            if item is not None:
+                worker_id, product_id, result, meta = item
+                batch = inflight.get(worker_id)
+                # Иначе - результат убитого воркера: задача уже отмечена неудачной
+                if batch and product_id in batch:
+                    batch.discard(product_id)
+                    self._progress_at[worker_id] = time.monotonic()
+                    health = self.health[worker_id]
+                    health['pages'] += 1
+                    health['rss_mb'] = meta.get('rss_mb')
+                    if meta.get('recycled'):
+                        health['recycles'] += 1
+
+                    if result.get('success') and result.get('data') and result['data'].get('prod_name'):
+                        health['consecutive_failures'] = 0
+                    else:
+                        health['failures'] += 1
+                        health['consecutive_failures'] += 1
+
+                    yield product_id, result
+                    if not batch:
+                        inflight.pop(worker_id, None)
+                        self._dispatch(worker_id, pending, inflight)
+
+            # Не только по таймауту get: пока отвечают другие воркеры, он не наступает
+            self._check_workers(pending, inflight, failed)
+            if not self.workers and pending:
+                # Все браузеры отключены - оставшиеся задачи считаем неудачными
+                while pending:
+                    product_id, _ = pending.popleft()
+                    failed.append((product_id, {
+                        'success': False, 'data': None,
+                        'error': 'Нет рабочих браузеров в пуле', 'source': 'selenium_pool'
+                    }))
+
+        while failed:
+            yield failed.popleft()
+
+    def log_health(self):
+        """Сводка по состоянию браузеров"""
+        for worker_id, health in sorted(self.health.items()):
+            rss = f"{health['rss_mb']:.0f} МБ" if health['rss_mb'] else 'н/д'
+            logger.info(
+                f"   браузер {worker_id}: страниц {health['pages']}, ошибок {health['failures']}, "
+                f"перезапусков {health['restarts']}, пересозданий {health['recycles']}, RSS {rss}"
+            )
+
+    def close(self):
+        """Остановка всех воркеров"""
+        for worker in self.workers.values():
+            try:
+                worker['inbox'].put(None)
+            except Exception:
+                pass
+
+        for worker in self.workers.values():
+            worker['process'].join(timeout=30)
+            if worker['process'].is_alive():
+                worker['process'].terminate()
+
+        self.workers = {}
+        logger.info("🔌 Пул браузеров остановлен")
@@ -0,0 +1,162 @@
+# src/snapshot_store.py
+"""
+Хранилище отрисованных Selenium страниц (page_source после JavaScript).
+
+Каждый рендер сохраняется один раз в gzip под ключом URL и временем
+рендера: <dir>/<sha1(url)[:2]>/<sha1(url)>/<время>.html.gz, рядом url.txt.
+После исправления селекторов страницы перепарсиваются из снимков
+(reparse_snapshots.py) без повторного запуска браузера.
+
+Размер каталога ограничен: при записи у URL остаются keep_per_url
+последних снимков, а раз в сутки (метка .pruned общая для всех
+процессов) удаляются снимки старше max_age_days и пустые каталоги URL.
+"""
+
+import gzip
+import hashlib
+import logging
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+
+from src.config import SNAPSHOT_CONFIG
+
+logger = logging.getLogger(__name__)
+
+TIME_FORMAT = '%Y%m%dT%H%M%S%f'
+
+PRUNE_INTERVAL = 24 * 3600
+
+class SnapshotStore:
+    """Снимки DOM на диске, сжатые gzip"""
+
+    def __init__(self, base_dir=None, compress_level=None, keep_per_url=None, max_age_days=None):
+        self.base_dir = Path(base_dir or SNAPSHOT_CONFIG['dir'])
+        self.compress_level = compress_level or SNAPSHOT_CONFIG['compress_level']
+        self.keep_per_url = max(1, keep_per_url or SNAPSHOT_CONFIG['keep_per_url'])
+        self.max_age_days = SNAPSHOT_CONFIG['max_age_days'] if max_age_days is None else max_age_days
+        self.base_dir.mkdir(exist_ok=True, parents=True)
+
+    @staticmethod
+    def url_key(url):
+        return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+    def _url_dir(self, url):
+        key = self.url_key(url)
+        return self.base_dir / key[:2] / key
+
+    def save(self, url, html, rendered_at=None):
+        """
+        Сохранение снимка страницы
+
+        Returns:
+            Path: Путь к файлу снимка или None при ошибке
+        """
+        rendered_at = rendered_at or datetime.now()
+        url_dir = self._url_dir(url)
+
+        try:
+            url_dir.mkdir(exist_ok=True, parents=True)
+            url_file = url_dir / 'url.txt'
+            if not url_file.exists():
+                url_file.write_text(url, encoding='utf-8')
+
+            path = url_dir / f"{rendered_at.strftime(TIME_FORMAT)}.html.gz"
+            tmp_path = path.with_suffix('.tmp')
+            with gzip.open(tmp_path, 'wb', compresslevel=self.compress_level) as f:
+                f.write(html.encode('utf-8'))
+            os.replace(tmp_path, path)
+
+            logger.debug(f"📸 Снимок сохранен: {path} ({path.stat().st_size // 1024} KB)")
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось сохранить снимок {url}: {e}")
+            return None
+
+        self._trim_url_dir(url_dir)
+        self._maybe_prune()
+        return path
+
+    def _trim_url_dir(self, url_dir):
+        """Оставить keep_per_url последних снимков URL"""
+        for old in sorted(url_dir.glob('*.html.gz'))[:-self.keep_per_url]:
+            try:
+                old.unlink()
+            except OSError:
+                pass
+
+    def _maybe_prune(self):
+        """Проход по возрасту, если с прошлого (в любом процессе) прошло больше суток"""
+        if not self.max_age_days:
+            return
+        marker = self.base_dir / '.pruned'
+        try:
+            if time.time() - marker.stat().st_mtime < PRUNE_INTERVAL:
+                return
+        except FileNotFoundError:
+            pass
+        marker.touch()
+        removed = self.prune()
+        if removed:
+            logger.info(f"🧹 Удалено старых снимков: {removed}")
+
+    def prune(self, max_age_days=None):
+        """
+        Удаление снимков старше max_age_days и каталогов URL без снимков
+
+        Returns:
+            int: Количество удаленных снимков
+        """
+        max_age_days = self.max_age_days if max_age_days is None else max_age_days
+        cutoff = time.time() - max_age_days * 86400
+        removed = 0
+        for shard in self.base_dir.iterdir():
+            if not shard.is_dir():
+                continue
+            for url_dir in shard.iterdir():
+                for path in url_dir.glob('*.html.gz'):
+                    try:
+                        if path.stat().st_mtime < cutoff:
+                            path.unlink()
+                            removed += 1
+                    except OSError:
+                        pass
+                if not any(url_dir.glob('*.html.gz')):
+                    try:
+                        (url_dir / 'url.txt').unlink(missing_ok=True)
+                        url_dir.rmdir()
+                    except OSError:
+                        pass  # снимок пишется прямо сейчас: save() восстановит url.txt
+        return removed
+
+    def latest(self, url):
+        """Путь к последнему снимку URL или None"""
+        url_dir = self._url_dir(url)
+        if not url_dir.is_dir():
+            return None
+        snapshots = sorted(url_dir.glob('*.html.gz'))
+        return snapshots[-1] if snapshots else None
+
+    def iter_latest(self):
+        """
+        Последние снимки всех URL
+
+        Yields:
+            tuple: (url, path, rendered_at)
+        """
+        for shard in sorted(self.base_dir.iterdir()):
+            if not shard.is_dir():
+                continue
+            for url_dir in sorted(shard.iterdir()):
+                url_file = url_dir / 'url.txt'
+                snapshots = sorted(url_dir.glob('*.html.gz'))
+                if not url_file.exists() or not snapshots:
+                    continue
+                path = snapshots[-1]
+                rendered_at = datetime.strptime(path.name[:-len('.html.gz')], TIME_FORMAT)
+                yield url_file.read_text(encoding='utf-8'), path, rendered_at
+
+def load_snapshot(path):
+    """HTML из файла снимка"""
+    with gzip.open(path, 'rb') as f:
+        return f.read().decode('utf-8')
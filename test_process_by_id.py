@@ -207,7 +207,7 @@ def process_specific_product(product_id, use_selenium=False, delay=1.0):
     # 3. Запускаем process_products.py
     try:
         # Определяем команду
-        cmd = [sys.executable, "process_products.py", "--process", "1"]
+        cmd = [sys.executable, "process_products.py", "--id", str(product_id)]
         
         if use_selenium:
             cmd.append("--selenium")
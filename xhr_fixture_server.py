@@ -0,0 +1,126 @@
+# xhr_fixture_server.py
+#!/usr/bin/env python3
+"""
+Локальный сервер-заглушка карточек товаров для проверки перехвата XHR.
+
+Страница /catalog/<slug>-<артикул>.html отдает пустой каркас, а название,
+артикул и цены подгружает fetch-запросом к компоненту Bitrix
+(/bitrix/services/main/ajax.php?action=catalog.product.info&id=<артикул>),
+как это делают динамические карточки hello54.
+
+Примеры:
+  python xhr_fixture_server.py --port 8054
+  curl 'http://127.0.0.1:8054/bitrix/services/main/ajax.php?action=catalog.product.info&id=206661'
+"""
+
+import argparse
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+FIXTURE_PRODUCTS = {
+    '206661': {'name': 'Кружка керамическая «Тест» 350 мл', 'price': 1234.0, 'old_price': 1500.0},
+    '206662': {'name': 'Кружка керамическая «Тест» 500 мл', 'price': 1490.0, 'old_price': 1790.0},
+    '300001': {'name': 'Термос стальной 1 л', 'price': 2990.0, 'old_price': None},
+}
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="ru">
+<head><meta charset="utf-8"><title>Карточка товара</title></head>
+<body>
+<div id="product"></div>
+<script>
+fetch('/bitrix/services/main/ajax.php?action=catalog.product.info&id=__ARTICLE__', {
+    headers: {'X-Requested-With': 'XMLHttpRequest', 'Accept': 'application/json'}
+}).then(function(r) { return r.json(); }).then(function(json) {
+    var p = json.data;
+    var price = function(v) { return v ? v.toLocaleString('ru-RU') + ' ₽' : ''; };
+    document.getElementById('product').innerHTML =
+        '<div class="b-title"><h1>' + p.NAME + '</h1></div>' +
+        '<div class="b-card-detail__code">Артикул: <span>' + p.ID + '</span></div>' +
+        '<div class="b-price__value">' + price(p.PRICE.CURRENT) + '</div>' +
+        (p.PRICE.OLD ? '<div class="b-price__sale">' + price(p.PRICE.OLD) + '</div>' : '');
+});
+</script>
+</body>
+</html>
+"""
+
+def product_url(base_url, article):
+    return f"{base_url}/catalog/fixture-product-{article}.html"
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """Страницы товаров и JSON ответы компонента"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, content_type, body):
+        body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+
+        page = re.match(r'^/catalog/[\w-]+-(\d+)\.html$', parts.path)
+        if page and page.group(1) in FIXTURE_PRODUCTS:
+            self._send(200, 'text/html; charset=utf-8', PAGE_TEMPLATE.replace('__ARTICLE__', page.group(1)))
+            return
+
+        if parts.path == '/bitrix/services/main/ajax.php':
+            query = parse_qs(parts.query)
+            article = (query.get('id') or [''])[0]
+            product = FIXTURE_PRODUCTS.get(article)
+            if query.get('action') != ['catalog.product.info'] or not product:
+                self._send(404, 'application/json', json.dumps({'status': 'error', 'errors': ['not found']}))
+                return
+
+            payload = {
+                'status': 'success',
+                'data': {
+                    'ID': int(article),
+                    'NAME': product['name'],
+                    'PRICE': {'CURRENT': product['price'], 'OLD': product['old_price'], 'CURRENCY': 'RUB'},
+                },
+                'errors': []
+            }
+            self._send(200, 'application/json', json.dumps(payload, ensure_ascii=False))
+            return
+
+        self._send(404, 'text/plain; charset=utf-8', 'not found')
+
+def start_fixture_server(port=0):
+    """
+    Запуск сервера в фоновом потоке
+
+    Returns:
+        tuple: (server, base_url)
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), FixtureHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def main():
+    parser = argparse.ArgumentParser(description='Сервер-заглушка карточек с подгрузкой данных через XHR')
+    parser.add_argument('--port', type=int, default=8054, help='Порт (по умолчанию: 8054)')
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), FixtureHandler)
+    base_url = f"http://127.0.0.1:{args.port}"
+    print(f"🧪 Сервер-заглушка: {base_url}")
+    for article in FIXTURE_PRODUCTS:
+        print(f"   {product_url(base_url, article)}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()